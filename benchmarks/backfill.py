@@ -0,0 +1,206 @@
+"""
+Recuperación de mensajes al arrancar contra un cliente de Telegram falso.
+
+FakeHistoryClient sirve diálogos y un historial sintético (mensajes de
+Telethon con códigos dentro y fuera de la ventana, algunos ya reclamados y
+otros repetidos entre chats), con latencia por página y un FloodWait en uno
+de los chats. BaseClient.run_backfill lee ese historial y reclama los
+códigos contra el servidor grabV2 local; al terminar se comprueba:
+
+- que se encolan todos los códigos de la ventana, una vez, del más nuevo al más antiguo,
+- que no se encolan los antiguos ni los ya reclamados,
+- que no hay más de BACKFILL_CONCURRENCY solicitudes a Telegram a la vez,
+- que se respeta el FloodWait.
+
+    python -m benchmarks.backfill --chats 40 --minutes 10 --concurrency 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Set
+
+from telethon.errors import FloodWaitError
+from telethon.tl import types
+
+from benchmarks.e2e import BenchConfig, CODE_TEMPLATES, FILLER_MESSAGES
+from benchmarks.fake_binance import FakeBinanceServer
+
+
+def random_code(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_uppercase, k=4) + rng.choices(string.digits, k=4))
+
+
+class FakeHistoryClient:
+    """Lo que Backfill usa de TelegramClient (iter_dialogs, iter_messages), con un historial en memoria."""
+
+    def __init__(self, history: Dict[int, List[types.Message]], rtt_seconds: float = 0.05,
+                 page_size: int = 100, flood_chat: Optional[int] = None, flood_seconds: int = 2):
+        self.history = history  # chat_id -> mensajes del más reciente al más antiguo
+        self.rtt_seconds = rtt_seconds
+        self.page_size = page_size
+        self.flood_chat = flood_chat
+        self.flood_seconds = flood_seconds
+        self.flood_raised_at: Optional[float] = None
+        self.flood_retried_at: Optional[float] = None
+        self.active = 0
+        self.max_active = 0
+        self.requests = 0
+
+    async def iter_dialogs(self, limit: Optional[int] = None, **kwargs):
+        ordered = sorted(self.history.items(), key=lambda item: item[1][0].date if item[1] else datetime.min, reverse=True)
+        for index, (chat_id, messages) in enumerate(ordered[:limit]):
+            if index % self.page_size == 0:
+                await self._request()
+            entity = types.Channel(id=chat_id, title=f"Canal {chat_id}", photo=types.ChatPhotoEmpty(), date=datetime.now(timezone.utc))
+            yield SimpleNamespace(id=-1000000000000 - chat_id, entity=entity, name=entity.title,
+                                  date=messages[0].date if messages else None, pinned=False)
+
+    async def iter_messages(self, entity, limit: Optional[int] = None, offset_id: int = 0, **kwargs):
+        messages = [message for message in self.history[entity.id] if not offset_id or message.id < offset_id]
+        if limit is not None:
+            messages = messages[:limit]
+        for index, message in enumerate(messages):
+            if index % self.page_size == 0:
+                await self._request()
+                if entity.id == self.flood_chat:
+                    if self.flood_raised_at is None:
+                        self.flood_raised_at = time.monotonic()
+                        raise FloodWaitError(request=None, capture=self.flood_seconds)
+                    if self.flood_retried_at is None:
+                        self.flood_retried_at = time.monotonic()
+            yield message
+
+    async def _request(self) -> None:
+        """Una solicitud a Telegram: cuenta cuántas hay en curso a la vez."""
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.rtt_seconds)
+        finally:
+            self.active -= 1
+
+
+def build_history(chats: int, minutes: float, rng: random.Random):
+    """
+    Historial de 3*minutes minutos por chat; devuelve el historial, los códigos
+    de la ventana (con su fecha más reciente), los antiguos y los ya reclamados.
+    """
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(minutes=minutes)
+    history: Dict[int, List[types.Message]] = {}
+    recent: Dict[str, datetime] = {}
+    old: Set[str] = set()
+    claimed: Set[str] = set()
+    shared = [random_code(rng) for _ in range(5)]  # publicados en varios chats
+    for chat_id in range(1, chats + 1):
+        messages = []
+        span = minutes * 3 * 60
+        # Los chats más tranquilos no tienen mensajes en la ventana
+        newest_offset = rng.uniform(0, span) if chat_id % 5 == 0 else rng.uniform(0, minutes * 30)
+        offsets = sorted(newest_offset + rng.uniform(0, span) for _ in range(rng.randint(20, 250)))
+        for index, seconds in enumerate(offsets):
+            date = now - timedelta(seconds=seconds)
+            text = rng.choice(FILLER_MESSAGES)
+            if rng.random() < 0.08:
+                code = rng.choice(shared) if rng.random() < 0.3 else random_code(rng)
+                text = rng.choice(CODE_TEMPLATES).format(code=code)
+                if date >= cutoff:
+                    if rng.random() < 0.15:
+                        claimed.add(code)
+                    elif code not in recent or date > recent[code]:
+                        recent[code] = date
+                else:
+                    old.add(code)
+            messages.append(types.Message(
+                id=len(offsets) - index, peer_id=types.PeerChannel(chat_id), date=date, message=text,
+                from_id=types.PeerUser(1000 + chat_id)
+            ))
+        history[chat_id] = messages
+    for code in claimed:
+        recent.pop(code, None)
+    return history, recent, old - set(recent), claimed
+
+
+async def run(chats: int, minutes: float, concurrency: int, rtt: float, flood_seconds: int, seed: int) -> bool:
+    from lib.api.telegram import BaseClient
+    from source.logger import logger
+
+    rng = random.Random(seed)
+    history, expected, old, claimed = build_history(chats, minutes, rng)
+    flood_chat = max(history, key=lambda chat_id: len(history[chat_id]) if history[chat_id][0].date > datetime.now(timezone.utc) - timedelta(minutes=minutes) else 0)
+    client = FakeHistoryClient(history, rtt_seconds=rtt, flood_chat=flood_chat, flood_seconds=flood_seconds)
+
+    server = FakeBinanceServer()
+    config = BenchConfig()
+    config.BINANCE_BASE_URL = await server.start()
+    config.BACKFILL_MINUTES = minutes
+    config.BACKFILL_CONCURRENCY = concurrency
+    config.BACKFILL_MAX_DIALOGS = chats
+    config.CLAIM_QUEUE_SIZE = len(expected) + 10
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        bot = BaseClient(config)
+        logger.enabled = False
+        await bot.start_claim_services()
+        bot.client = client
+        bot.manipulator.permanently_claimed_codes.update(claimed)
+        submitted: List[str] = []
+        submit = bot.pipeline.submit
+        bot.pipeline.submit = lambda code, arrival=None: submitted.append(code) or submit(code, arrival)
+
+        started = time.perf_counter()
+        await bot.run_backfill()
+        elapsed = time.perf_counter() - started
+        await bot.pipeline.queue.join()
+        await bot.stop_claim_services()
+    await server.stop()
+
+    newest_first = [expected[code] for code in submitted if code in expected]
+    waited = (client.flood_retried_at or 0) - (client.flood_raised_at or 0)
+    checks = [
+        ("todos los códigos de la ventana encolados", set(submitted) == set(expected)),
+        ("cada código una sola vez", len(submitted) == len(set(submitted))),
+        ("del más nuevo al más antiguo", newest_first == sorted(newest_first, reverse=True)),
+        ("ninguno anterior a la ventana", not (set(submitted) & old)),
+        ("ninguno ya reclamado", not (set(submitted) & claimed)),
+        (f"solicitudes a la vez <= {concurrency} (máx. {client.max_active})", client.max_active <= concurrency),
+        (f"FloodWait de {flood_seconds} s respetado ({waited:.1f} s)", client.flood_raised_at is not None and waited >= flood_seconds),
+    ]
+    total_messages = sum(len(messages) for messages in history.values())
+    print(f"Historial: {chats} chats, {total_messages} mensajes; {len(expected)} códigos en la ventana de {minutes} min, "
+          f"{len(old)} antiguos, {len(claimed)} ya reclamados")
+    print(f"Recuperación: {elapsed:.2f} s, {client.requests} solicitudes (RTT {rtt * 1000:.0f} ms), {len(submitted)} códigos encolados\n")
+    for label, ok in checks:
+        print(f"{'✅' if ok else '❌'} {label}")
+    return all(ok for _, ok in checks)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Recuperación de mensajes al arrancar contra un historial falso")
+    parser.add_argument("--chats", type=int, default=40)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rtt", type=float, default=0.05, help="segundos por página de 100 mensajes")
+    parser.add_argument("--flood-seconds", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)  # historial SQLite y cachés en un directorio temporal
+        ok = asyncio.run(run(args.chats, args.minutes, args.concurrency, args.rtt, args.flood_seconds, args.seed))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Coste por mensaje de BaseClient.dispatch_message según el veredicto del filtro
+de chats (CHATS / EXCLUDE_CHATS_WITH / ajustes manuales), y comprobaciones de
+su comportamiento:
+
+- con CHATS configurado, los chats que no están en la lista se ignoran también
+  antes de que refresh haya resuelto los nombres,
+- un chat de CHATS (por título o @usuario) se reconoce en su primer mensaje
+  aunque aún no se haya resuelto su id,
+- al unirse a chats o renombrarlos se vuelve a ejecutar refresh, una sola vez
+  por ráfaga de eventos.
+
+    python -m benchmarks.chatfilter --iterations 50000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from benchmarks.e2e import BenchConfig, FILLER_MESSAGES, SyntheticEvent
+
+
+ALLOWED_ID = -1001
+NAMED_ID = -1002       # en CHATS por título, id sin resolver al arrancar
+USERNAME_ID = -1003    # en CHATS por @usuario
+EXCLUDED_ID = -1004    # en CHATS, pero con una palabra excluida en el título
+OTHER_ID = -1005       # fuera de CHATS
+IGNORED_ID = -1006     # /ignorar
+
+
+class ChatEvent(SyntheticEvent):
+    """SyntheticEvent con el chat que trae la actualización (título y @usuario)."""
+
+    def __init__(self, text: str, chat_id: int, title: Optional[str] = None, username: Optional[str] = None):
+        super().__init__(text, chat_id=chat_id, sender_id=5000)
+        self.chat = SimpleNamespace(title=title, username=username) if title or username else None
+
+
+class FakeDialogsClient:
+    """Lo que ChatFilter.refresh usa de TelegramClient: iter_dialogs con contador de llamadas."""
+
+    def __init__(self, dialogs: Dict[int, str]):
+        self.dialogs = dialogs
+        self.calls = 0
+
+    async def iter_dialogs(self, **kwargs):
+        self.calls += 1
+        for chat_id, title in self.dialogs.items():
+            yield SimpleNamespace(id=chat_id, name=title, entity=SimpleNamespace(id=chat_id, title=title, username=None))
+
+
+def chat_action(chat_id: int, **fields) -> SimpleNamespace:
+    action = dict(new_title=None, created=False, user_joined=False, user_added=False)
+    action.update(fields)
+    return SimpleNamespace(chat_id=chat_id, **action)
+
+
+async def dispatch_cost(bot, event: ChatEvent, iterations: int) -> float:
+    """µs por llamada a dispatch_message con el mismo evento."""
+    await bot.dispatch_message(event)  # el primer mensaje calcula y guarda el veredicto
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await bot.dispatch_message(event)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def run(iterations: int) -> bool:
+    from lib.api.telegram import BaseClient
+    from source.logger import logger
+
+    config = BenchConfig()
+    config.CHATS = [ALLOWED_ID, "Canal Señales", "@cajas_bot", "Intel Cajas"]
+    config.EXCLUDE_CHATS_WITH = ["intel"]
+    config.CHAT_FILTER_REFRESH_SECONDS = 0.2
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot = BaseClient(config)
+        logger.enabled = False
+    chat_filter = bot.chat_filter
+    short, long_text = FILLER_MESSAGES[3], " ".join(FILLER_MESSAGES) * 3
+
+    # Antes de refresh: nombres sin resolver
+    filtered = chat_filter.filtered
+    await bot.dispatch_message(ChatEvent(short, OTHER_ID, title="Otro canal"))
+    other_before_refresh = chat_filter.filtered == filtered + 1
+    filtered = chat_filter.filtered
+    await bot.dispatch_message(ChatEvent(short, OTHER_ID + 100))  # sin título todavía
+    untitled_before_refresh = chat_filter.filtered == filtered + 1
+    await bot.dispatch_message(ChatEvent(short, NAMED_ID, title="Canal Señales"))
+    await bot.dispatch_message(ChatEvent(short, USERNAME_ID, title="Cajas", username="cajas_bot"))
+    named_first_message = NAMED_ID in chat_filter.allowed and USERNAME_ID in chat_filter.allowed
+    filtered = chat_filter.filtered
+    await bot.dispatch_message(ChatEvent(short, EXCLUDED_ID, title="Intel Cajas"))
+    excluded_wins = chat_filter.filtered == filtered + 1
+
+    # Unirse a un chat o renombrarlo: una sola vuelta por los diálogos por ráfaga
+    renamed_id = -1007
+    bot.client = FakeDialogsClient({ALLOWED_ID: "Principal", NAMED_ID: "Canal Señales", renamed_id: "Canal Señales 2"})
+    bot.chat_filter.chats.append("Canal Señales 2")
+    bot.chat_filter.names.add("canal señales 2")
+    await bot.refresh_chat_filter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(20):
+            await bot.on_chat_action(chat_action(OTHER_ID, user_joined=True))
+        await bot.on_chat_action(chat_action(renamed_id, new_title="Canal Señales 2"))
+        await bot._chat_filter_task
+    refreshes = bot.client.calls
+    refreshed = renamed_id in chat_filter.allowed
+    chat_filter.block(IGNORED_ID)
+
+    cases = [
+        ("permitido, texto corto", ChatEvent(short, ALLOWED_ID, title="Principal")),
+        ("permitido, texto largo", ChatEvent(long_text, ALLOWED_ID, title="Principal")),
+        ("excluido por título", ChatEvent(short, EXCLUDED_ID, title="Intel Cajas")),
+        ("bloqueado con /ignorar", ChatEvent(short, IGNORED_ID, title="Ruido")),
+        ("fuera de CHATS", ChatEvent(short, OTHER_ID, title="Otro canal")),
+    ]
+    print(f"dispatch_message, {iterations} iteraciones por caso:")
+    for label, event in cases:
+        print(f"  {label:<26} {await dispatch_cost(bot, event, iterations):8.2f} µs")
+    print()
+
+    checks = [
+        ("fuera de CHATS antes de resolver los nombres: ignorado", other_before_refresh),
+        ("chat sin título con CHATS configurado: ignorado", untitled_before_refresh),
+        ("chat de CHATS por título o @usuario: procesado desde su primer mensaje", named_first_message),
+        ("EXCLUDE_CHATS_WITH gana a CHATS", excluded_wins),
+        (f"refresh tras unirse/renombrar, una vez por ráfaga ({refreshes - 1} de 21 eventos)", refreshed and refreshes == 2),
+    ]
+    for label, ok in checks:
+        print(f"{'✅' if ok else '❌'} {label}")
+    return all(ok for _, ok in checks)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Coste y comportamiento del filtro de chats")
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)  # caché de entidades en un directorio temporal
+        ok = asyncio.run(run(args.iterations))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
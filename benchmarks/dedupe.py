@@ -0,0 +1,86 @@
+"""
+Comprobación de códigos ya procesados con la lista processed_tokens de antes
+frente a DedupeCache, con 1M de códigos: coste de cada comprobación y memoria
+de la estructura (sin contar las cadenas de los códigos, que comparten ambas).
+
+También se mide la caché con el tope por defecto (DEDUPE_MAX_SIZE = 100k),
+que es lo que ocupa en un proceso de larga duración.
+
+    python -m benchmarks.dedupe --codes 1000000 --checks 1000000
+"""
+import argparse
+import random
+import string
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Tuple
+
+from lib.dedupe import DedupeCache
+
+
+def random_codes(count: int, rng: random.Random) -> List[str]:
+    alphabet = string.ascii_uppercase + string.digits
+    return ["".join(rng.choices(alphabet, k=8)) for _ in range(count)]
+
+
+def build(factory: Callable[[], object], add: Callable[[object, str], object], codes: List[str]) -> Tuple[object, float]:
+    """Estructura con todos los códigos y los MiB reservados al construirla."""
+    tracemalloc.start()
+    structure = factory()
+    for code in codes:
+        add(structure, code)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return structure, size / 2 ** 20
+
+
+def per_check(structure, probes: List[str]) -> float:
+    """µs por comprobación `code in structure`."""
+    started = time.perf_counter()
+    for code in probes:
+        code in structure
+    return (time.perf_counter() - started) / len(probes) * 1e6
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="processed_tokens (lista) frente a DedupeCache")
+    parser.add_argument("--codes", type=int, default=1_000_000)
+    parser.add_argument("--checks", type=int, default=1_000_000)
+    parser.add_argument("--list-checks", type=int, default=20, help="la lista tarda milisegundos por comprobación")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    codes = random_codes(args.codes, rng)
+    # Mitad códigos ya vistos, mitad nuevos (recorren la lista entera)
+    unseen = random_codes(args.checks // 2, rng)
+    probes = rng.choices(codes, k=args.checks - len(unseen)) + unseen
+    rng.shuffle(probes)
+
+    variants = [
+        ("lista", lambda: [], list.append, probes[:args.list_checks]),
+        ("DedupeCache", lambda: DedupeCache(max_size=args.codes), DedupeCache.add_if_absent, probes),
+        ("DedupeCache 100k", lambda: DedupeCache(), DedupeCache.add_if_absent, probes),
+    ]
+    print(f"{args.codes:,} códigos\n")
+    results = {}
+    for name, factory, add, variant_probes in variants:
+        structure, mib = build(factory, add, codes)
+        cost = per_check(structure, variant_probes)
+        results[name] = structure
+        print(f"{name:<17} {cost:12.2f} µs por comprobación  {mib:7.1f} MiB  {len(structure):>9,} entradas")
+
+    capped = results["DedupeCache 100k"]
+    checks = [
+        ("DedupeCache con el tope de 1M: no expulsa ningún código", len(results["DedupeCache"]) == len(set(codes)) and codes[0] in results["DedupeCache"]),
+        ("tope de 100k: se conservan los más recientes", len(capped) == min(args.codes, 100_000) and codes[-1] in capped),
+        ("add_if_absent rechaza un código repetido", not capped.add_if_absent(codes[-1])),
+    ]
+    print()
+    for label, ok in checks:
+        print(f"{'✅' if ok else '❌'} {label}")
+    raise SystemExit(0 if all(ok for _, ok in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Benchmark de extremo a extremo sin Telegram ni Binance reales.
+
+Genera mensajes sintéticos con la forma de los eventos de Telethon, los pasa
+por BaseClient.dispatch_message a un ritmo configurable y reclama los códigos
+contra un servidor grabV2 local (FakeBinanceServer).
+
+    python -m benchmarks.e2e --rate 500 --duration 10 --code-ratio 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.fake_binance import DEFAULT_WEIGHTS, FakeBinanceServer
+from lib.api.telegram import BaseClient
+from lib.metrics import MetricsServer
+from source.logger import logger
+
+
+FILLER_MESSAGES = [
+    "gm fam, market is pumping today, BTC above 100k, who is holding?",
+    "Airdrop announcement: join our channel https://t.me/somechannel for more updates and giveaways",
+    "Recuerden que mañana hay mantenimiento programado de 2 a 4 am",
+    "lol",
+    "Nuevo análisis técnico de ETH en el canal premium 📈",
+]
+
+CODE_TEMPLATES = [
+    "🎁 Binance Red Packet\n🔑 Code: {code}\nFirst come first served!",
+    "Nuevo código BOX: {code} válido por 24h 🚀🚀",
+    "Redpacket code {code}",
+    "Claim fast!!\n\n{code}\n\nDon't miss",
+]
+
+
+class BenchConfig:
+    """Configuración mínima para ejecutar BaseClient contra el servidor falso."""
+    API_ID = 0
+    API_HASH = ""
+    BOT_TOKEN = ""
+    ADMIN_CHAT_ID = 0
+    ADMIN_USER_ID = 0
+    MAX_HOUR_REQUESTS = 0
+    REQUEST_DELAY_SECONDS = 0
+    BINANCE_KEEP_WARM_SECONDS = 0
+    headers = {"User-Agent": "benchmark", "content-type": "application/json"}
+
+
+class SyntheticEvent:
+    """Evento con los atributos de telethon.events.NewMessage.Event que usa BaseClient."""
+
+    def __init__(self, text: str, chat_id: int, sender_id: int):
+        self.raw_text = text
+        self.text = text
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        self.out = False
+        self.is_private = False
+        self.date = datetime.now(timezone.utc)
+        self.message = self
+
+    async def respond(self, *args, **kwargs) -> None:
+        return None
+
+
+def random_code(rng: random.Random) -> str:
+    while True:
+        code = "".join(rng.choices(string.ascii_uppercase + string.digits, k=8))
+        if not code.isalpha() and not code.isdigit():
+            return code
+
+
+def build_messages(count: int, code_ratio: float, rng: random.Random) -> List[str]:
+    messages = []
+    for _ in range(count):
+        if rng.random() < code_ratio:
+            messages.append(rng.choice(CODE_TEMPLATES).format(code=random_code(rng)))
+        else:
+            messages.append(rng.choice(FILLER_MESSAGES))
+    return messages
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    weights = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+async def run(
+    rate: float,
+    duration: float,
+    code_ratio: float,
+    workers: int,
+    weights: Dict[str, float],
+    slow_seconds: float,
+    timeout_seconds: float,
+    seed: Optional[int] = None,
+    quiet: bool = True,
+    log_level: str = "info",
+    profiles: int = 1,
+    max_hour: int = 0,
+    dispatch_mode: str = "all",
+    scrape: bool = False,
+) -> Dict[str, float]:
+    """Ejecuta un escenario y devuelve las métricas."""
+    rng = random.Random(seed)
+    server = FakeBinanceServer(weights, slow_seconds=slow_seconds, timeout_seconds=timeout_seconds, seed=seed)
+    base_url = await server.start()
+
+    config = BenchConfig()
+    config.BINANCE_BASE_URL = base_url
+    config.BINANCE_TIMEOUT_SECONDS = max(1.0, slow_seconds * 2)
+    config.CLAIM_WORKERS = workers
+    config.CLAIM_QUEUE_SIZE = 100_000
+    config.LOG_LEVEL = log_level
+    config.MAX_HOUR_REQUESTS = max_hour
+    config.CLAIM_DISPATCH_MODE = dispatch_mode
+    if profiles > 1:
+        config.BINANCE_PROFILES = [{"name": f"cuenta{i + 1}", "headers": dict(config.headers)} for i in range(profiles)]
+
+    messages = build_messages(int(rate * duration), code_ratio, rng)
+    output = io.StringIO() if quiet else sys.stdout
+
+    with contextlib.redirect_stdout(output):
+        client = BaseClient(config)
+        logger.enabled = log_level != "off"
+        await client.start_claim_services()
+        client.setup_command_handlers()
+        metrics_server = MetricsServer(client, port=0) if scrape else None
+        metrics_url = await metrics_server.start() if metrics_server else None
+
+        dispatch_time = 0.0
+        interval = 1.0 / rate if rate > 0 else 0.0
+        started = time.perf_counter()
+        for index, text in enumerate(messages):
+            # Mantener el ritmo objetivo sin acumular deriva
+            target = started + index * interval
+            delay = target - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            event = SyntheticEvent(text, chat_id=-1000 - index % 20, sender_id=1000 + index % 50)
+            t0 = time.perf_counter()
+            await client.dispatch_message(event)
+            dispatch_time += time.perf_counter() - t0
+        ingest_elapsed = time.perf_counter() - started
+
+        await client.pipeline.queue.join()
+        elapsed = time.perf_counter() - started
+        latency = client.manipulator.latency.percentiles()
+        claimed = client.pipeline.processed
+        requests = sum(profile.requests for profile in client.manipulator.profiles)
+        boxes = sum(profile.claimed for profile in client.manipulator.profiles)
+        scraped = ""
+        if metrics_server:
+            # Consulta real por HTTP, como la haría Prometheus
+            async with aiohttp.ClientSession() as session:
+                async with session.get(metrics_url) as response:
+                    scraped = await response.text()
+            await metrics_server.stop()
+        await client.stop_claim_services()
+        logger.close()
+
+    await server.stop()
+    total = latency.get("total", {})
+    return {
+        "messages": len(messages),
+        "messages_per_sec": len(messages) / ingest_elapsed if ingest_elapsed else 0.0,
+        "dispatch_capacity_per_sec": len(messages) / dispatch_time if dispatch_time else 0.0,
+        "codes_claimed": claimed,
+        "codes_per_sec": claimed / elapsed if elapsed else 0.0,
+        "binance_requests": requests,
+        "boxes_claimed": boxes,
+        "p50_ms": total.get("p50", 0.0),
+        "p99_ms": total.get("p99", 0.0),
+        "server_hits": dict(server.hits),
+        "metrics": scraped,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo con un grabV2 local")
+    parser.add_argument("--rate", type=float, default=200, help="mensajes por segundo")
+    parser.add_argument("--duration", type=float, default=5, help="segundos de envío de mensajes")
+    parser.add_argument("--code-ratio", type=float, default=0.2, help="fracción de mensajes con código")
+    parser.add_argument("--workers", type=int, default=4, help="workers de reclamo")
+    parser.add_argument(
+        "--weights",
+        type=parse_weights,
+        default=DEFAULT_WEIGHTS,
+        help="pesos de escenarios, p. ej. success=30,403802=50,403803=15,slow=5,timeout=0",
+    )
+    parser.add_argument("--slow-ms", type=float, default=200, help="retardo del escenario 'slow'")
+    parser.add_argument("--timeout-s", type=float, default=10, help="retardo del escenario 'timeout'")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="info", help="debug, info, warning, error u off")
+    parser.add_argument("--profiles", type=int, default=1, help="cuentas de Binance simuladas")
+    parser.add_argument("--max-hour", type=int, default=0, help="MAX_HOUR_REQUESTS por cuenta (0 = ilimitado)")
+    parser.add_argument("--dispatch", default="all", help="CLAIM_DISPATCH_MODE: all o budget")
+    parser.add_argument("--scrape", action="store_true", help="servir /metrics en un puerto libre y consultarlo al terminar")
+    parser.add_argument("--verbose", action="store_true", help="no silenciar la salida del bot")
+    args = parser.parse_args(argv)
+
+    # El bot escribe en data/ relativo al directorio actual: usar uno temporal
+    os.chdir(tempfile.mkdtemp(prefix="hau5-bench-"))
+
+    result = asyncio.run(run(
+        rate=args.rate,
+        duration=args.duration,
+        code_ratio=args.code_ratio,
+        workers=args.workers,
+        weights=args.weights,
+        slow_seconds=args.slow_ms / 1000,
+        timeout_seconds=args.timeout_s,
+        seed=args.seed,
+        quiet=not args.verbose,
+        log_level=args.log_level,
+        profiles=args.profiles,
+        max_hour=args.max_hour,
+        dispatch_mode=args.dispatch,
+        scrape=args.scrape,
+    ))
+
+    print(f"Mensajes:               {result['messages']}")
+    print(f"Mensajes/s (entrada):   {result['messages_per_sec']:.1f}")
+    print(f"Capacidad del dispatch: {result['dispatch_capacity_per_sec']:.1f} mensajes/s")
+    print(f"Códigos reclamados:     {result['codes_claimed']} ({result['codes_per_sec']:.1f}/s)")
+    print(f"Solicitudes a Binance:  {result['binance_requests']} ({result['boxes_claimed']} cajas canjeadas)")
+    print(f"Recepción -> respuesta: p50 {result['p50_ms']:.1f} ms | p99 {result['p99_ms']:.1f} ms")
+    print(f"Escenarios servidos:    {result['server_hits']}")
+    if result["metrics"]:
+        samples = [line for line in result["metrics"].splitlines() if line and not line.startswith("#")]
+        print(f"\n/metrics: {len(samples)} muestras")
+        for line in samples:
+            if not line.startswith(("hau5_messages_received_total", "hau5_binance_request_seconds_bucket")):
+                print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
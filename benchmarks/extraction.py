@@ -0,0 +1,149 @@
+"""
+Microbenchmark de la extracción de códigos por mensaje.
+
+Construye un corpus de objetos Message de Telethon con la forma de los que
+llegan en las actualizaciones (texto normal, pie de foto, enlaces con texto,
+botones inline con URL o texto a copiar, vista previa web) y compara:
+
+- solo raw_text (como antes), y
+- raw_text + message_extra_text en una única pasada del extractor.
+
+Muestra el coste por mensaje y cuántos de los códigos sembrados se detectan:
+
+    python -m benchmarks.extraction --messages 5000 --iterations 20
+"""
+import argparse
+import random
+import string
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
+
+from telethon.tl import types
+
+from benchmarks.e2e import CODE_TEMPLATES, FILLER_MESSAGES
+from lib.extractor import CodeExtractor, message_extra_text
+
+
+def random_code(rng: random.Random) -> str:
+    while True:
+        code = "".join(rng.choices(string.ascii_uppercase + string.digits, k=8))
+        if not code.isalpha() and not code.isdigit():
+            return code
+
+
+def _message(text: str, **kwargs) -> types.Message:
+    return types.Message(
+        id=1, peer_id=types.PeerChannel(1), date=datetime.now(timezone.utc), message=text, **kwargs
+    )
+
+
+def _inline(*buttons) -> types.ReplyInlineMarkup:
+    return types.ReplyInlineMarkup(rows=[types.KeyboardInlineButtonRow(buttons=list(buttons))])
+
+
+def build_message(kind: str, rng: random.Random) -> Tuple[types.Message, Optional[str]]:
+    """Devuelve el mensaje y el código sembrado (None si no lleva)."""
+    code = random_code(rng)
+    if kind == "texto":
+        return _message(rng.choice(FILLER_MESSAGES)), None
+    if kind == "codigo_texto":
+        return _message(rng.choice(CODE_TEMPLATES).format(code=code)), code
+    if kind == "pie_de_foto":
+        return _message(f"🎁 Nueva caja\nCode: {code}", media=types.MessageMediaPhoto()), code
+    if kind == "enlace_oculto":
+        label = "👉 Reclamar aquí"
+        url = f"https://www.binance.com/en/my/wallet/account/payment/cryptobox/{code}"
+        entity = types.MessageEntityTextUrl(offset=0, length=len(label), url=url)
+        return _message(f"{label}\nSolo los primeros 100", entities=[entity]), code
+    if kind == "boton_url":
+        button = types.KeyboardInlineButton(
+            text="🎁 Abrir caja", type=types.InlineButtonTypeUrl(url=f"https://app.binance.com/redpacket?code={code}")
+        )
+        return _message("Caja nueva, pulsa el botón 👇", reply_markup=_inline(button)), code
+    if kind == "boton_copiar":
+        button = types.KeyboardInlineButton(text="📋 Copiar código", type=types.InlineButtonTypeCopy(copy_text=code))
+        return _message("Código en el botón", reply_markup=_inline(button)), code
+    if kind == "vista_previa":
+        webpage = types.WebPage(
+            id=1, url=f"https://s.binance.com/cryptobox/{code}", display_url="s.binance.com", hash=0,
+            title="Binance Crypto Box", description=f"Redpacket code {code}"
+        )
+        return _message("https://s.binance.com/…", media=types.MessageMediaWebPage(webpage=webpage)), code
+    # Botones y vista previa sin códigos: coste de recorrerlos sin encontrar nada
+    button = types.KeyboardInlineButton(text="Únete", type=types.InlineButtonTypeUrl(url="https://t.me/somechannel"))
+    return _message(rng.choice(FILLER_MESSAGES), reply_markup=_inline(button)), None
+
+
+KINDS = [
+    ("texto", 0.70), ("codigo_texto", 0.08), ("pie_de_foto", 0.04), ("enlace_oculto", 0.04),
+    ("boton_url", 0.04), ("boton_copiar", 0.03), ("vista_previa", 0.03), ("boton_sin_codigo", 0.04),
+]
+
+
+def build_corpus(count: int, seed: int = 7) -> List[Tuple[str, types.Message, Optional[str]]]:
+    rng = random.Random(seed)
+    names = [name for name, _ in KINDS]
+    weights = [weight for _, weight in KINDS]
+    corpus = []
+    for _ in range(count):
+        kind = rng.choices(names, weights)[0]
+        message, code = build_message(kind, rng)
+        corpus.append((kind, message, code))
+    return corpus
+
+
+def raw_only(extractor: CodeExtractor, message: types.Message) -> Set[str]:
+    return {candidate.code for candidate in extractor.extract(message.message or "")}
+
+
+def full(extractor: CodeExtractor, message: types.Message) -> Set[str]:
+    text = message.message or ""
+    extra = message_extra_text(message)
+    return {candidate.code for candidate in extractor.extract(f"{text}\n{extra}" if extra else text)}
+
+
+def measure(func, extractor, messages, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for message in messages:
+            func(extractor, message)
+    return (time.perf_counter() - started) / (iterations * len(messages)) * 1e9
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Coste y cobertura de la extracción de códigos por mensaje")
+    parser.add_argument("--messages", type=int, default=5000, help="mensajes en el corpus")
+    parser.add_argument("--iterations", type=int, default=20, help="pasadas sobre el corpus")
+    args = parser.parse_args(argv)
+
+    extractor = CodeExtractor()
+    corpus = build_corpus(args.messages)
+    planted = sum(1 for _, _, code in corpus if code)
+    print(f"Corpus: {len(corpus)} mensajes, {planted} con código\n")
+
+    print(f"{'tipo':<18} {'n':>5} {'solo raw_text':>22} {'raw_text + extra':>22}")
+    totals = {"raw": [0, 0.0], "full": [0, 0.0]}
+    for kind, _ in KINDS:
+        group = [(message, code) for name, message, code in corpus if name == kind]
+        if not group:
+            continue
+        messages = [message for message, _ in group]
+        row = []
+        for label, func in (("raw", raw_only), ("full", full)):
+            found = sum(1 for message, code in group if code and code in func(extractor, message))
+            nanoseconds = measure(func, extractor, messages, args.iterations)
+            totals[label][0] += found
+            totals[label][1] += nanoseconds * len(group)
+            with_code = sum(1 for _, code in group if code)
+            row.append(f"{nanoseconds:6.0f} ns {found:>4}/{with_code:<4}")
+        print(f"{kind:<18} {len(group):>5} {row[0]:>22} {row[1]:>22}")
+
+    print()
+    for label, name in (("raw", "solo raw_text"), ("full", "raw_text + extra")):
+        found, weighted = totals[label]
+        print(f"{name:<18} {weighted / len(corpus):6.0f} ns/mensaje, {found}/{planted} códigos detectados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import asyncio
+import random
+import ssl
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from lib.api.binance import BinanceAPI
+
+
+# Cuerpos de respuesta que imitan a grabV2 para cada escenario
+RESPONSES: Dict[str, dict] = {
+    "success": {"success": True, "code": "000000", "data": {"currency": "USDT", "grabAmountStr": "0.25"}},
+    "403802": {"success": False, "code": "403802", "message": "This crypto box has been fully claimed.", "data": {}},
+    "403803": {"success": False, "code": "403803", "message": "Invalid code.", "data": {}},
+    "403067": {"success": False, "code": "403067", "message": "Too many attempts, please try again after 00:05", "data": {}},
+    "captcha": {"success": False, "code": "100001005", "message": "Captcha required.", "data": {"validateId": "bench-captcha"}},
+    "100002001": {"success": False, "code": "100002001", "message": "Please log in first.", "data": {}},
+}
+
+DEFAULT_WEIGHTS: Dict[str, float] = {"success": 30, "403802": 50, "403803": 15, "slow": 5}
+
+
+class FakeBinanceServer:
+    """
+    Servidor aiohttp local que emula el endpoint grabV2 de Binance.
+
+    Cada solicitud recibe un escenario elegido por pesos: las claves de
+    RESPONSES, "slow" (403802 tras `slow_seconds`) o "timeout" (no responde en
+    `timeout_seconds`).
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        slow_seconds: float = 0.2,
+        timeout_seconds: float = 10,
+        seed: Optional[int] = None,
+    ):
+        self.weights: Dict[str, float] = dict(weights or DEFAULT_WEIGHTS)
+        self.slow_seconds: float = slow_seconds
+        self.timeout_seconds: float = timeout_seconds
+        self.random = random.Random(seed)
+        self.hits: Dict[str, int] = {}
+        self.base_url: Optional[str] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def _pick(self) -> str:
+        scenarios = list(self.weights)
+        return self.random.choices(scenarios, weights=[self.weights[s] for s in scenarios])[0]
+
+    async def _grab(self, request: web.Request) -> web.Response:
+        await request.json()
+        scenario = self._pick()
+        self.hits[scenario] = self.hits.get(scenario, 0) + 1
+        if scenario == "slow":
+            await asyncio.sleep(self.slow_seconds)
+            scenario = "403802"
+        elif scenario == "timeout":
+            await asyncio.sleep(self.timeout_seconds)
+            scenario = "403802"
+        return web.json_response(RESPONSES[scenario])
+
+    async def _ping(self, request: web.Request) -> web.Response:
+        return web.Response()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, ssl_context: Optional[ssl.SSLContext] = None) -> str:
+        """Arranca el servidor (HTTPS si se pasa ssl_context) y devuelve su URL base."""
+        app = web.Application()
+        app.router.add_post(BinanceAPI.GRAB_PATH, self._grab)
+        app.router.add_route("HEAD", "/", self._ping)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port, ssl_context=ssl_context)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"{'https' if ssl_context else 'http'}://{host}:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
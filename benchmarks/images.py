@@ -0,0 +1,148 @@
+"""
+Benchmark de la decodificación de QR en fotos.
+
+Decodifica las imágenes de una carpeta (o, sin --folder, unas de muestra
+generadas con OpenCV: QR con un código sobre fotos con ruido y fotos sin QR)
+de tres formas y mide imágenes/s, latencia por imagen y cuánto se detiene
+el bucle de eventos mientras tanto:
+
+- en el propio bucle (lo que pasaría sin el grupo de procesos),
+- con ImageDecoder y 1..N procesos.
+
+    python -m benchmarks.images --folder fotos/ --workers 1,2,4
+
+Requiere opencv-python-headless.
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import tempfile
+import time
+from typing import List, Tuple
+
+from lib.extractor import CodeExtractor
+from lib.imagecodes import ImageDecoder, decode_image, decoded_text
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def generate_samples(folder: str, count: int, seed: int = 3) -> None:
+    """Fotos de 1280x960 con ruido; la mitad lleva un QR con un código de caja."""
+    import cv2
+    import numpy
+
+    rng = random.Random(seed)
+    noise = numpy.random.default_rng(seed)
+    encoder = cv2.QRCodeEncoder.create()
+    for index in range(count):
+        image = noise.integers(90, 200, size=(960, 1280, 3), dtype=numpy.uint8)
+        if index % 2 == 0:
+            code = "".join(rng.choices(string.ascii_uppercase, k=4) + rng.choices(string.digits, k=4))
+            payload = code if index % 4 == 0 else f"https://s.binance.com/cryptobox/{code}"
+            qr = cv2.resize(encoder.encode(payload), (360, 360), interpolation=cv2.INTER_NEAREST)
+            qr = cv2.copyMakeBorder(qr, 24, 24, 24, 24, cv2.BORDER_CONSTANT, value=255)
+            top, left = rng.randint(0, 960 - qr.shape[0]), rng.randint(0, 1280 - qr.shape[1])
+            image[top:top + qr.shape[0], left:left + qr.shape[1]] = cv2.cvtColor(qr, cv2.COLOR_GRAY2BGR)
+        cv2.imwrite(os.path.join(folder, f"muestra_{index:03d}.jpg"), image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+
+
+def load_images(folder: str) -> List[Tuple[str, bytes]]:
+    images = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(folder, name), "rb") as file:
+                images.append((name, file.read()))
+    return images
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Mayor retraso observado de un temporizador de `interval` segundos."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run_inline(images: List[Tuple[str, bytes]]) -> Tuple[float, List[float], List[List[str]], float]:
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    await asyncio.sleep(0)
+    latencies, results = [], []
+    started = time.perf_counter()
+    for _, data in images:
+        image_started = time.perf_counter()
+        results.append(decode_image(data))
+        latencies.append(time.perf_counter() - image_started)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return elapsed, latencies, results, await lag
+
+
+async def run_pool(images: List[Tuple[str, bytes]], workers: int) -> Tuple[float, List[float], List[List[str]], float]:
+    decoder = ImageDecoder(workers=workers, max_pending=len(images))
+    decoder.warm_up()
+    await asyncio.gather(*(decoder.decode(data) for _, data in images[:workers]))  # procesos listos
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    latencies: List[float] = [0.0] * len(images)
+
+    async def one(index: int, data: bytes) -> List[str]:
+        image_started = time.perf_counter()
+        texts = await decoder.decode(data)
+        latencies[index] = time.perf_counter() - image_started
+        return texts
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(index, data) for index, (_, data) in enumerate(images)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    decoder.close()
+    return elapsed, latencies, list(results), await lag
+
+
+def report(label: str, images, elapsed: float, latencies: List[float], results, lag: float) -> None:
+    extractor = CodeExtractor()
+    codes = sum(1 for texts in results if extractor.extract(decoded_text(texts)))
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    print(
+        f"{label:<18} {len(images) / elapsed:7.1f} img/s  p50 {p50:6.1f} ms  "
+        f"bucle detenido hasta {lag * 1000:7.1f} ms  con código: {codes}/{len(images)}"
+    )
+
+
+async def main_async(args) -> None:
+    with tempfile.TemporaryDirectory() as temporary:
+        folder = args.folder
+        if not folder:
+            folder = temporary
+            generate_samples(folder, args.samples)
+        images = load_images(folder)
+        if not images:
+            raise SystemExit(f"No hay imágenes en {folder}")
+        total_bytes = sum(len(data) for _, data in images)
+        print(f"{len(images)} imágenes ({total_bytes / len(images) / 1024:.0f} KiB de media) en {folder}\n")
+
+        report("en el bucle", images, *await run_inline(images))
+        for workers in args.workers:
+            report(f"{workers} proceso(s)", images, *await run_pool(images, workers))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Imágenes/s y bloqueo del bucle al decodificar QR")
+    parser.add_argument("--folder", default="", help="carpeta con imágenes (por defecto, muestras generadas)")
+    parser.add_argument("--samples", type=int, default=40, help="imágenes de muestra a generar")
+    parser.add_argument("--workers", default="1,2,4", help="procesos a probar, separados por comas")
+    args = parser.parse_args(argv)
+    args.workers = [int(value) for value in args.workers.split(",") if value]
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Varias instancias del bot (procesos aparte, cada una con su propio directorio
+data/) reciben los mismos códigos casi a la vez y los reclaman contra un único
+servidor grabV2 local. El servidor cuenta las solicitudes por código:
+
+- sin coordinación (""), cada código se intenta una vez por instancia,
+- con "sqlite" o "socket", una sola vez entre todas.
+
+Para cada modo se comprueba que todos los códigos se intentan y, con
+coordinación, que ninguno se intenta dos veces; también se mide cuánto tarda
+la reserva (ManipulateToken.coordinator.claim) en cada instancia.
+
+Con coordinación se prueba además el reintento de un código retenido: la
+sesión de Binance expira al reclamarlo, la reserva queda libre para otras
+instancias y, al recargar credenciales (reload_config), la misma instancia
+vuelve a reservarlo y a enviarlo a grabV2.
+
+    python -m benchmarks.instances --instances 4 --codes 300 --backends ,sqlite,socket
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from aiohttp import web
+
+from benchmarks.e2e import BenchConfig, random_code
+from benchmarks.fake_binance import RESPONSES, FakeBinanceServer
+
+
+class CountingBinanceServer(FakeBinanceServer):
+    """FakeBinanceServer que anota cuántas veces se pidió cada código (sin escenarios lentos)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.codes: Dict[str, int] = {}
+
+    async def _grab(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        code = body.get("grabCode", "")
+        self.codes[code] = self.codes.get(code, 0) + 1
+        scenario = self._pick()
+        self.hits[scenario] = self.hits.get(scenario, 0) + 1
+        return web.json_response(RESPONSES[scenario])
+
+
+def instance_main(index: int, settings: Dict[str, object], arrivals: List[Tuple[float, str]],
+                  ready, go, results) -> None:
+    """Proceso de una instancia: arranca los servicios de reclamo y recibe sus códigos."""
+    os.chdir(settings.pop("directory"))
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        outcome = asyncio.run(_run_instance(index, settings, arrivals, ready, go))
+    results.put(outcome)
+
+
+async def _run_instance(index: int, settings: Dict[str, object], arrivals: List[Tuple[float, str]], ready, go) -> Dict[str, object]:
+    from lib.api.telegram import BaseClient
+    from source.logger import logger
+
+    config = BenchConfig()
+    config.CLIENT_NAME = f"instancia{index}"
+    for key, value in settings.items():
+        setattr(config, key, value)
+    bot = BaseClient(config)
+    logger.enabled = False
+    await bot.start_claim_services()
+    await bot._warm_up_task
+
+    # Tiempo de cada reserva entre instancias, medido alrededor del método del coordinador
+    coordinator = bot.manipulator.coordinator
+    claim = coordinator.claim
+    claim_seconds: List[float] = []
+
+    async def timed_claim(code: str):
+        started = time.perf_counter()
+        try:
+            return await claim(code)
+        finally:
+            claim_seconds.append(time.perf_counter() - started)
+    coordinator.claim = timed_claim
+
+    ready.put(index)
+    await asyncio.to_thread(go.wait)
+    started = time.monotonic()
+    for at, code in arrivals:
+        wait = started + at - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await bot.claim_codes([code])
+    await bot.pipeline.queue.join()
+    elapsed = time.monotonic() - started
+    await bot.stop_claim_services()
+
+    metrics = bot.metrics
+    return {
+        "index": index,
+        "received": len(arrivals),
+        "attempts": sum(count for (_, status), count in metrics.attempts.items()),
+        "other_instance": metrics.dedupe_hits.get("instancia", 0),
+        "claim_seconds": claim_seconds,
+        "elapsed": elapsed,
+    }
+
+
+def build_arrivals(instances: int, codes: int, rate: float, overlap: float, jitter: float,
+                   rng: random.Random) -> Tuple[List[str], List[List[Tuple[float, str]]]]:
+    """
+    Cada código se publica en el segundo i/rate y le llega a cada instancia (con
+    probabilidad `overlap`, al menos a una) con un retraso de hasta `jitter` segundos.
+    """
+    all_codes = []
+    while len(all_codes) < codes:
+        code = random_code(rng)
+        if code not in all_codes:
+            all_codes.append(code)
+    arrivals: List[List[Tuple[float, str]]] = [[] for _ in range(instances)]
+    for position, code in enumerate(all_codes):
+        receivers = [index for index in range(instances) if rng.random() < overlap] or [rng.randrange(instances)]
+        for index in receivers:
+            arrivals[index].append((position / rate + rng.uniform(0, jitter), code))
+    for items in arrivals:
+        items.sort()
+    return all_codes, arrivals
+
+
+async def run_backend(backend: str, instances: int, codes: List[str], arrivals, workers: int) -> bool:
+    from lib.coordination import CoordinationServer
+
+    server = CountingBinanceServer({"success": 30, "403802": 70})
+    base_url = await server.start()
+    coordination = None
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as shared:
+        settings: Dict[str, object] = {
+            "BINANCE_BASE_URL": base_url,
+            "CLAIM_WORKERS": workers,
+            "CLAIM_QUEUE_SIZE": len(codes) + 10,
+            "COORDINATION_BACKEND": backend,
+            "COORDINATION_DB_FILE": os.path.join(shared, "coordination.db"),
+        }
+        if backend == "socket":
+            coordination = CoordinationServer()
+            settings["COORDINATION_ADDRESS"] = f"127.0.0.1:{await coordination.start('127.0.0.1', 0)}"
+
+        ready, results, go = context.Queue(), context.Queue(), context.Event()
+        processes = []
+        for index in range(instances):
+            directory = os.path.join(shared, f"instancia{index}")  # data/ propio, como instancias separadas
+            os.makedirs(directory)
+            process = context.Process(
+                target=instance_main,
+                args=(index, dict(settings, directory=directory), arrivals[index], ready, go, results)
+            )
+            process.start()
+            processes.append(process)
+
+        for _ in processes:
+            await asyncio.to_thread(ready.get, True, 120)
+        go.set()
+        outcomes = [await asyncio.to_thread(results.get, True, 300) for _ in processes]
+        for process in processes:
+            await asyncio.to_thread(process.join)
+
+    if coordination is not None:
+        await coordination.stop()
+    await server.stop()
+
+    received = sum(outcome["received"] for outcome in outcomes)
+    attempts = sum(server.codes.values())
+    duplicated = sum(1 for count in server.codes.values() if count > 1)
+    missing = [code for code in codes if code not in server.codes]
+    claim_seconds = sorted(seconds for outcome in outcomes for seconds in outcome["claim_seconds"])
+    label = backend or "sin coordinar"
+    print(f"== {label}: {instances} instancias, {len(codes)} códigos, {received} recepciones")
+    print(f"   solicitudes a grabV2: {attempts} ({attempts / len(codes):.2f} por código), "
+          f"códigos intentados más de una vez: {duplicated}, sin intentar: {len(missing)}")
+    if claim_seconds and backend:
+        p50 = claim_seconds[len(claim_seconds) // 2] * 1e6
+        p99 = claim_seconds[min(len(claim_seconds) - 1, int(len(claim_seconds) * 0.99))] * 1e6
+        print(f"   reserva entre instancias: p50 {p50:.0f} µs, p99 {p99:.0f} µs, máx {claim_seconds[-1] * 1e6:.0f} µs")
+    for outcome in sorted(outcomes, key=lambda item: item["index"]):
+        print(f"   instancia{outcome['index']}: {outcome['received']} recibidos, {outcome['attempts']} intentos, "
+              f"{outcome['other_instance']} de otra instancia, {outcome['elapsed']:.2f} s")
+
+    checks = [("todos los códigos intentados", not missing)]
+    if backend:
+        checks.append(("ningún código intentado dos veces", duplicated == 0 and attempts == len(codes)))
+    for name, ok in checks:
+        print(f"   {'✅' if ok else '❌'} {name}")
+    print()
+    return all(ok for _, ok in checks)
+
+
+HELD_CONFIG = """
+class BenchConfig:
+    headers = {"User-Agent": "benchmark", "content-type": "application/json",
+               "cookie": "nueva=1", "csrftoken": "nuevo"}
+"""
+
+
+async def run_held_retry(backend: str) -> bool:
+    """Código retenido por sesión expirada -> credenciales nuevas -> se libera y se vuelve a reclamar."""
+    from lib.api.telegram import BaseClient
+    from lib.coordination import CoordinationServer, build_coordinator
+    from source.logger import logger
+
+    server = CountingBinanceServer({"100002001": 1})
+    coordination = None
+    code = "HELD2025"
+    with tempfile.TemporaryDirectory() as directory:
+        config = BenchConfig()
+        config.BINANCE_BASE_URL = await server.start()
+        config.CONFIG_WATCH_SECONDS = 0
+        config.COORDINATION_BACKEND = backend
+        config.COORDINATION_DB_FILE = os.path.join(directory, "coordination.db")
+        if backend == "socket":
+            coordination = CoordinationServer()
+            config.COORDINATION_ADDRESS = f"127.0.0.1:{await coordination.start('127.0.0.1', 0)}"
+        config_file = os.path.join(directory, "config.py")
+        with open(config_file, "w") as f:
+            f.write(HELD_CONFIG)
+
+        cwd = os.getcwd()
+        os.chdir(directory)
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                bot = BaseClient(config)
+                logger.enabled = False
+                bot.config_file = config_file
+                await bot.start_claim_services()
+                await bot._warm_up_task
+                coordinator = bot.manipulator.coordinator
+                own_again = await coordinator.claim("OWNR2025") is None and await coordinator.claim("OWNR2025") is None
+
+                # 1. La sesión expira: el código queda retenido y la cuenta en pausa
+                await bot.claim_codes([code])
+                await bot.pipeline.queue.join()
+                held = [item[0] for item in bot.manipulator.held_codes] == [code]
+
+                # 2. Mientras tanto otra instancia podría reclamarlo
+                other_config = BenchConfig()
+                for name in ("COORDINATION_BACKEND", "COORDINATION_DB_FILE", "COORDINATION_ADDRESS"):
+                    setattr(other_config, name, getattr(config, name, ""))
+                other_config.CLIENT_NAME = "otra"
+                other = build_coordinator(other_config)
+                free_for_others = await other.claim(code) is None
+                await other.release(code)
+                await other.close()
+
+                # 3. Credenciales nuevas: se reanuda la cuenta y el código vuelve a la cola
+                server.weights = {"success": 1}
+                message = await bot.reload_config()
+                await bot.pipeline.queue.join()
+                other_instance_hits = bot.metrics.dedupe_hits.get("instancia", 0)
+                claimed = code in bot.manipulator.successful_claims
+                await bot.stop_claim_services()
+        finally:
+            os.chdir(cwd)
+    if coordination is not None:
+        await coordination.stop()
+    await server.stop()
+
+    checks = [
+        ("la instancia puede volver a reservar su propio código", own_again),
+        ("código retenido tras la sesión expirada", held),
+        ("reserva libre para otras instancias mientras está retenido", free_for_others),
+        (f"reintentado al recargar credenciales ({server.codes.get(code, 0)} solicitudes a grabV2)",
+         server.codes.get(code, 0) == 2 and "Reintentando 1" in message),
+        ("no se confunde con otra instancia y se canjea", other_instance_hits == 0 and claimed),
+    ]
+    print(f"== {backend}: código retenido y reintentado")
+    for name, ok in checks:
+        print(f"   {'✅' if ok else '❌'} {name}")
+    print()
+    return all(ok for _, ok in checks)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Reclamos coordinados entre varias instancias del bot")
+    parser.add_argument("--instances", type=int, default=4)
+    parser.add_argument("--codes", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=200, help="códigos publicados por segundo")
+    parser.add_argument("--overlap", type=float, default=1.0, help="probabilidad de que una instancia vea cada código")
+    parser.add_argument("--jitter-ms", type=float, default=2, help="retraso máximo entre instancias para un mismo código")
+    parser.add_argument("--workers", type=int, default=2, help="CLAIM_WORKERS de cada instancia")
+    parser.add_argument("--backends", default=",sqlite,socket", help="modos a probar, separados por comas (vacío = sin coordinar)")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    codes, arrivals = build_arrivals(args.instances, args.codes, args.rate, args.overlap, args.jitter_ms / 1000, rng)
+    ok = True
+    for backend in args.backends.split(","):
+        ok = asyncio.run(run_backend(backend.strip(), args.instances, codes, arrivals, args.workers)) and ok
+        if backend.strip():
+            ok = asyncio.run(run_held_retry(backend.strip())) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Tiempo que el bucle de eventos queda bloqueado por cada código guardado:
+reescribiendo data/claimed_codes.json entero (como hacía _save_claimed_code
+antes) frente a añadirlo a ClaimJournal, con 10k, 100k y 1M códigos ya
+guardados.
+
+Con el diario se mide append() más una vuelta del bucle (asyncio.sleep(0)),
+de modo que también cuenta lo que el hilo de escritura le quite al bucle
+(compactaciones incluidas). Al final se recarga el diario y se comprueba que
+no falta ningún código.
+
+    python -m benchmarks.journal --sizes 10000 100000 1000000 --appends 3000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import List, Optional, Set
+
+from lib.journal import ClaimJournal
+from source.logger import logger
+
+
+def existing_codes(count: int) -> Set[str]:
+    return {f"C{index:07d}" for index in range(count)}
+
+
+def legacy_save(path: str, codes: Set[str], token: str) -> None:
+    """_save_claimed_code anterior: la lista completa, con sangría, en cada código."""
+    codes.add(token)
+    with open(path, 'w') as f:
+        json.dump(list(codes), f, indent=4)
+
+
+def legacy_latencies(path: str, codes: Set[str], saves: int) -> List[float]:
+    samples = []
+    for index in range(saves):
+        started = time.perf_counter()
+        legacy_save(path, codes, f"N{index:07d}")
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def journal_latencies(journal: ClaimJournal, appends: int) -> List[float]:
+    samples = []
+    for index in range(appends):
+        started = time.perf_counter()
+        journal.append(f"J{index:07d}", "registered")
+        await asyncio.sleep(0)
+        samples.append((time.perf_counter() - started) * 1000)
+    await journal.close()
+    return samples
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_size(directory: str, size: int, appends: int, legacy_saves: int) -> bool:
+    codes = existing_codes(size)
+
+    legacy_file = os.path.join(directory, f"legacy_{size}.json")
+    legacy = legacy_latencies(legacy_file, set(codes), legacy_saves)
+
+    snapshot_file = os.path.join(directory, f"claimed_{size}.json")
+    with open(snapshot_file, 'w') as f:
+        json.dump(list(codes), f, separators=(",", ":"))
+    journal = ClaimJournal(snapshot_file)
+    journal.load()
+    appended = asyncio.run(journal_latencies(journal, appends))
+
+    reloaded = ClaimJournal(snapshot_file).load()
+    complete = len(reloaded) == size + appends
+    print(f"{size:>9,}  {statistics.median(legacy):10.2f} ms"
+          f"  {statistics.median(appended) * 1000:8.1f} µs / {percentile(appended, 0.99) * 1000:8.1f} µs"
+          f"  {'✅' if complete else '❌'} {len(reloaded):,} códigos al recargar")
+    return complete
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Reescritura completa frente al diario de códigos reclamados")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--appends", type=int, default=3000)
+    parser.add_argument("--legacy-saves", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    logger.enabled = False
+    print(f"{'códigos':>9}  {'reescritura p50':>13}  {'diario p50 / p99':>25}")
+    with tempfile.TemporaryDirectory() as directory:
+        ok = all([run_size(directory, size, args.appends, args.legacy_saves) for size in args.sizes])
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
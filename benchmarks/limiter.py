@@ -0,0 +1,98 @@
+"""
+Códigos que llegan con el presupuesto por hora (MAX_HOUR_REQUESTS) agotado.
+
+Con una ventana acortada a unos segundos se comprueba que esos códigos no se
+dan por reclamados (ni en memoria ni en el diario), que se vuelven a encolar
+cuando la ventana libera solicitudes y que, si el bot se detiene antes, al
+arrancar de nuevo no cuentan como reclamados.
+
+    python -m benchmarks.limiter --budget 3 --window 2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+from benchmarks.e2e import BenchConfig
+from benchmarks.instances import CountingBinanceServer
+from lib.journal import ClaimJournal
+from lib.limiter import RateLimiter
+
+
+async def run(budget: int, window: float) -> bool:
+    from lib.api.telegram import BaseClient
+    from source.logger import logger
+
+    server = CountingBinanceServer({"success": 1})
+    first = [f"LIMT{index:03d}A" for index in range(budget * 2)]
+    late = [f"LATE{index:03d}B" for index in range(2)]
+    RateLimiter.WINDOW_SECONDS = window
+    with tempfile.TemporaryDirectory() as directory:
+        config = BenchConfig()
+        config.BINANCE_BASE_URL = await server.start()
+        config.MAX_HOUR_REQUESTS = budget
+        config.CLAIM_QUEUE_SIZE = len(first) + len(late) + 10
+
+        cwd = os.getcwd()
+        os.chdir(directory)
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                bot = BaseClient(config)
+                logger.enabled = False
+                await bot.start_claim_services()
+                manipulator = bot.manipulator
+
+                # 1. Más códigos que presupuesto: los que sobran se aplazan sin darse por reclamados
+                started = time.monotonic()
+                await bot.claim_codes(first)
+                await bot.pipeline.queue.join()
+                deferred = set(manipulator.deferred_codes)
+                not_claimed = not (deferred & manipulator.permanently_claimed_codes)
+
+                # 2. Al liberarse la ventana se vuelven a encolar y se canjean
+                while manipulator.deferred_codes or bot.pipeline.depth or bot.pipeline.busy_workers:
+                    await asyncio.sleep(0.05)
+                    if time.monotonic() - started > window * 4 + 5:
+                        break
+                retried_after = time.monotonic() - started
+                claimed = [code for code in first if code in manipulator.successful_claims]
+
+                # 3. Presupuesto agotado otra vez y el bot se detiene antes de reintentar
+                await bot.claim_codes(late)
+                await bot.pipeline.queue.join()
+                pending_at_stop = set(manipulator.deferred_codes)
+                await bot.stop_claim_services()
+            reloaded = ClaimJournal(os.path.join(directory, "data", "claimed_codes.json")).load()
+        finally:
+            os.chdir(cwd)
+            RateLimiter.WINDOW_SECONDS = 3600
+    await server.stop()
+
+    checks = [
+        (f"{len(first) - budget} de {len(first)} códigos aplazados con presupuesto {budget}", len(deferred) == len(first) - budget),
+        ("los aplazados no cuentan como reclamados", not_claimed),
+        (f"reintentados al liberarse la ventana ({retried_after:.1f} s) y canjeados todos", claimed == first),
+        ("cada código una sola vez en grabV2", all(server.codes.get(code, 0) == 1 for code in first)),
+        ("los aplazados al detener el bot no quedan reclamados tras reiniciar",
+         pending_at_stop == set(late) and not (set(late) & reloaded) and set(first) <= reloaded),
+    ]
+    for label, ok in checks:
+        print(f"{'✅' if ok else '❌'} {label}")
+    return all(ok for _, ok in checks)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Códigos aplazados por presupuesto por hora agotado")
+    parser.add_argument("--budget", type=int, default=3, help="MAX_HOUR_REQUESTS")
+    parser.add_argument("--window", type=float, default=2, help="duración de la ventana deslizante (s)")
+    args = parser.parse_args(argv)
+    raise SystemExit(0 if asyncio.run(run(args.budget, args.window)) else 1)
+
+
+if __name__ == "__main__":
+    main()
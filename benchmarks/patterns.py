@@ -0,0 +1,118 @@
+"""
+Microbenchmark del extractor de códigos frente a la extracción anterior.
+
+La extracción anterior (BaseClient.extract_codes antes de CodeExtractor) pasaba
+el texto a mayúsculas y hacía hasta dos re.findall, y la validación del
+formato se hacía después en ManipulateToken.main. Se comparan ambas sobre un
+corpus de mensajes de canal (la mayoría sin código) y se comprueba qué
+códigos detecta cada una, incluidos textos que no deben dar ninguno
+("GOLD 2025 promo", "BTC 2025 USDT 1000").
+
+    python -m benchmarks.patterns --messages 20000 --rounds 7
+"""
+import argparse
+import random
+import re
+import time
+from typing import Callable, Dict, List, Set, Tuple
+
+from benchmarks.e2e import CODE_TEMPLATES, FILLER_MESSAGES, random_code
+from lib.extractor import CodeExtractor
+
+
+# Textos con números y palabras de 4 letras que no llevan ningún código
+NO_CODE_MESSAGES = [
+    "GOLD 2025 promo",
+    "BTC 2025 USDT 1000",
+    "Evento 2024: premios de 5000 USDT para los 100 primeros",
+    "SOL 1234 ETH 5678 hoy",
+]
+
+# Códigos con guión (la extracción anterior no los veía) o en minúsculas
+EXTRA_FORMATS = [
+    "Código: ABCD-{tail}",
+    "🔑 code: {lower}",
+]
+
+
+def legacy_extract(text: str) -> List[str]:
+    """Extracción anterior más la validación que hacía ManipulateToken.main."""
+    if not text or not isinstance(text, str):
+        return []
+    codes = set(re.findall(r'\b([A-Z0-9]{8})\b', text.upper()))
+    if not codes:
+        codes = set(re.findall(r'\b([A-Z0-9]{8,10})\b', text.upper()))
+    return [
+        code for code in codes
+        if code.isalnum() and code.isupper() and len(code) == 8
+        and any(c.isdigit() for c in code) and any(c.isalpha() for c in code)
+    ]
+
+
+def build_corpus(count: int, code_ratio: float, rng: random.Random) -> List[Tuple[str, Set[str]]]:
+    """Mensajes con los códigos que llevan (conjunto vacío si ninguno)."""
+    corpus = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < code_ratio:
+            code = random_code(rng)
+            corpus.append((rng.choice(CODE_TEMPLATES).format(code=code), {code}))
+        elif roll < code_ratio * 1.2:
+            code = "ABCD" + "".join(rng.choices("0123456789", k=4))
+            template = rng.choice(EXTRA_FORMATS)
+            corpus.append((template.format(tail=code[4:], lower=code.lower()), {code}))
+        elif roll < code_ratio * 1.2 + 0.1:
+            corpus.append((rng.choice(NO_CODE_MESSAGES), set()))
+        else:
+            corpus.append((rng.choice(FILLER_MESSAGES), set()))
+    return corpus
+
+
+def measure(extract: Callable[[str], list], texts: List[str], rounds: int) -> float:
+    """Mejor tiempo por mensaje (µs) de `rounds` pasadas."""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for text in texts:
+            extract(text)
+        best = min(best, (time.perf_counter() - started) / len(texts))
+    return best * 1e6
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Extractor de códigos frente a la extracción anterior")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--code-ratio", type=float, default=0.2)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.messages, args.code_ratio, random.Random(args.seed))
+    texts = [text for text, _ in corpus]
+    extractor = CodeExtractor()
+    implementations: Dict[str, Callable[[str], list]] = {
+        "anterior": legacy_extract,
+        "CodeExtractor": lambda text: [candidate.code for candidate in extractor.extract(text)],
+    }
+
+    # Pasadas alternadas para que el ruido de la máquina afecte a ambas por igual
+    timings: Dict[str, float] = {name: float("inf") for name in implementations}
+    for _ in range(args.rounds):
+        for name, extract in implementations.items():
+            timings[name] = min(timings[name], measure(extract, texts, 1))
+
+    expected = sum(len(codes) for _, codes in corpus)
+    print(f"{len(corpus)} mensajes, {expected} códigos sembrados\n")
+    for name, extract in implementations.items():
+        found = missed = wrong = 0
+        for text, codes in corpus:
+            result = set(extract(text))
+            found += len(result & codes)
+            missed += len(codes - result)
+            wrong += len(result - codes)
+        print(f"{name:<14} {timings[name]:6.2f} µs/msg ({1e6 / timings[name]:9,.0f} msg/s)  "
+              f"detectados {found}/{expected}, perdidos {missed}, falsos {wrong}")
+
+
+if __name__ == "__main__":
+    main()
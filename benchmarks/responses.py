@@ -0,0 +1,223 @@
+"""
+Microbenchmark de la clasificación de respuestas de grabV2.
+
+Decodifica y clasifica un corpus de cuerpos de respuesta (los de
+benchmarks/fake_binance.py más variantes reales: `data` nulo, mensajes con
+espera, códigos desconocidos) y mide el coste por respuesta de cada etapa,
+junto al camino anterior (json.loads, BinanceAPI._process_response y el
+`match` sobre cadenas del manipulador). En ambos caminos se construyen los
+textos pero no se escriben en consola.
+
+    python -m benchmarks.responses --iterations 200000
+"""
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from benchmarks.fake_binance import RESPONSES
+from lib.api.binance import ERROR_CODES, ClaimStatus, _loads, classify_response
+from lib.manipulator import PAUSE_DETAILS, STATUS_MESSAGES
+
+
+def build_corpus() -> List[bytes]:
+    """Cuerpos tal y como llegan por la red."""
+    bodies = [dict(body) for body in RESPONSES.values()]
+    bodies += [
+        # Binance devuelve `data: null` en muchos errores
+        {"success": False, "code": "403802", "message": "This crypto box has been fully claimed.", "data": None},
+        {"success": False, "code": "100002001", "message": "Please log in first.", "data": None},
+        {"success": False, "code": "403067", "message": "Too many attempts, please try again after 01:30", "data": None},
+        {"success": False, "code": "000002", "message": "Illegal parameter.", "data": None},
+        # Éxito con `data` que no es un objeto: sigue siendo un canje
+        {"success": True, "code": "000000", "message": None, "data": []},
+        {
+            "success": True, "code": "000000", "message": None, "messageDetail": None,
+            "data": {
+                "grabAmountStr": "0.00012345", "currency": "BTC", "totalAmount": "0.01", "totalNumber": 100,
+                "remainNumber": 37, "senderName": "bench", "grabbedAt": 1760000000000, "status": "PROCESSED",
+            },
+        },
+    ]
+    return [json.dumps(body, separators=(",", ":")).encode() for body in bodies]
+
+
+def dispatch(result, token: str = "BENCH123") -> Tuple[str, str]:
+    """Lo que hace el manipulador con cada resultado: la acción y el texto que mostraría."""
+    if result.status is ClaimStatus.CLAIMED:
+        return "success", f"¡Caja reclamada exitosamente! {result.amount} {result.currency}"
+    message = STATUS_MESSAGES[result.status][1].format(token=token, error_code=result.error_code, message=result.message)
+    if result.pause:
+        return "pause", PAUSE_DETAILS.get(result.status, "").format(token=token)
+    return ("success" if result.status is ClaimStatus.PROCESSED else "release"), message
+
+
+class LegacyAPI:
+    """BinanceAPI._process_response anterior (async, con la espera compartida en retry_after)."""
+
+    retry_after = None
+    # En lugar de custom_print, el último texto construido
+    last_message = ""
+
+    async def _process_response(self, response: Dict[str, Any], redpacket: str) -> Union[str, dict]:
+        try:
+            if not response or not isinstance(response, dict):
+                return "invalid_api_response_format"
+            if isinstance(response.get("success", False), bool) and response.get("success"):
+                data = response.get("data", {})
+                currency = data.get("currency", "N/A")
+                amount = data.get("grabAmountStr", "0")
+                self.last_message = f"¡Caja reclamada exitosamente! {amount} {currency}"
+                return {"status": "claimed", "data": {"amount": amount, "currency": currency}}
+            error_code = response.get("code", "")
+            error_message = response.get("message", "Error desconocido")
+            if "validateId" in response.get("data", {}):
+                return "captcha"
+            if error_code == "403067":
+                wait_time = "1 hora"
+                match = re.search(r"(\d+):(\d+)", error_message)
+                if match:
+                    hours, minutes = match.groups()
+                    wait_time = f"{hours} horas y {minutes} minutos"
+                    self.retry_after = int(hours) * 3600 + int(minutes) * 60
+                self.last_message = f"Demasiadas solicitudes. Espera {wait_time} antes de intentar de nuevo."
+                return "too_many_requests"
+            if error_code == "403802":
+                self.last_message = f"La criptocaja {redpacket} ya ha sido reclamada."
+                return "processed"
+            if error_code in ["403803", "PAY4001COM000"]:
+                self.last_message = f"Código de criptocaja inválido: {redpacket}"
+                return "processed"
+            if error_code == "100002001":
+                return "session_expired"
+            error_key = f"binance_api_error_{error_code}" if error_code else "binance_api_error_unknown"
+            self.last_message = f"Error en la respuesta de Binance: {error_message} (Código: {error_code if error_code else 'Desconocido'})"
+            return error_key
+        except Exception:
+            return "unknown_error_process_response"
+
+
+def legacy_dispatch(result: Union[str, dict], token: str = "BENCH123") -> Tuple[str, str]:
+    """El `match` anterior de _claim_with_profile sobre el resultado de _process_response."""
+    if isinstance(result, dict) and result.get("status") == "claimed":
+        status = "claimed"
+    elif isinstance(result, str):
+        status = result
+    else:
+        status = "unknown_api_response"
+    match status:
+        case "claimed":
+            return "success", ""
+        case "processed":
+            return "success", f"🔍 Código {token} ya fue procesado o es inválido."
+        case "captcha":
+            return "pause", f"🚫 ¡Captcha detectado en Binance para el código `{token}`! Resuélvelo manualmente en el navegador."
+        case "too_many_requests":
+            return "pause", f"⏳ Demasiadas solicitudes a Binance procesando el código `{token}`."
+        case "session_expired":
+            return "pause", f"⚠️ ¡Sesión de Binance expirada! El bot necesita reconfiguración/reinicio de sesión para el código `{token}`."
+        case "timeout_error" | "network_error":
+            return "release", f"❌ Error de red al intentar reclamar {token}."
+        case status if "http_error_" in status:
+            return "release", f"❌ Error HTTP {status.split('_')[-1]} de Binance al intentar reclamar {token}."
+        case "json_decode_error" | "unknown_error_send_request" | "invalid_api_response_format" | "unknown_error_process_response":
+            return "pause", f"❌ Error desconocido al procesar {token}. Pausando."
+        case status if "binance_api_error_" in status:
+            return "pause", f"❌ Error específico de API Binance '{status.split('binance_api_error_')[-1]}' para {token}. Pausando."
+        case _:
+            return "pause", f"⚠️ Respuesta/Estado inesperado del servidor: '{status}' para el código {token}."
+
+
+def run_coroutine(coroutine):
+    """Ejecuta una corrutina que no llega a suspenderse, sin bucle de eventos (como un await directo)."""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("la corrutina se suspendió")
+
+
+def measure(label: str, func: Callable[[], None], iterations: int, per: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - started
+    nanoseconds = elapsed / (iterations * per) * 1e9
+    print(f"{label:<50} {nanoseconds:8.0f} ns/respuesta")
+    return nanoseconds
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Coste de decodificar y clasificar respuestas de grabV2")
+    parser.add_argument("--iterations", type=int, default=100_000, help="pasadas sobre el corpus")
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus()
+    decoded = [_loads(body) for body in corpus]
+    results = [classify_response(body) for body in decoded]
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.label] = counts.get(result.label, 0) + 1
+    print(f"Corpus: {len(corpus)} respuestas -> {counts}")
+    print(f"Decodificador: {_loads.__module__}.{_loads.__name__}; códigos en la tabla: {len(ERROR_CODES)}")
+    legacy = LegacyAPI()
+    legacy_actions = [legacy_dispatch(run_coroutine(legacy._process_response(body, "BENCH123")))[0] for body in decoded]
+    actions = [dispatch(result)[0] for result in results]
+    differences = [
+        f"{body.get('code')}/data={type(body.get('data')).__name__}: {old} -> {new}"
+        for body, old, new in zip(decoded, legacy_actions, actions) if old != new
+    ]
+    print(f"Acción distinta en el camino anterior: {len(differences)}")
+    for difference in differences:
+        print(f"  {difference}")
+    print()
+
+    iterations = max(1, args.iterations // len(corpus))
+    per = len(corpus)
+
+    def decode_json():
+        for body in corpus:
+            json.loads(body.decode())
+
+    def decode_fast():
+        for body in corpus:
+            _loads(body)
+
+    def classify():
+        for body in decoded:
+            classify_response(body)
+
+    def classify_dispatch():
+        for body in decoded:
+            dispatch(classify_response(body))
+
+    def full_path():
+        for body in corpus:
+            dispatch(classify_response(_loads(body)))
+
+    def legacy_classify():
+        for body in decoded:
+            run_coroutine(legacy._process_response(body, "BENCH123"))
+
+    def legacy_classify_dispatch():
+        for body in decoded:
+            legacy_dispatch(run_coroutine(legacy._process_response(body, "BENCH123")))
+
+    def legacy_full_path():
+        for body in corpus:
+            legacy_dispatch(run_coroutine(legacy._process_response(json.loads(body.decode()), "BENCH123")))
+
+    measure("json.loads(bytes.decode())", decode_json, iterations, per)
+    measure("decodificador rápido (bytes)", decode_fast, iterations, per)
+    measure("classify_response", classify, iterations, per)
+    measure("classify_response + despacho", classify_dispatch, iterations, per)
+    measure("decodificar + clasificar + despachar", full_path, iterations, per)
+    print()
+    measure("anterior: _process_response", legacy_classify, iterations, per)
+    measure("anterior: _process_response + match", legacy_classify_dispatch, iterations, per)
+    measure("anterior: json.loads + _process_response + match", legacy_full_path, iterations, per)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Latencia de grabV2 abriendo una ClientSession por código (como hacía
+send_request antes) frente a la sesión compartida y precalentada de BinanceAPI.
+
+Se usa un servidor HTTPS local (FakeBinanceServer con un certificado
+autofirmado generado con openssl), de modo que la variante anterior paga en
+cada código la conexión TCP y el handshake TLS.
+
+    python -m benchmarks.session --requests 200 --rounds 3
+"""
+import argparse
+import asyncio
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.e2e import BenchConfig
+from benchmarks.fake_binance import FakeBinanceServer
+from lib.api.binance import BinanceAPI
+
+
+def self_signed_context(directory: str) -> ssl.SSLContext:
+    """Contexto TLS de servidor con un certificado autofirmado para 127.0.0.1."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def legacy_send_request(config: BenchConfig, url: str, code: str) -> str:
+    """send_request anterior: una ClientSession nueva (DNS + TCP + TLS) por código."""
+    payload = {"channel": "DEFAULT", "grabCode": code, "scene": None}
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, headers=config.headers, json=payload, timeout=30, ssl=False) as response:
+            return (await response.json())["code"]
+
+
+async def latencies(send: Callable[[str], Awaitable[object]], requests: int) -> List[float]:
+    """Milisegundos de cada solicitud, una tras otra (como llegan los códigos de un canal)."""
+    samples = []
+    for index in range(requests):
+        started = time.perf_counter()
+        await send(f"BENCH{index:03d}")
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(requests: int, rounds: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        context = self_signed_context(directory)
+    server = FakeBinanceServer({"403802": 1})
+    base_url = await server.start(ssl_context=context)
+
+    config = BenchConfig()
+    config.BINANCE_BASE_URL = base_url
+    config.BINANCE_VERIFY_SSL = False
+    api = BinanceAPI(config)
+    await api.warm_up()
+
+    variants: Dict[str, Callable[[str], Awaitable[object]]] = {
+        "sesión por código": lambda code: legacy_send_request(config, base_url + BinanceAPI.GRAB_PATH, code),
+        "sesión compartida": api.send_request,
+    }
+    # Pasadas alternadas para que el ruido de la máquina afecte a ambas por igual
+    samples: Dict[str, List[float]] = {name: [] for name in variants}
+    try:
+        for _ in range(rounds):
+            for name, send in variants.items():
+                samples[name].extend(await latencies(send, requests))
+    finally:
+        await api.close()
+        await server.stop()
+
+    print(f"{requests * rounds} solicitudes grabV2 por variante contra {base_url}\n")
+    for name, values in samples.items():
+        print(f"{name:<18} p50={statistics.median(values):6.2f} ms  "
+              f"p99={percentile(values, 0.99):6.2f} ms  media={statistics.fmean(values):6.2f} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Latencia de grabV2 con y sin sesión compartida")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.requests, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
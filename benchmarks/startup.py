@@ -0,0 +1,215 @@
+"""
+Benchmark de arranque: tiempo hasta el primer mensaje atendido.
+
+Arranca BaseClient.start_async con un cliente de Telegram simulado (con
+retardo de conexión configurable) y un historial en disco del tamaño que se
+indique. Desde que la sesión conecta, llega un mensaje con un código nuevo
+cada `--interval-ms`; se mide cuándo se encola el primero y cuántos se
+pierden por llegar antes de que el bot esté listo.
+
+    python -m benchmarks.startup --runs 5 --codes 200000 --claims 5000
+
+Cada ejecución es un proceso nuevo, así que el tiempo incluye las importaciones.
+"""
+import time
+
+PROCESS_STARTED = time.perf_counter()
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+
+class FakeTelegramClient:
+    """Imita lo que BaseClient usa de TelegramClient, sin red."""
+
+    def __init__(self, *args, connect_seconds: float = 0.4, rtt_seconds: float = 0.1, interval_seconds: float = 0.01,
+                 on_message=None, **kwargs):
+        self.connect_seconds = connect_seconds
+        self.rtt_seconds = rtt_seconds
+        self.interval_seconds = interval_seconds
+        self.on_message = on_message
+        self.handlers = []
+        self.done = asyncio.Event()
+        self._stream: Optional[asyncio.Task] = None
+
+    def add_event_handler(self, callback, event=None):
+        self.handlers.append((callback, event))
+
+    async def start(self, **kwargs):
+        await asyncio.sleep(self.connect_seconds)
+        # Telegram empieza a enviar actualizaciones en cuanto la sesión está conectada
+        self._stream = asyncio.create_task(self._deliver())
+        await asyncio.sleep(self.rtt_seconds)  # comprobación de autorización
+        return self
+
+    async def _deliver(self):
+        from telethon import events
+        index = 0
+        while not self.done.is_set():
+            event = self.on_message(index)
+            for callback, kind in list(self.handlers):
+                if isinstance(kind, events.NewMessage):
+                    asyncio.create_task(callback(event))
+            index += 1
+            await asyncio.sleep(self.interval_seconds)
+
+    async def get_me(self):
+        await asyncio.sleep(self.rtt_seconds)
+        return SimpleNamespace(id=1, first_name="bench", username="bench")
+
+    async def iter_dialogs(self, **kwargs):
+        await asyncio.sleep(self.rtt_seconds)
+        return
+        yield
+
+    async def iter_messages(self, *args, **kwargs):
+        await asyncio.sleep(self.rtt_seconds)
+        return
+        yield
+
+    async def send_message(self, *args, **kwargs):
+        return None
+
+    async def run_until_disconnected(self):
+        await self.done.wait()
+
+    async def disconnect(self):
+        self.done.set()
+        if self._stream:
+            await asyncio.gather(self._stream, return_exceptions=True)
+
+
+def prepare_data(directory: str, codes: int, claims: int) -> None:
+    """Crea data/claimed_codes.json y data/successful_claims.json con historial sintético."""
+    os.makedirs(os.path.join(directory, "data"), exist_ok=True)
+    claimed = [f"B{i:07d}" for i in range(codes)]
+    with open(os.path.join(directory, "data", "claimed_codes.json"), "w") as f:
+        json.dump(claimed, f)
+    successful = {
+        code: {"amount": "0.25", "currency": "USDT", "date": "2026-01-01 00:00:00"}
+        for code in claimed[:claims]
+    }
+    with open(os.path.join(directory, "data", "successful_claims.json"), "w") as f:
+        json.dump(successful, f)
+
+
+async def run_once(connect_seconds: float, rtt_seconds: float, interval_seconds: float) -> Dict[str, float]:
+    """Una ejecución de arranque dentro de este proceso."""
+    import_started = time.perf_counter()
+    import lib.api.telegram as telegram
+    from benchmarks.e2e import BenchConfig, SyntheticEvent
+    from benchmarks.fake_binance import FakeBinanceServer
+    from source.logger import logger
+    imported = time.perf_counter()
+
+    server = FakeBinanceServer()
+    base_url = await server.start()
+    config = BenchConfig()
+    config.BINANCE_BASE_URL = base_url
+
+    sent: List[float] = []
+    result: Dict[str, float] = {}
+    # Sufijo propio de esta ejecución (el historial en disco se comparte); los códigos tienen 8 caracteres
+    pid = os.getpid()
+    suffix = "".join(chr(ord("A") + (pid // 26 ** i) % 26) for i in range(3))
+
+    def on_message(index: int):
+        sent.append(time.perf_counter())
+        return SyntheticEvent(f"Redpacket code Q{index:04d}{suffix}", chat_id=-100, sender_id=5)
+
+    def make_client(*args, **kwargs):
+        return FakeTelegramClient(connect_seconds=connect_seconds, rtt_seconds=rtt_seconds,
+                                  interval_seconds=interval_seconds, on_message=on_message)
+
+    telegram.TelegramClient = make_client
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        bot = telegram.BaseClient(config)
+        logger.enabled = False
+        run = asyncio.create_task(bot.start_async())
+
+        # Esperar al primer código que llegue a la cola de reclamos
+        while True:
+            pipeline = getattr(bot, 'pipeline', None)
+            manipulator = getattr(bot, 'manipulator', None)
+            if pipeline is not None and manipulator is not None and (pipeline.processed or pipeline.depth):
+                break
+            await asyncio.sleep(0.001)
+        handled = time.perf_counter()
+
+        # Dejar que se reclamen los que ya estaban esperando: el primero reclamado indica cuántos se perdieron
+        await pipeline.queue.join()
+        claimed = [
+            int(code[1:5]) for code in manipulator.permanently_claimed_codes
+            if code.startswith("Q") and code.endswith(suffix)
+        ]
+        first_index = min(claimed) if claimed else len(sent)
+
+        bot.client.done.set()
+        await run
+    await server.stop()
+
+    result["import_ms"] = (imported - import_started) * 1000
+    result["process_to_import_ms"] = (imported - PROCESS_STARTED) * 1000
+    result["first_handled_ms"] = (handled - PROCESS_STARTED) * 1000
+    result["connected_to_handled_ms"] = (handled - sent[0]) * 1000 if sent else 0.0
+    result["lost_messages"] = first_index
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Tiempo de arranque hasta el primer mensaje atendido")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--codes", type=int, default=200_000, help="códigos en claimed_codes.json")
+    parser.add_argument("--claims", type=int, default=5_000, help="canjes en successful_claims.json")
+    parser.add_argument("--connect-ms", type=float, default=400, help="retardo simulado de conexión con Telegram")
+    parser.add_argument("--rtt-ms", type=float, default=100, help="ida y vuelta simulada de una petición a Telegram")
+    parser.add_argument("--interval-ms", type=float, default=10, help="un mensaje con código cada N ms")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        os.chdir(args.child)
+        result = asyncio.run(run_once(args.connect_ms / 1000, args.rtt_ms / 1000, args.interval_ms / 1000))
+        print(json.dumps(result))
+        return
+
+    directory = tempfile.mkdtemp(prefix="hau5-startup-")
+    prepare_data(directory, args.codes, args.claims)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [
+        sys.executable, "-m", "benchmarks.startup", "--child", directory,
+        "--connect-ms", str(args.connect_ms), "--rtt-ms", str(args.rtt_ms), "--interval-ms", str(args.interval_ms),
+    ]
+    results = []
+    # La primera ejecución incluye la migración única del historial y no cuenta para la mediana
+    for run in range(args.runs + 1):
+        output = subprocess.run(command, cwd=root, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if run == 0:
+            print(f"Primer arranque (con migración): {result['first_handled_ms']:.0f} ms")
+            continue
+        results.append(result)
+
+    for key, label in (
+        ("import_ms", "Importaciones"),
+        ("first_handled_ms", "Inicio del proceso -> primer código en cola"),
+        ("connected_to_handled_ms", "Sesión conectada -> primer código en cola"),
+        ("lost_messages", "Mensajes perdidos durante el arranque"),
+    ):
+        values = [result[key] for result in results]
+        print(f"{label:<45} mediana {statistics.median(values):8.1f}  (min {min(values):.1f}, max {max(values):.1f})")
+
+
+if __name__ == "__main__":
+    main()
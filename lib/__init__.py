@@ -1,2 +1,9 @@
-from lib.api.binance import BinanceAPI
-from lib.api.telegram import BaseClient
\ No newline at end of file
+from lib.api.telegram import BaseClient
+
+
+def __getattr__(name):
+    # BinanceAPI (y aiohttp) se importa solo cuando se usa, para no retrasar el arranque
+    if name == "BinanceAPI":
+        from lib.api.binance import BinanceAPI
+        return BinanceAPI
+    raise AttributeError(f"module 'lib' has no attribute {name!r}")
\ No newline at end of file
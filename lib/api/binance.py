@@ -1,7 +1,8 @@
 import re
 import json
 import asyncio
-from typing import Optional, Dict, Any, TYPE_CHECKING # Added TYPE_CHECKING
+from enum import Enum
+from typing import Optional, Dict, Any, NamedTuple, TYPE_CHECKING # Added TYPE_CHECKING
 
 import aiohttp
 
@@ -11,13 +12,205 @@ from source import custom_print
 if TYPE_CHECKING:
     from source.config import Config # For type hinting
 
+try:
+    # Opcional: decodifica directamente los bytes de la respuesta, varias veces más rápido
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+class ClaimStatus(str, Enum):
+    """Resultado de una solicitud a grabV2 (o de un intento que no llegó a enviarse)."""
+    CLAIMED = "claimed"
+    PROCESSED = "processed"                  # Ya reclamada o código inválido: no tiene sentido reintentar
+    CAPTCHA = "captcha"
+    TOO_MANY_REQUESTS = "too_many_requests"
+    SESSION_EXPIRED = "session_expired"
+    API_ERROR = "binance_api_error"          # Código de error de Binance sin tratamiento propio
+    INVALID_RESPONSE = "invalid_api_response_format"
+    JSON_ERROR = "json_decode_error"
+    HTTP_ERROR = "http_error"
+    TIMEOUT = "timeout_error"
+    NETWORK_ERROR = "network_error"
+    UNKNOWN_ERROR = "unknown_error"
+    RATE_LIMITED = "rate_limited"            # Presupuesto local por hora agotado (sin solicitud)
+    EXCEPTION = "exception"                  # Excepción no controlada al reclamar
+
+
+class GrabResult(NamedTuple):
+    """
+    Respuesta de grabV2 ya clasificada (inmutable; una tupla se crea bastante
+    más rápido que una dataclass congelada).
+
+    - retryable: el código no llegó a canjearse y reintentarlo más tarde podría funcionar.
+    - pause: tipo de error con el que se pausa la cuenta (clave de BASE_BACKOFF_SECONDS) o None.
+    - wait_seconds: espera indicada por Binance (403067); tiene prioridad sobre el backoff.
+    """
+    status: ClaimStatus
+    retryable: bool = False
+    pause: Optional[str] = None
+    wait_seconds: Optional[float] = None
+    amount: Optional[str] = None
+    currency: Optional[str] = None
+    error_code: Optional[str] = None
+    message: str = ""
+
+    @property
+    def label(self) -> str:
+        """Texto con el que se guarda el intento (p. ej. "http_error_503" o "binance_api_error_XYZ")."""
+        if self.error_code and self.status in (ClaimStatus.HTTP_ERROR, ClaimStatus.API_ERROR):
+            return f"{self.status.value}_{self.error_code}"
+        return self.status.value
+
+    @property
+    def data(self) -> Optional[Dict[str, str]]:
+        """Importe y moneda de un canje, con el formato de successful_claims."""
+        if self.status is not ClaimStatus.CLAIMED:
+            return None
+        return {"amount": self.amount, "currency": self.currency}
+
+
+# Resultados sin datos variables: se crean una vez y se reutilizan en cada respuesta
+RESULTS: Dict[ClaimStatus, GrabResult] = {
+    ClaimStatus.PROCESSED: GrabResult(ClaimStatus.PROCESSED),
+    ClaimStatus.CAPTCHA: GrabResult(ClaimStatus.CAPTCHA, retryable=True, pause="captcha"),
+    ClaimStatus.TOO_MANY_REQUESTS: GrabResult(ClaimStatus.TOO_MANY_REQUESTS, retryable=True, pause="too_many_requests"),
+    ClaimStatus.SESSION_EXPIRED: GrabResult(ClaimStatus.SESSION_EXPIRED, retryable=True, pause="session_expired"),
+    ClaimStatus.API_ERROR: GrabResult(ClaimStatus.API_ERROR, pause="api_error"),
+    ClaimStatus.INVALID_RESPONSE: GrabResult(ClaimStatus.INVALID_RESPONSE, pause="api_error"),
+    ClaimStatus.JSON_ERROR: GrabResult(ClaimStatus.JSON_ERROR, retryable=True, pause="api_error"),
+    # Los errores de transporte no pausan: en modo de prueba, el siguiente código vuelve a probar
+    ClaimStatus.HTTP_ERROR: GrabResult(ClaimStatus.HTTP_ERROR, retryable=True),
+    ClaimStatus.TIMEOUT: GrabResult(ClaimStatus.TIMEOUT, retryable=True),
+    ClaimStatus.NETWORK_ERROR: GrabResult(ClaimStatus.NETWORK_ERROR, retryable=True),
+    ClaimStatus.UNKNOWN_ERROR: GrabResult(ClaimStatus.UNKNOWN_ERROR, pause="api_error"),
+    ClaimStatus.RATE_LIMITED: GrabResult(ClaimStatus.RATE_LIMITED, retryable=True),
+    ClaimStatus.EXCEPTION: GrabResult(ClaimStatus.EXCEPTION, pause="exception"),
+}
+
+# Código de error de Binance -> resultado (los que no aparecen son API_ERROR)
+ERROR_CODES: Dict[str, GrabResult] = {
+    "403802": RESULTS[ClaimStatus.PROCESSED],           # Caja ya reclamada
+    "403803": RESULTS[ClaimStatus.PROCESSED],           # Código inválido
+    "PAY4001COM000": RESULTS[ClaimStatus.PROCESSED],    # Código inválido
+    "403067": RESULTS[ClaimStatus.TOO_MANY_REQUESTS],   # Demasiadas solicitudes
+    "100002001": RESULTS[ClaimStatus.SESSION_EXPIRED],  # Sesión expirada
+}
+
+WAIT_PATTERN = re.compile(r"(\d+):(\d+)")
+
+
+def classify_response(response: Any) -> GrabResult:
+    """Clasifica el cuerpo JSON de una respuesta de grabV2 con una búsqueda en ERROR_CODES."""
+    if not isinstance(response, dict) or not response:
+        return RESULTS[ClaimStatus.INVALID_RESPONSE]
+
+    # `data` puede venir como null (o con otro tipo): se comprueba una sola vez para ambas ramas
+    data = response.get("data")
+    if not isinstance(data, dict):
+        data = {}
+    if response.get("success") is True:
+        return GrabResult(
+            ClaimStatus.CLAIMED,
+            amount=data.get("grabAmountStr", "0"),
+            currency=data.get("currency", "N/A")
+        )
+
+    if "validateId" in data:
+        return RESULTS[ClaimStatus.CAPTCHA]
+
+    error_code = str(response.get("code") or "")
+    message = response.get("message") or "Error desconocido"
+    result = ERROR_CODES.get(error_code)
+    if result is None:
+        return RESULTS[ClaimStatus.API_ERROR]._replace(error_code=error_code or "unknown", message=message)
+    if result.status is ClaimStatus.TOO_MANY_REQUESTS:
+        # El mensaje indica la espera como "HH:MM"
+        match = WAIT_PATTERN.search(message)
+        if match:
+            hours, minutes = match.groups()
+            return result._replace(wait_seconds=int(hours) * 3600 + int(minutes) * 60, message=message)
+    return result
+
 
 class BinanceAPI:
-    def __init__(self, config: 'Config'): # Added config parameter with string literal type hint
+    BASE_URL = "https://www.binance.com"
+    GRAB_PATH = "/bapi/pay/v1/private/binance-pay/gift-box/code/grabV2"
+
+    def __init__(self, config: 'Config', headers: Optional[Dict[str, str]] = None): # Added config parameter with string literal type hint
         self.config: 'Config' = config # Set config from parameter, type hint as string literal
+        # Encabezados (cookies/csrftoken) de la cuenta; por defecto, los de Config
+        self.headers: Dict[str, str] = headers if headers is not None else self.config.headers
         self.response: Optional[aiohttp.ClientResponse] = None
 
-    async def send_request(self, redpacket: str) -> str:
+        # Sesión persistente: se reutilizan las conexiones TCP/TLS entre reclamos
+        self.base_url: str = getattr(self.config, 'BINANCE_BASE_URL', self.BASE_URL).rstrip("/")
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._keep_warm_task: Optional[asyncio.Task] = None
+
+    def update_headers(self, headers: Dict[str, str]) -> None:
+        """Sustituye los encabezados de una vez; las solicitudes en curso terminan con los anteriores."""
+        self.headers = dict(headers)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Devuelve la sesión compartida, creándola si aún no existe o fue cerrada."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=getattr(self.config, 'BINANCE_POOL_SIZE', 10),
+                ttl_dns_cache=getattr(self.config, 'BINANCE_DNS_CACHE_SECONDS', 300),
+                keepalive_timeout=getattr(self.config, 'BINANCE_KEEPALIVE_SECONDS', 75),
+                ssl=None if getattr(self.config, 'BINANCE_VERIFY_SSL', True) else False,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=getattr(self.config, 'BINANCE_TIMEOUT_SECONDS', 30)),
+            )
+        return self._session
+
+    async def warm_up(self) -> bool:
+        """Abre (o mantiene abierta) una conexión con Binance para que el próximo reclamo no pague DNS + TLS."""
+        try:
+            session = await self._get_session()
+            async with session.head(
+                self.base_url + "/",
+                headers={"User-Agent": self.headers.get("User-Agent", "")},
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(total=10),
+            ) as response:
+                await response.release()
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            custom_print(f"No se pudo precalentar la conexión con Binance: {str(e)}", "warning")
+            return False
+
+    async def _keep_warm_loop(self, interval: float) -> None:
+        """Envía un ping ligero periódicamente para que la conexión no expire por inactividad."""
+        while True:
+            await self.warm_up()
+            await asyncio.sleep(interval)
+
+    def start_keep_warm(self) -> None:
+        """Inicia la tarea en segundo plano que mantiene la conexión caliente."""
+        interval = getattr(self.config, 'BINANCE_KEEP_WARM_SECONDS', 30)
+        if interval <= 0 or (self._keep_warm_task and not self._keep_warm_task.done()):
+            return
+        self._keep_warm_task = asyncio.create_task(self._keep_warm_loop(interval))
+
+    async def close(self) -> None:
+        """Detiene el keep-warm y cierra la sesión compartida."""
+        if self._keep_warm_task:
+            self._keep_warm_task.cancel()
+            try:
+                await self._keep_warm_task
+            except asyncio.CancelledError:
+                pass
+            self._keep_warm_task = None
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def send_request(self, redpacket: str) -> GrabResult:
         """
         Envía una solicitud a la API de Binance para reclamar un código de criptocaja.
         
@@ -25,13 +218,13 @@ class BinanceAPI:
             redpacket (str): Código de la criptocaja a reclamar.
             
         Returns:
-            str: Estado del reclamo ("claimed", "captcha", "too_many_requests", "processed")
+            GrabResult: Resultado clasificado (estado, si se puede reintentar, pausa e importe).
         """
         if not redpacket or not isinstance(redpacket, str) or len(redpacket) < 5:
             custom_print("Código de criptocaja inválido", "error")
-            return "processed"
+            return RESULTS[ClaimStatus.PROCESSED]
 
-        url = "https://www.binance.com/bapi/pay/v1/private/binance-pay/gift-box/code/grabV2"
+        url = self.base_url + self.GRAB_PATH
         payload = {
             "channel": "DEFAULT",
             "grabCode": redpacket.strip(),
@@ -39,100 +232,39 @@ class BinanceAPI:
         }
 
         try:
-            # Intentar conectar con la API de Binance
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    headers=self.config.headers,
-                    json=payload,
-                    timeout=30
-                ) as response:
-                    self.response = response
-                    
-                    # Verificar si la respuesta es exitosa
-                    if response.status != 200:
-                        error_msg = f"Error en la respuesta HTTP: {response.status}"
-                        custom_print(error_msg, "error")
-                        return f"http_error_{response.status}"
-                    
-                    try:
-                        response_json = await response.json()
-                    except json.JSONDecodeError:
-                        custom_print("Error al decodificar la respuesta JSON. No se pudo procesar el contenido.", "error")
-                        return "json_decode_error"
-                    
-                    # Procesar la respuesta
-                    return await self._process_response(response_json, redpacket)
+            # Intentar conectar con la API de Binance (reutilizando la conexión abierta)
+            session = await self._get_session()
+            async with session.post(
+                url,
+                headers=self.headers,
+                json=payload
+            ) as response:
+                self.response = response
+                
+                # Verificar si la respuesta es exitosa
+                if response.status != 200:
+                    custom_print(f"Error en la respuesta HTTP: {response.status}", "error")
+                    return RESULTS[ClaimStatus.HTTP_ERROR]._replace(error_code=str(response.status))
+                
+                body = await response.read()
+            
+            try:
+                # Sin pasar por texto ni comprobar el content-type, como haría response.json()
+                response_json = _loads(body)
+            except ValueError:
+                custom_print("Error al decodificar la respuesta JSON. No se pudo procesar el contenido.", "error")
+                return RESULTS[ClaimStatus.JSON_ERROR]
+            
+            return classify_response(response_json)
                     
         except asyncio.TimeoutError:
             custom_print("Tiempo de espera agotado al conectar con Binance.", "error")
-            return "timeout_error"
+            return RESULTS[ClaimStatus.TIMEOUT]
             
         except aiohttp.ClientError as e:
             custom_print(f"Error de conexión de red: {str(e)}", "error")
-            return "network_error"
+            return RESULTS[ClaimStatus.NETWORK_ERROR]
             
         except Exception as e:
             custom_print(f"Error inesperado durante el envío de la solicitud: {str(e)}", "error")
-            return "unknown_error_send_request"
-    
-    async def _process_response(self, response: Dict[str, Any], redpacket: str) -> str:
-        """Procesa la respuesta de la API de Binance."""
-        try:
-            # Verificar si la respuesta es None o no es un diccionario
-            if not response or not isinstance(response, dict):
-                custom_print("Error: Formato de respuesta de la API no válido o respuesta vacía.", "error")
-                return "invalid_api_response_format"
-            
-            # Respuesta exitosa
-            if isinstance(response.get("success", False), bool) and response.get("success"):
-                # Extraer datos de manera segura
-                data = response.get("data", {})
-                currency = data.get("currency", "N/A")
-                amount = data.get("grabAmountStr", "0")
-                custom_print(f"¡Caja reclamada exitosamente! {amount} {currency}", "success")
-                return {"status": "claimed", "data": {"amount": amount, "currency": currency}}
-            
-            # Manejo de errores conocidos
-            error_code = response.get("code", "")
-            error_message = response.get("message", "Error desconocido")
-            
-            # Captcha detectado
-            if "validateId" in response.get("data", {}):
-                custom_print("Se ha detectado un CAPTCHA. Por favor, resuélvelo manualmente.", "error")
-                return "captcha"
-            
-            # Límite de solicitudes excedido
-            if error_code == "403067":
-                # Intentar extraer el tiempo de espera del mensaje de error
-                wait_time = "1 hora"  # Valor por defecto
-                match = re.search(r"(\d+):(\d+)", error_message)
-                if match:
-                    hours, minutes = match.groups()
-                    wait_time = f"{hours} horas y {minutes} minutos"
-                custom_print(f"Demasiadas solicitudes. Espera {wait_time} antes de intentar de nuevo.", "warning")
-                return "too_many_requests"
-            
-            # Caja ya reclamada
-            if error_code == "403802":
-                custom_print(f"La criptocaja {redpacket} ya ha sido reclamada.", "info")
-                return "processed"
-            
-            # Código inválido
-            if error_code in ["403803", "PAY4001COM000"]:
-                custom_print(f"Código de criptocaja inválido: {redpacket}", "error")
-                return "processed"
-            
-            # Sesión expirada
-            if error_code == "100002001":
-                custom_print("La sesión ha expirado. Por favor, inicia sesión nuevamente.", "error")
-                return "session_expired"
-            
-            # Otro tipo de error
-            error_key = f"binance_api_error_{error_code}" if error_code else "binance_api_error_unknown"
-            custom_print(f"Error en la respuesta de Binance: {error_message} (Código: {error_code if error_code else 'Desconocido'})", "error")
-            return error_key
-            
-        except Exception as e:
-            custom_print(f"Error inesperado al procesar la respuesta de Binance: {str(e)}", "error")
-            return "unknown_error_process_response"
+            return RESULTS[ClaimStatus.UNKNOWN_ERROR]
@@ -1,23 +1,63 @@
 from datetime import datetime
 import re
 import sys
+import time
 import asyncio
-from typing import Optional, Dict, List, Union
+from typing import Optional, Dict, List, Set, Union, TYPE_CHECKING
 
-from telethon import TelegramClient, events, Button
-from telethon.tl.types import User, Chat, Channel
-from telethon.sync import TelegramClient as SyncTelegramClient
+from telethon import TelegramClient, events
 
 # custom_print is imported before Config to be available for error messages
 from source import custom_print
-from lib.manipulator import ManipulateToken
+from source.logger import LEVELS, Record, logger
+from lib.extractor import CodeExtractor, DEFAULT_CODE_PATTERNS, extract_cart_answer, message_extra_text
+from lib.pipeline import ClaimPipeline
+from lib.entities import EntityCache
+from lib.chatfilter import ChatFilter
+from lib.reloader import ConfigWatcher, config_file_of, load_config
+from lib.metrics import Metrics, MetricsServer
+from lib.imagecodes import ImageDecoder, decoded_text, has_image, image_download_plan
+from lib.backfill import Backfill
+
+if TYPE_CHECKING:
+    # ManipulateToken (y con él aiohttp y sqlite3) se importa al arrancar los servicios,
+    # en un hilo aparte y mientras se conecta a Telegram
+    from lib.manipulator import ManipulateToken
 # Config import is now handled within __init__ to allow custom_print to be used for errors
 
+# Telegram admite hasta 4096 caracteres por mensaje; se reserva espacio para cabecera y pie
+LOGS_PAGE_CHARS = 3800
+
+
+def paginate_records(records: List[Record], max_chars: int = LOGS_PAGE_CHARS) -> List[str]:
+    """
+    Reparte registros (del más reciente al más antiguo) en páginas de texto que
+    caben en un mensaje; la página 1 contiene los más recientes, en orden cronológico.
+    """
+    pages: List[str] = []
+    lines: List[str] = []
+    size = 0
+    for created, level, component, text, _style in records:
+        line = f"{datetime.fromtimestamp(created).strftime('%m-%d %H:%M:%S')} {level.upper()} [{component}] {text}"
+        if len(line) > max_chars:
+            line = line[:max_chars - 1] + "…"
+        if lines and size + len(line) + 1 > max_chars:
+            pages.append("\n".join(reversed(lines)))
+            lines, size = [], 0
+        lines.append(line)
+        size += len(line) + 1
+    if lines:
+        pages.append("\n".join(reversed(lines)))
+    return pages
+
+
 class BaseClient:
-    def __init__(self):
+    def __init__(self, config=None):
         try:
-            from source.config import Config
-            self.config: Config = Config()
+            if config is None:
+                from source.config import Config
+                config = Config()
+            self.config = config
             
             # Mostrar configuración cargada (sin datos sensibles)
             print("🔧 Configuración cargada:")
@@ -26,15 +66,70 @@ class BaseClient:
             print(f"- BOT_TOKEN: {'*' * 10}{self.config.BOT_TOKEN[-5:] if self.config.BOT_TOKEN else 'No configurado'}")
             print("-" * 50)
             
-            # Patrones para detectar códigos en diferentes formatos
-            self.code_patterns = [
-                r'\b[A-Z0-9]{8,10}\b',  # Códigos de 8-10 caracteres alfanuméricos
-                r'(?i)code:?\s*([A-Z0-9]{8,10})',  # Formato "Code: ABC12345"
-                r'🔑\s*Code:?\s*([A-Z0-9]{8,10})',  # Formato con emoji de llave
-                r'redpack(et)?\s*code:?\s*([A-Z0-9]{8,10})',  # Formato "Redpack code: ABC12345"
-                r'\n([A-Z0-9]{8,10})\n',  # Código en una línea por sí solo
-                r'([A-Z0-9]{4}[ -]?[A-Z0-9]{4})'  # Códigos con guión o espacio en medio
-            ]
+            # Registro por niveles en segundo plano
+            logger.configure(
+                min_level=getattr(self.config, 'LOG_LEVEL', 'info'),
+                max_length=getattr(self.config, 'LOG_MAX_MESSAGE_LENGTH', 300),
+                file=getattr(self.config, 'LOG_FILE', ''),
+                max_bytes=getattr(self.config, 'LOG_FILE_MAX_BYTES', 5 * 1024 * 1024),
+                backups=getattr(self.config, 'LOG_FILE_BACKUPS', 3),
+                buffer_size=getattr(self.config, 'LOG_BUFFER_SIZE', 2000),
+                buffer_level=getattr(self.config, 'LOG_BUFFER_LEVEL', 'info'),
+                buffer_max_length=getattr(self.config, 'LOG_BUFFER_MAX_LENGTH', 1000)
+            )
+            
+            # Patrones para detectar códigos en diferentes formatos (compilados una sola vez)
+            self.code_patterns = getattr(self.config, 'CODE_PATTERNS', None) or DEFAULT_CODE_PATTERNS
+            self.extractor = CodeExtractor(self.code_patterns)
+            
+            # Caché de chats/remitentes: evita get_chat/get_sender/get_entity por mensaje
+            self.entities = EntityCache(
+                path=getattr(self.config, 'ENTITY_CACHE_FILE', 'data/entities.json'),
+                max_size=getattr(self.config, 'ENTITY_CACHE_MAX_SIZE', 5000)
+            )
+            
+            # Filtro de chats (CHATS / EXCLUDE_CHATS_WITH) resuelto a ids; se aplica antes de leer el mensaje
+            self.chat_filter = ChatFilter(
+                chats=getattr(self.config, 'CHATS', []),
+                exclude_words=getattr(self.config, 'EXCLUDE_CHATS_WITH', []),
+                title_of=lambda chat_id: (self.entities.get(chat_id) or {}).get("title")
+            )
+            self._chat_filter_task = None
+            self._chat_filter_refreshed_at = 0.0
+            
+            # Estado del bot. Los mensajes se atienden desde que se registran los manejadores;
+            # los códigos que llegan antes de terminar la carga esperan a services_ready
+            self.is_monitoring_active = True
+            self.auto_claim_active = True
+            self.services_ready = asyncio.Event()
+            
+            # Contadores para el endpoint de métricas (se actualizan siempre; el servidor es opcional)
+            self.metrics = Metrics()
+            self.metrics_server: Optional[MetricsServer] = None
+            
+            # Códigos en fotos (QR y, opcionalmente, texto), decodificados en otros procesos
+            self.image_decoder: Optional[ImageDecoder] = None
+            if getattr(self.config, 'IMAGE_DECODE', False):
+                self.image_decoder = ImageDecoder(
+                    workers=getattr(self.config, 'IMAGE_DECODE_WORKERS', 1),
+                    ocr=getattr(self.config, 'IMAGE_DECODE_OCR', False),
+                    max_pending=getattr(self.config, 'IMAGE_DECODE_MAX_PENDING', 8)
+                )
+                if not self.image_decoder.available:
+                    custom_print("IMAGE_DECODE requiere opencv-python-headless; las imágenes se ignorarán.", "warning")
+                    self.image_decoder = None
+            self.image_chats: Set[int] = set(getattr(self.config, 'IMAGE_DECODE_CHATS', []) or [])
+            self.image_chats_disabled: Set[int] = set()
+            self._image_tasks: Set[asyncio.Task] = set()
+            
+            # Recarga en caliente de las credenciales de Binance (archivo vigilado o /recargar)
+            self.config_file = config_file_of(self.config)
+            self._reload_lock = asyncio.Lock()
+            self.config_watcher = ConfigWatcher(
+                self.config_file,
+                lambda: self.reload_config(notify=True),
+                interval=getattr(self.config, 'CONFIG_WATCH_SECONDS', 2)
+            ) if self.config_file else None
             
         except ImportError:
             custom_print("Error: Configuration file 'source/config.py' not found. Please copy 'source/config.example.py' to 'source/config.py' and fill in your details.", "error")
@@ -47,16 +142,8 @@ class BaseClient:
             sys.exit(1)
             
     def extract_codes(self, text):
-        """Extrae códigos de 8 caracteres alfanuméricos en mayúsculas"""
-        if not text or not isinstance(text, str):
-            return set()
-            
-        # Buscar secuencias de exactamente 8 caracteres alfanuméricos en mayúsculas
-        codes = set(re.findall(r'\b([A-Z0-9]{8})\b', text.upper()))
-        
-        # Si no se encontraron códigos de 8 caracteres, buscar códigos de 8-10 caracteres
-        if not codes:
-            codes = set(re.findall(r'\b([A-Z0-9]{8,10})\b', text.upper()))
+        """Extrae códigos de 8 caracteres alfanuméricos en mayúsculas, en orden de aparición"""
+        codes = [candidate.code for candidate in self.extractor.extract(text)]
         
         # Registrar los códigos encontrados
         if codes:
@@ -67,315 +154,353 @@ class BaseClient:
         return codes
         
     def log(self, message, level="info"):
-        """Función de registro unificada"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] [{level.upper()}] {message}")
+        """Función de registro unificada (solo encola; la escritura es en segundo plano)"""
+        logger.log(message, level, "telegram", style="log")
         
-    async def initialize_client(self):
-        """Inicializa el cliente de Telegram"""
-        try:
-            # Inicializar el cliente de Telegram con el bot token
-            self.client = TelegramClient(
-                'bot_session',
-                self.config.API_ID,
-                self.config.API_HASH
-            )
-            
-            # Iniciar la conexión
-            await self.client.start(bot_token=self.config.BOT_TOKEN)
-            
-            # Obtener información del bot
-            me = await self.client.get_me()
-            self.log(f"✅ Conectado como @{me.username} (ID: {me.id})", "success")
-            
-            # Inicializar el manipulador de tokens
-            self.manipulator = ManipulateToken(self.config, self)
-            self.manipulator._load_successful_claims()
-            
-            # Estado del bot
-            self.is_monitoring_active = True
-            self.auto_claim_active = True
-            self.chat_ids = set()
-            
-            # Configurar manejadores
-            self.setup_command_handlers()
-            self.setup_event_handler()
+    def classify_message(self, text, extra_text=''):
+        """
+        Clasifica un mensaje en una sola pasada.
+        
+        Args:
+            text (str): Texto del mensaje (o pie de foto); los comandos solo se buscan aquí.
+            extra_text (str): Enlaces ocultos, botones y vista previa (ver message_extra_text).
+        
+        Returns:
+            tuple: ("command", (handler, argumento)), ("codes", códigos) o ("ignore", None)
+        """
+        text = text or ''
+        if not text.strip() and not extra_text:
+            return "ignore", None
             
-            # Configurar comandos del bot
-            await self.setup_bot_commands()
+        # Comandos: se resuelven con la tabla de comandos, sin regex
+        if text[:1] == '/':
+            head, _, rest = text[1:].partition(' ')
+            name = head.split('@', 1)[0]
+            handler = self.command_handlers.get(name)
+            if handler:
+                return "command", (handler, rest.strip())
+            # Comandos con argumento pegado, p. ej. /claim_ABC12345
+            name, _, argument = name.partition('_')
+            handler = self.command_handlers.get(name)
+            if handler:
+                return "command", (handler, argument)
+            return "ignore", None
             
-            # Registrar que el bot está listo
-            self.log("🔍 Modo de monitoreo universal ACTIVADO", "info")
-            self.log("🤖 Bot listo para detectar códigos en TODOS los chats", "info")
-            self.log("👀 Monitoreando mensajes entrantes...", "info")
+        codes = self.extract_codes(f"{text}\n{extra_text}" if extra_text else text)
+        if codes:
+            return "codes", codes
+        return "ignore", None
+        
+    async def claim_codes(self, codes, event=None, received_at=None, extract_seconds=None, notify=True):
+        """Encola cada código nuevo en el pipeline de reclamos exactamente una vez; no espera a Binance"""
+        # Durante el arranque, esperar a que termine la carga del historial en vez de perder el código
+        if not self.services_ready.is_set():
+            await self.services_ready.wait()
             
-            # Notificar al administrador
-            await self.send_admin_notification(
-                "🤖 *Bot iniciado correctamente*\n"
-                "El bot está listo para monitorear códigos."
+        queued = []
+        for code in codes:
+            # Filtrar códigos ya procesados
+            if code in self.manipulator.permanently_claimed_codes:
+                self.log(f"🔍 Código ya procesado: {code}", "debug")
+                self.metrics.dedupe_hit("historial")
+                continue
+            if code in self.manipulator.processed_tokens:
+                self.log(f"🔍 Código ya procesado en esta sesión: {code}", "debug")
+                self.metrics.dedupe_hit("sesion")
+                continue
+                
+            # Abrir la traza de latencia antes de encolar para medir también la espera en cola
+            self.manipulator.latency.begin(
+                code,
+                received_at=received_at,
+                message_date=getattr(event, 'date', None),
+                extract_seconds=extract_seconds,
+                source=self.entities.title(event.chat_id) if event is not None else None,
+                chat_id=getattr(event, 'chat_id', None)
             )
-            
-            return True
-            
-        except Exception as e:
-            self.log(f"❌ Error al inicializar el cliente de Telegram: {str(e)}", "error")
-            return False
+            if self.pipeline.submit(code):
+                self.log(f"🔧 Código en cola: {code} (pendientes: {self.pipeline.depth})", "info")
+                queued.append(code)
+            elif self.pipeline.is_queued(code):
+                self.metrics.dedupe_hit("cola")
+            else:
+                self.manipulator.latency.finish(code, "dropped")
+                
+        # Notificar al usuario
+        if queued and notify and event is not None and event.is_private:
+            try:
+                await event.respond(f"✅ Código(s) en cola: `{', '.join(queued)}`", parse_mode='Markdown')
+            except Exception as e:
+                self.log(f"No se pudo responder al mensaje: {str(e)}", "error")
 
-    async def get_chats(self):
-        """Maneja la configuración de los chats a monitorear para bots"""
+    async def dispatch_message(self, event):
+        """Manejador único de mensajes nuevos: comandos, códigos o nada"""
+        received_at = time.perf_counter()
+        self.metrics.message(event.chat_id)
         try:
-            custom_print("Configurando chats para monitoreo...\n", "info")
-            
-            # Limpiar la lista de chats monitoreados
-            self.chat_ids = set()
+            # Chats filtrados: salir antes de leer, registrar o analizar el mensaje
+            # (los comandos del administrador pasan siempre)
+            if not self.chat_filter.allows(event.chat_id, getattr(event, 'chat', None)) and event.sender_id != self.config.ADMIN_CHAT_ID:
+                return
+                
+            # Obtener el texto del mensaje
+            message_text = event.raw_text or ''
             
-            # Obtener el ID del chat actual (donde se ejecutó el comando)
-            chat_id = self.config.ADMIN_CHAT_ID  # Asumimos que está configurado en config.py
+            # Guardar las entidades que trae la actualización (sin peticiones de red)
+            self.entities.observe(event)
             
-            if not chat_id:
-                custom_print("Error: No se ha configurado un chat de administrador. Por favor, configura ADMIN_CHAT_ID en config.py", "error")
-                return
+            # Registrar información del mensaje (sin construir el texto si el nivel debug está desactivado)
+            if logger.is_enabled_for("debug"):
+                self.log(f"📨 Mensaje en {self.entities.title(event.chat_id)} de {event.sender_id}: {message_text}", "debug")
             
-            # Agregar el chat actual a la lista de monitoreo
-            self.chat_ids.add(chat_id)
+            extract_started = time.perf_counter()
+            # Enlaces ocultos, botones y vista previa: ya vienen en la actualización
+            extra_text = message_extra_text(getattr(event, 'message', None))
+            kind, payload = self.classify_message(message_text, extra_text)
+            scan_text = f"{message_text}\n{extra_text}" if extra_text else message_text
+            extract_seconds = time.perf_counter() - extract_started
             
-            # Obtener información del chat
-            try:
-                chat = await self.client.get_entity(chat_id)
-                chat_title = getattr(chat, 'title', 'Chat privado')
-                custom_print(f"\n=== CHAT SELECCIONADO ===", "success")
-                custom_print(f"- {chat_title} (ID: {chat_id})", "success")
-                custom_print("\nEl bot ahora está monitoreando este chat.", "success")
+            if kind == "command":
+                handler, argument = payload
+                await handler(event, argument)
+                return
                 
-                # Enviar mensaje de confirmación
-                await self.client.send_message(
-                    chat_id,
-                    "✅ Bot configurado correctamente. Ahora estoy monitoreando este chat para códigos de criptocajas."
-                    "\n\nEnvía /help para ver los comandos disponibles."
-                )
+            # Ignorar mensajes propios
+            if event.out:
+                self.log("Ignorando mensaje propio", "debug")
+                return
                 
-            except Exception as e:
-                custom_print(f"Error al obtener información del chat: {str(e)}", "error")
-            
+            # Ignorar mensajes de canales anónimos
+            if event.sender_id == 777000:
+                self.log("Ignorando mensaje de canal anónimo", "debug")
+                return
+                
+            if kind == "codes":
+                if not (self.is_monitoring_active and self.auto_claim_active):
+                    self.log(f"Monitoreo/auto-claim desactivado. Ignorando códigos: {', '.join(payload)}", "debug")
+                else:
+                    self.log(f"🔍 Códigos detectados: {', '.join(payload)}", "info")
+                    self.metrics.codes_extracted += len(payload)
+                    await self.claim_codes(payload, event, received_at, extract_seconds)
+            else:
+                self.log("No se encontraron códigos en el mensaje", "debug")
+                
+            # Fotos: se descargan y decodifican en segundo plano; el manejador no espera
+            if (self.image_decoder is not None and self.is_monitoring_active and self.auto_claim_active
+                    and self.images_enabled_for(event.chat_id) and has_image(getattr(event, 'message', None))):
+                task = asyncio.create_task(self.claim_image_codes(event, received_at))
+                self._image_tasks.add(task)
+                task.add_done_callback(self._image_tasks.discard)
+                
+            # Resolver en segundo plano los chats desconocidos; nunca se espera aquí
+            self.entities.prefetch(getattr(self, 'client', None), event.chat_id)
+                
+            # Procesar mensajes con formato de pregunta/respuesta de Binance
+            if 'uni-qr/cart/' in scan_text:
+                self.log("📝 Mensaje de Binance detectado", "debug")
+                try:
+                    cart = extract_cart_answer(scan_text)
+                    if cart:
+                        code, answer = cart
+                        self.log(f"🔑 Procesando código de Binance: {code} con respuesta: {answer}", "info")
+                        await self.process_code_with_answer(code, answer)
+                except Exception as e:
+                    self.log(f"Error al procesar mensaje de Binance: {str(e)}", "error")
+                    
         except Exception as e:
-            custom_print(f"Error al configurar los chats: {str(e)}", "error")
-
+            self.log(f"❌ Error en el manejador de mensajes: {str(e)}", "error")
 
-
-    async def process_message(self, event):
-        """Procesa un mensaje entrante"""
+    def message_codes(self, message) -> List[str]:
+        """Códigos de un mensaje del historial (texto, enlaces ocultos y botones), con las mismas reglas que los nuevos"""
+        if getattr(message, 'out', False) or getattr(message, 'sender_id', None) == 777000:
+            return []
+        text = getattr(message, 'message', None) or ''
+        if text[:1] == '/':
+            return []
+        extra_text = message_extra_text(message)
+        return [candidate.code for candidate in self.extractor.extract(f"{text}\n{extra_text}" if extra_text else text)]
+        
+    async def run_backfill(self):
+        """
+        Recupera los códigos publicados mientras el bot no estaba en marcha: lee los
+        últimos BACKFILL_MINUTES minutos de los chats procesados y encola, del más
+        nuevo al más antiguo, los que no se hayan reclamado ya.
+        """
+        minutes = getattr(self.config, 'BACKFILL_MINUTES', 10)
+        if not minutes:
+            return
+        # El filtro de chats (CHATS / EXCLUDE_CHATS_WITH) debe estar resuelto antes de elegir chats
+        if self._chat_filter_task is not None:
+            await asyncio.gather(self._chat_filter_task, return_exceptions=True)
+        await self.services_ready.wait()
+        
+        started = time.perf_counter()
+        backfill = Backfill(
+            self.client,
+            self.message_codes,
+            lambda chat_id, chat: self.chat_filter.allows(chat_id, chat, count=False),
+            minutes=minutes,
+            concurrency=getattr(self.config, 'BACKFILL_CONCURRENCY', 4),
+            max_messages=getattr(self.config, 'BACKFILL_MAX_MESSAGES', 200),
+            max_dialogs=getattr(self.config, 'BACKFILL_MAX_DIALOGS', 100),
+            max_flood_wait=getattr(self.config, 'BACKFILL_MAX_FLOOD_WAIT_SECONDS', 120),
+            remember=self.entities.remember
+        )
         try:
-            # Obtener información del mensaje
-            message = event.message
-            chat = await event.get_chat()
-            sender = await event.get_sender()
+            found = await backfill.collect()
+        except Exception as e:
+            self.log(f"Error al recuperar mensajes recientes: {str(e)}", "error")
+            return
             
-            # Ignorar mensajes propios
-            if hasattr(sender, 'is_self') and sender.is_self:
-                return
-                
-            # Obtener el ID del chat y el nombre
-            chat_id = chat.id
-            chat_title = getattr(chat, 'title', 'Chat privado')
+        if found and not (self.is_monitoring_active and self.auto_claim_active):
+            self.log(f"Monitoreo/auto-claim desactivado. Ignorando {len(found)} códigos recuperados", "info")
+            return
+        fresh = [item for item in found if item[1] not in self.manipulator.permanently_claimed_codes]
+        for _date, code, message in fresh:
+            await self.claim_codes([code], message, notify=False)
+        self.metrics.codes_extracted += len(found)
+        self.log(
+            f"⏪ Recuperación: {backfill.messages} mensajes de {backfill.chats} chats en "
+            f"{time.perf_counter() - started:.1f} s; {len(fresh)} códigos nuevos de {len(found)} encontrados",
+            "info" if fresh else "debug"
+        )
+        
+    def images_enabled_for(self, chat_id: Optional[int]) -> bool:
+        """Fotos a decodificar: las de IMAGE_DECODE_CHATS (o de todos si está vacía), salvo las desactivadas con /imagenes"""
+        if chat_id in self.image_chats_disabled:
+            return False
+        return not self.image_chats or chat_id in self.image_chats
+        
+    async def claim_image_codes(self, event, received_at=None):
+        """Descarga la foto del mensaje (sin pasar de IMAGE_DECODE_MAX_BYTES), la decodifica y reclama sus códigos"""
+        decoder = self.image_decoder
+        plan = image_download_plan(event.message, getattr(self.config, 'IMAGE_DECODE_MAX_BYTES', 2 * 1024 * 1024))
+        if plan is None:
+            self.log("🖼️ Imagen demasiado grande; no se decodifica", "debug")
+            decoder.count("grande")
+            return
+        if decoder.pending >= decoder.max_pending:
+            self.log(f"🖼️ {decoder.pending} imágenes en proceso; se descarta una de {self.entities.title(event.chat_id)}", "warning")
+            decoder.count("ocupado")
+            return
             
-            # Extraer el texto del mensaje
-            text = message.text or message.raw_text or ''
+        thumb, _size = plan
+        timeout = getattr(self.config, 'IMAGE_DECODE_TIMEOUT_SECONDS', 10)
+        started = time.perf_counter()
+        decoder.pending += 1
+        try:
+            data = await asyncio.wait_for(self.client.download_media(event.message, file=bytes, thumb=thumb), timeout)
+            texts = await asyncio.wait_for(decoder.decode(data), max(0.1, timeout - (time.perf_counter() - started)))
+        except asyncio.TimeoutError:
+            self.log(f"🖼️ Imagen de {self.entities.title(event.chat_id)} sin resultado tras {timeout} s", "warning")
+            decoder.count("timeout")
+            return
+        except Exception as e:
+            self.log(f"Error al decodificar la imagen: {str(e)}", "error")
+            decoder.count("error")
+            return
+        finally:
+            decoder.pending -= 1
             
-            # Extraer códigos del mensaje
-            codes = self.extract_codes(text)
+        codes = self.extract_codes(decoded_text(texts)) if texts else []
+        decoder.count("codigos" if codes else "sin_codigos")
+        if codes and self.auto_claim_active:
+            self.log(f"🖼️ Códigos en imagen: {', '.join(codes)}", "info")
+            self.metrics.codes_extracted += len(codes)
+            await self.claim_codes(codes, event, received_at, time.perf_counter() - started)
+        
+    def setup_event_handler(self):
+        """Registra un único manejador para todos los mensajes nuevos"""
+        self.client.add_event_handler(self.dispatch_message, events.NewMessage())
+        self.client.add_event_handler(self.on_chat_action, events.ChatAction())
+        
+    async def on_chat_action(self, event):
+        """Cambios en un chat (título, altas): vuelve a evaluar el filtro para ese chat"""
+        self.entities.observe(event)
+        self.chat_filter.invalidate(event.chat_id)
+        # Chats nuevos o renombrados: volver a resolver los nombres de CHATS
+        if self.chat_filter.names and (event.new_title or event.created or event.user_joined or event.user_added):
+            self.schedule_chat_filter_refresh()
             
-            if codes:
-                custom_print(f"📨 Mensaje de {chat_title} (ID: {chat_id}): {text}", "debug")
-                custom_print(f"🔍 Códigos detectados: {', '.join(codes)}", "success")
-                
-                # Procesar cada código encontrado
-                for code in codes:
-                    try:
-                        custom_print(f"🔧 Procesando código: {code}", "info")
-                        # Usar el manipulador para procesar el código
-                        await self.manipulator.main(code)
-                        # Pequeña pausa entre códigos
-                        await asyncio.sleep(1)
-                    except Exception as e:
-                        custom_print(f"Error al procesar código {code}: {str(e)}", "error")
+    def schedule_chat_filter_refresh(self):
+        """Vuelve a recorrer los diálogos, como mucho una vez cada CHAT_FILTER_REFRESH_SECONDS"""
+        task = self._chat_filter_task
+        if task is not None and not task.done():
+            return
+        interval = getattr(self.config, 'CHAT_FILTER_REFRESH_SECONDS', 60)
+        delay = max(0.0, self._chat_filter_refreshed_at + interval - time.monotonic())
+        self._chat_filter_task = asyncio.create_task(self.refresh_chat_filter(delay))
+        
+    async def refresh_chat_filter(self, delay: float = 0):
+        """Resuelve CHATS y EXCLUDE_CHATS_WITH a ids recorriendo los diálogos una vez"""
+        if delay:
+            await asyncio.sleep(delay)
+        self._chat_filter_refreshed_at = time.monotonic()
+        try:
+            await self.chat_filter.refresh(self.client, remember=self.entities.remember)
+        except Exception as e:
+            self.log(f"No se pudo actualizar el filtro de chats: {str(e)}", "error")
             
-            return True
+    async def reload_config(self, notify: bool = False) -> str:
+        """
+        Vuelve a leer el archivo de configuración y aplica las credenciales de Binance
+        nuevas sin reiniciar: las cuentas actualizadas se reanudan y los códigos que se
+        descartaron durante la pausa vuelven a la cola.
+        
+        Args:
+            notify (bool): Avisar al administrador si la configuración no es válida.
             
-        except Exception as e:
-            custom_print(f"Error al procesar mensaje: {str(e)}", "error")
-            return False
+        Returns:
+            str: Resultado legible de la recarga.
+        """
+        if not self.services_ready.is_set():
+            await self.services_ready.wait()
             
-    # Eliminado el manejador duplicado de mensajes
-
-    def setup_event_handler(self):
-        """Configura el manejador de eventos para mensajes"""
-        @self.client.on(events.NewMessage())
-        async def message_handler(event):
+        async with self._reload_lock:
+            if not self.config_file:
+                return "❌ No se sabe de qué archivo se cargó la configuración."
             try:
-                # Obtener el texto del mensaje
-                message_text = event.raw_text or ''
-                
-                # Registrar información del mensaje
-                self.log(f"\n📨 Mensaje recibido en chat ID: {event.chat_id}", "debug")
-                self.log(f"👤 Remitente ID: {event.sender_id}", "debug")
-                self.log(f"📝 Contenido: {message_text}", "debug")
-                
-                # Ignorar mensajes propios
-                if hasattr(event.sender, 'is_self') and event.sender.is_self:
-                    self.log("Ignorando mensaje propio", "debug")
-                    return
-                    
-                # Ignorar mensajes de canales anónimos
-                if hasattr(event.sender, 'id') and event.sender.id == 777000:
-                    self.log("Ignorando mensaje de canal anónimo", "debug")
-                    return
-                
-                # Verificar si el mensaje es relevante (contiene texto)
-                if not message_text.strip():
-                    self.log("Mensaje vacío, ignorando", "debug")
-                    return
-                
-                # Buscar códigos en el mensaje
-                codes = self.extract_codes(message_text)
+                config = await asyncio.to_thread(load_config, self.config_file, type(self.config).__name__)
+                updated = await self.manipulator.apply_credentials(config)
+            except Exception as e:
+                message = f"❌ No se aplicó la configuración de {self.config_file}: {str(e)}"
+                self.log(message, "error")
+                if notify:
+                    await self.send_admin_notification(message)
+                return message
+            finally:
+                if self.config_watcher:
+                    self.config_watcher.mark_current()
                 
-                if codes:
-                    # Filtrar códigos ya procesados
-                    filtered_codes = []
-                    for code in codes:
-                        if code in self.manipulator.permanently_claimed_codes:
-                            self.log(f"🔍 Código ya procesado: {code}", "debug")
-                            continue
-                        if code in self.manipulator.processed_tokens:
-                            self.log(f"🔍 Código ya procesado en esta sesión: {code}", "debug")
-                            continue
-                        filtered_codes.append(code)
-                    
-                    if not filtered_codes:
-                        self.log("🔍 Todos los códigos ya han sido procesados anteriormente", "debug")
-                        return
-                        
-                    self.log(f"🔍 Códigos nuevos detectados: {', '.join(filtered_codes)}", "info")
-                    
-                    # Procesar cada código encontrado
-                    for code in filtered_codes:
-                        try:
-                            self.log(f"🔧 Procesando código: {code}", "info")
-                            await self.manipulator.main(code)
-                            await asyncio.sleep(1)  # Pequeña pausa entre códigos
-                        except Exception as e:
-                            self.log(f"Error al procesar código {code}: {str(e)}", "error")
-                else:
-                    self.log("No se encontraron códigos en el mensaje", "debug")
+            if not updated:
+                self.log("Configuración recargada sin cambios en las credenciales de Binance.", "info")
+                return "ℹ️ Las credenciales de Binance no cambiaron."
                 
-                # Procesar mensajes con formato de pregunta/respuesta de Binance
-                if 'Answer:' in message_text and 'app.binance.com/uni-qr/cart/' in message_text:
-                    self.log("📝 Mensaje de Binance detectado", "debug")
-                    try:
-                        # Extraer el código del enlace
-                        code_match = re.search(r'app\.binance\.com/uni-qr/cart/(\d+)', message_text)
-                        if code_match:
-                            code = code_match.group(1)
-                            # Extraer la respuesta (línea después de 'Answer:')
-                            answer_section = message_text.split('Answer:', 1)[1].strip()
-                            # Tomar la primera línea no vacía como respuesta
-                            answer = next((line.strip() for line in answer_section.split('\n') if line.strip()), '')
-                            # Limpiar la respuesta de emojis y espacios extra
-                            answer = re.sub(r'[^\w\s-]', '', answer).strip()
-                            if answer:
-                                self.log(f"🔑 Procesando código de Binance: {code} con respuesta: {answer}", "info")
-                                await self.process_code_with_answer(code, answer)
-                    except Exception as e:
-                        self.log(f"Error al procesar mensaje de Binance: {str(e)}", "error")
-                        
-            except Exception as e:
-                self.log(f"❌ Error en el manejador de mensajes: {str(e)}", "error")
-                # Búsqueda de códigos en el mensaje
-                try:
-                    if not message_text:
-                        custom_print("Mensaje vacío, ignorando...", "debug")
-                        return
-                        
-                    # Si es un comando, lo manejamos aparte
-                    if message_text.startswith('/'):
-                        custom_print(f"Comando detectado: {message_text}", "debug")
-                        return
-                    
-                    # Extraer códigos del mensaje
-                    codes = self.extract_codes(message_text)
-                    if not codes:
-                        custom_print("No se encontraron códigos en el mensaje", "debug")
-                        return
-                        
-                    custom_print(f"🔍 Códigos detectados en el mensaje: {', '.join(codes)}", "info")
-                    
-                    # Procesar cada código encontrado
-                    for code in codes:
-                        try:
-                            custom_print(f"Procesando código: {code}", "info")
-                            await self.manipulator.main(code)
-                            # Pequeña pausa entre códigos
-                            await asyncio.sleep(1)
-                        except Exception as e:
-                            custom_print(f"Error al procesar código {code}: {str(e)}", "error")
-                    return
-                    
-                    # Mostrar información de depuración
-                    self.log(f"🔍 Analizando mensaje:")
-                    self.log(f"{message_text}")
-                    
-                    # Extraer códigos usando la función mejorada
-                    valid_tokens = self.extract_codes(message_text)
-                    self.log(f"📋 Códigos detectados: {valid_tokens}")
-                        
-                    # Si no se encontraron códigos, salir
-                    if not valid_tokens:
-                        return
-                        
-                    # Procesar los códigos encontrados
-                    sender_name = "tí" if event.sender_id == self.config.ADMIN_CHAT_ID else "un contacto"
-                    self.log(f"📨 Mensaje de {sender_name} contiene códigos: {', '.join(valid_tokens)}")
-                    
-                    # Procesar cada token válido
-                    for token in valid_tokens:
-                        try:
-                            # Verificar si el auto-claim está activado
-                            if not self.auto_claim_active:
-                                self.log(f"Auto-claim desactivado. Ignorando código {token}")
-                                continue
-                                
-                            # Procesar el código
-                            self.log(f"🔍 Procesando código: {token}")
-                            
-                            # Enviar confirmación al administrador
-                            if event.sender_id != self.config.ADMIN_CHAT_ID:
-                                await self.client.send_message(
-                                    self.config.ADMIN_CHAT_ID,
-                                    f"🔍 *Nuevo código detectado en un chat personal:*\n`{token}`\n\n¿Deseas reclamarlo? Envía /claim_{token}",
-                                    parse_mode='md'
-                                )
-                            
-                            # Procesar el código
-                            await self.manipulator.main(token)
-                            
-                            # Pequeña pausa entre códigos para evitar saturación
-                            await asyncio.sleep(1)
-                            
-                        except Exception as e:
-                            error_msg = f"Error al procesar token {token}: {str(e)}"
-                            self.log(error_msg, "error")
-                            try:
-                                await self.client.send_message(
-                                    self.config.ADMIN_CHAT_ID,
-                                    f"❌ {error_msg}",
-                                    parse_mode='md'
-                                )
-                            except Exception as send_error:
-                                self.log(f"No se pudo enviar mensaje de error: {str(send_error)}", "error")
-                except Exception as e:
-                    self.log(f"Error al procesar mensaje: {str(e)}", "error")
+            # Reintentar los códigos descartados mientras las cuentas estaban en pausa
+            requeued = [
+                code for code in self.manipulator.release_held_codes(getattr(self.config, 'HELD_CODES_RETRY_SECONDS', 300))
+                if self.pipeline.submit(code)
+            ]
+            message = f"🔑 Credenciales recargadas: {', '.join(updated)}."
+            if requeued:
+                message += f" Reintentando {len(requeued)} código(s) recibidos durante la pausa."
+            self.log(message, "success")
+            return message
             
-            except Exception as e:
-                custom_print(f"Error al procesar mensaje: {str(e)}", "error")
+    async def resolve_chat_argument(self, event, argument):
+        """Convierte el argumento de un comando (id, @usuario o vacío = chat actual) en un id de chat"""
+        argument = argument.strip()
+        if not argument:
+            return event.chat_id
+        try:
+            return int(argument)
+        except ValueError:
+            pass
+        try:
+            return self.entities.remember(await self.client.get_entity(argument))
+        except Exception as e:
+            self.log(f"No se pudo resolver el chat {argument}: {str(e)}", "error")
+            return None
 
     async def send_admin_notification(self, message: str):
         """Sends a notification message to the admin user."""
@@ -393,6 +518,8 @@ class BaseClient:
     async def setup_bot_commands(self):
         """Configura los comandos del bot en BotFather"""
         try:
+            from telethon import functions, types
+            
             # Configurar comandos del bot
             commands = [
                 ('start', 'Inicia el bot'),
@@ -413,10 +540,9 @@ class BaseClient:
             custom_print(f"Error configurando comandos del bot: {e}", "error")
 
     def setup_command_handlers(self):
-        """Configura los manejadores de comandos del bot."""
+        """Configura la tabla de comandos del bot (la usa dispatch_message)."""
         
-        @self.client.on(events.NewMessage(pattern='/start'))
-        async def start_handler(event):
+        async def start_handler(event, argument):
             """Maneja el comando /start"""
             # Verificar si el comando viene del administrador
             is_admin = event.sender_id == self.config.ADMIN_CHAT_ID
@@ -424,7 +550,7 @@ class BaseClient:
             # Activar el monitoreo si es el administrador
             if is_admin:
                 self.is_monitoring_active = True
-                self.chat_ids.add(event.chat_id)  # Agregar este chat a los monitoreados
+                self.chat_filter.allow(event.chat_id)  # Procesar siempre este chat
                 
             welcome_msg = """
 🤖 *Bienvenido al Bot de Reclamo de Códigos Binance*
@@ -444,8 +570,7 @@ class BaseClient:
 El bot está listo para usarse. ¡Empieza a reclamar códigos!"""
             await event.respond(welcome_msg, parse_mode='Markdown')
 
-        @self.client.on(events.NewMessage(pattern='/autoclaim'))
-        async def autoclaim_handler(event):
+        async def autoclaim_handler(event, argument):
             """Maneja el comando /autoclaim"""
             # Verificar si el comando viene del administrador
             if event.sender_id != self.config.ADMIN_CHAT_ID:
@@ -459,14 +584,14 @@ El bot está listo para usarse. ¡Empieza a reclamar códigos!"""
             # Si se activa el auto-claim, asegurarse de que el monitoreo también esté activo
             if self.auto_claim_active:
                 self.is_monitoring_active = True
-                self.chat_ids.add(event.chat_id)
+                self.chat_filter.allow(event.chat_id)
                 
                 # Mensaje más detallado cuando se activa
                 response = (
                     f"🚀 *RECLAMO AUTOMÁTICO ACTIVADO*\n\n"
                     f"🔍 El bot ahora buscará y canjeará automáticamente códigos en los mensajes.\n"
                     f"📡 Monitoreo de chats: ACTIVO\n"
-                    f"👤 Chats monitoreados: {len(self.chat_ids)}"
+                    f"👤 Chats monitoreados: {self.chat_filter.describe_monitored()}"
                 )
             else:
                 # Mensaje cuando se desactiva
@@ -484,8 +609,7 @@ El bot está listo para usarse. ¡Empieza a reclamar códigos!"""
                 await asyncio.sleep(2)
                 await event.respond("🔍 *Modo Auto-Claim activo*\nAhora puedo detectar y canjear códigos automáticamente. Solo envíame los mensajes con códigos y yo me encargaré del resto. 😊", parse_mode='md')
             
-        @self.client.on(events.NewMessage(pattern='/claim_([A-Z0-9]{8})'))
-        async def claim_code_handler(event):
+        async def claim_code_handler(event, argument):
             """Maneja el comando para reclamar un código manualmente"""
             # Verificar si el comando viene del administrador
             if event.sender_id != self.config.ADMIN_CHAT_ID:
@@ -493,7 +617,7 @@ El bot está listo para usarse. ¡Empieza a reclamar códigos!"""
                 return
                 
             # Extraer el código del comando
-            code = event.pattern_match.group(1)
+            code = argument.strip().upper()
             
             if not code:
                 await event.respond("❌ Formato de código inválido. Usa: /claim_CODIGO")
@@ -510,100 +634,348 @@ El bot está listo para usarse. ¡Empieza a reclamar códigos!"""
                 custom_print(error_msg, "error")
                 await event.respond(f"❌ {error_msg}")
 
-        @self.client.on(events.NewMessage(pattern='/logs'))
-        async def logs_handler(event):
-            """Maneja el comando /logs"""
-            # Aquí puedes implementar la lógica para mostrar logs
-            await event.respond("📜 Mostrando últimos registros... (función en desarrollo)")
+        async def logs_handler(event, argument):
+            """Muestra los registros recientes: /logs [nivel] [N] [CODIGO] [pN]"""
+            if event.sender_id != self.config.ADMIN_CHAT_ID:
+                await event.respond("❌ Solo el administrador puede ver los registros.")
+                return
+                
+            min_level, contains, count, page = None, None, 20, 1
+            for token in argument.split():
+                lowered = token.lower()
+                if lowered in LEVELS:
+                    min_level = lowered
+                elif token.isdigit():
+                    count = max(1, int(token))
+                elif re.fullmatch(r"p\d+", lowered):
+                    page = max(1, int(lowered[1:]))
+                else:
+                    contains = token
+                    
+            records = logger.buffer.query(min_level=min_level, contains=contains, limit=count)
+            if not records:
+                await event.respond("📜 No hay registros que coincidan.")
+                return
+            pages = paginate_records(records)
+            page = min(page, len(pages))
+            filters = " ".join(part for part in (min_level, str(count), contains) if part)
+            header = f"📜 Registros ({filters}) — página {page}/{len(pages)}, del más antiguo al más reciente"
+            footer = f"\n\nAnteriores: /logs {filters} p{page + 1}" if page < len(pages) else ""
+            await event.respond(f"{header}\n\n{pages[page - 1]}{footer}")
 
-        @self.client.on(events.NewMessage(pattern='/help'))
-        async def help_command(event):
+        async def help_command(event, argument):
             """Muestra los comandos disponibles"""
             help_text = (
                 "🤖 *Comandos disponibles:*\n\n"
                 "• /start - Iniciar el bot\n"
                 "• /autoclaim - Activar/desactivar el canje automático\n"
-                "• /resumen - Muestra resumen de códigos canjeados\n"
+                "• /resumen [hoy|semana] - Muestra resumen de códigos canjeados\n"
+                "• /cola - Muestra los códigos pendientes de reclamar\n"
+                "• /limite - Muestra las solicitudes restantes esta hora y si el reclamo está pausado\n"
+                "• /reanudar [perfil] - Reanuda el reclamo tras una pausa por error\n"
+                "• /recargar - Aplica las credenciales de Binance de config.py sin reiniciar\n"
+                "• /latencia [dump] - Muestra (o guarda) la latencia por etapa\n"
+                "• /historial CODIGO - Muestra los intentos registrados para un código\n"
+                "• /logs [nivel] [N] [CODIGO] [pN] - Muestra los últimos N registros (por nivel mínimo o texto)\n"
+                "• /chats - Muestra qué chats se procesan\n"
+                "• /imagenes [id|@chat] - Activa/desactiva la lectura de QR en las fotos del chat\n"
+                "• /vigilar, /ignorar, /quitar [id|@chat] - Ajusta el filtro de chats\n"
                 "• /stop_bot - Detener el bot\n"
                 "• /restart - Reiniciar el bot\n"
                 "• /help - Muestra este mensaje de ayuda"
             )
             await event.respond(help_text, parse_mode='markdown')
             
-        @self.client.on(events.NewMessage(pattern='/resumen'))
-        async def summary_command(event):
+        async def summary_command(event, argument):
             """Muestra un resumen de los códigos canjeados"""
             if event.sender_id != self.config.ADMIN_CHAT_ID:
                 await event.respond("❌ Solo el administrador puede ver el resumen.")
                 return
                 
-            summary = await self.manipulator.get_claim_summary()
+            summary = await self.manipulator.get_claim_summary(argument.strip().lower())
             await event.respond(summary, parse_mode='markdown')
             
-        # Manejador para códigos en mensajes
-        @self.client.on(events.NewMessage())
-        async def message_handler(event):
-            """Maneja los mensajes que contienen códigos"""
-            if not self.is_monitoring_active:
+        async def queue_command(event, argument):
+            """Muestra el estado de la cola de reclamos"""
+            if event.sender_id != self.config.ADMIN_CHAT_ID:
+                await event.respond("❌ Solo el administrador puede ver la cola.")
+                return
+                
+            await event.respond(self.pipeline.status())
+            
+        async def limit_command(event, argument):
+            """Muestra el presupuesto de solicitudes a Binance"""
+            if event.sender_id != self.config.ADMIN_CHAT_ID:
+                await event.respond("❌ Solo el administrador puede ver el límite.")
                 return
                 
-            # Buscar códigos en el mensaje
-            message_text = event.raw_text.strip()
-            tokens = re.findall(r'\b(?!\d+\b)(?![a-z]+\b)[A-Z0-9]{8}\b', message_text.upper())
-            
-            # Si se encontraron códigos válidos, procesarlos
-            for token in tokens:
-                custom_print(f"Código detectado: {token}", "info")
-                await self.manipulator.main(token)
+            profiles = self.manipulator.profiles
+            if len(profiles) == 1:
+                await event.respond(f"{profiles[0].limiter.status()}\n{profiles[0].recovery.status()}", parse_mode='md')
+                return
+            await event.respond("\n\n".join(profile.status() for profile in profiles), parse_mode='md')
+            
+        async def latency_command(event, argument):
+            """Muestra los percentiles de latencia por etapa; con 'dump' los guarda en disco"""
+            if event.sender_id != self.config.ADMIN_CHAT_ID:
+                await event.respond("❌ Solo el administrador puede ver la latencia.")
+                return
+                
+            latency = self.manipulator.latency
+            if argument.strip().lower() == 'dump':
+                path = getattr(self.config, 'LATENCY_DUMP_FILE', 'data/latency.json')
+                await asyncio.to_thread(latency.dump, path)
+                await event.respond(f"💾 Latencias guardadas en `{path}`", parse_mode='md')
+                return
+            await event.respond(latency.summary(), parse_mode='md')
+            
+        async def resume_command(event, argument):
+            """Reanuda el reclamo tras una pausa por error (todas las cuentas o /reanudar <perfil>)"""
+            if event.sender_id != self.config.ADMIN_CHAT_ID:
+                await event.respond("❌ Solo el administrador puede usar este comando.")
+                return
+                
+            profiles = self.manipulator.profiles
+            if argument:
+                profile = self.manipulator.get_profile(argument)
+                if profile is None:
+                    await event.respond(f"❌ Perfil desconocido: {argument}. Disponibles: {', '.join(p.name for p in profiles)}")
+                    return
+                profiles = [profile]
+            for profile in profiles:
+                await profile.recovery.resume()
+            await event.respond("\n".join(f"{profile.name}: {profile.recovery.status()}" for profile in profiles))
+            
+        async def reload_command(event, argument):
+            """Recarga las credenciales de Binance desde el archivo de configuración"""
+            if event.sender_id != self.config.ADMIN_CHAT_ID:
+                await event.respond("❌ Solo el administrador puede usar este comando.")
+                return
+                
+            await event.respond(await self.reload_config())
+            
+        async def history_command(event, argument):
+            """Muestra los intentos registrados para un código"""
+            if event.sender_id != self.config.ADMIN_CHAT_ID:
+                await event.respond("❌ Solo el administrador puede ver el historial.")
+                return
+                
+            code = argument.strip().upper()
+            if not code:
+                await event.respond("❌ Uso: /historial CODIGO")
+                return
+            if not self.manipulator.store.is_open:
+                await event.respond("❌ El historial de intentos no está disponible: no se pudo abrir la base de datos.")
+                return
+            attempts = await asyncio.to_thread(self.manipulator.store.attempts_for_code, code)
+            if not attempts:
+                await event.respond(f"No hay intentos registrados para `{code}`.", parse_mode='md')
+                return
+            lines = [f"🗂️ *Intentos de* `{code}`"]
+            for attempt in attempts[-10:]:
+                when = datetime.fromtimestamp(attempt["attempted_ts"]).strftime("%Y-%m-%d %H:%M:%S")
+                account = f" [{attempt['profile']}]" if attempt["profile"] else ""
+                latency = f", {attempt['latency_ms']:.0f} ms" if attempt["latency_ms"] is not None else ""
+                source = f" desde {attempt['chat_title']}" if attempt["chat_title"] else ""
+                lines.append(f"- {when}: {attempt['status']}{account}{source}{latency}")
+            await event.respond("\n".join(lines), parse_mode='md')
+            
+        async def chats_command(event, argument):
+            """Muestra el estado del filtro de chats"""
+            if event.sender_id != self.config.ADMIN_CHAT_ID:
+                await event.respond("❌ Solo el administrador puede ver los chats.")
+                return
+                
+            await event.respond(self.chat_filter.status())
+            
+        def chat_filter_command(action, verb):
+            async def handler(event, argument):
+                """Modifica el filtro de chats sin volver a registrar manejadores"""
+                if event.sender_id != self.config.ADMIN_CHAT_ID:
+                    await event.respond("❌ Solo el administrador puede usar este comando.")
+                    return
+                    
+                chat_id = await self.resolve_chat_argument(event, argument)
+                if chat_id is None:
+                    await event.respond(f"❌ No se encontró el chat: {argument}")
+                    return
+                action(chat_id)
+                await event.respond(f"✅ Chat {self.entities.title(chat_id)} ({chat_id}) {verb}.")
+            return handler
+            
+        async def images_command(event, argument):
+            """Activa o desactiva la lectura de códigos en las fotos de un chat"""
+            if event.sender_id != self.config.ADMIN_CHAT_ID:
+                await event.respond("❌ Solo el administrador puede usar este comando.")
+                return
+            if self.image_decoder is None:
+                await event.respond("❌ La lectura de imágenes está desactivada (IMAGE_DECODE y opencv-python-headless).")
+                return
                 
-                # Notificar al usuario
-                if event.is_private:
-                    await event.respond(f"✅ Código procesado: `{token}`", parse_mode='Markdown')
+            chat_id = await self.resolve_chat_argument(event, argument)
+            if chat_id is None:
+                await event.respond(f"❌ No se encontró el chat: {argument}")
+                return
+            if self.images_enabled_for(chat_id):
+                self.image_chats_disabled.add(chat_id)
+                state = "desactivada ⛔"
+            else:
+                self.image_chats_disabled.discard(chat_id)
+                if self.image_chats:
+                    self.image_chats.add(chat_id)
+                state = "activada ✅"
+            await event.respond(f"🖼️ Lectura de imágenes {state} en {self.entities.title(chat_id)} ({chat_id}).")
+            
+        # Tabla de comandos: nombre -> manejador
+        self.command_handlers = {
+            'start': start_handler,
+            'autoclaim': autoclaim_handler,
+            'claim': claim_code_handler,
+            'logs': logs_handler,
+            'help': help_command,
+            'resumen': summary_command,
+            'cola': queue_command,
+            'limite': limit_command,
+            'reanudar': resume_command,
+            'recargar': reload_command,
+            'latencia': latency_command,
+            'historial': history_command,
+            'chats': chats_command,
+            'imagenes': images_command,
+            'vigilar': chat_filter_command(self.chat_filter.allow, "se procesará siempre"),
+            'ignorar': chat_filter_command(self.chat_filter.block, "ignorado"),
+            'quitar': chat_filter_command(self.chat_filter.forget, "vuelve a las reglas de la configuración"),
+        }
 
     async def process_code_with_answer(self, code: str, answer: str):
         """Procesa un código junto con su respuesta (funcionalidad pendiente)"""
         custom_print(f"Received code '{code}' with answer '{answer}'. This feature is pending implementation.", "warning")
 
-    async def start_client(self):
-        """Inicia el cliente de Telegram con autenticación de usuario"""
-        try:
-            custom_print("🔑 Iniciando sesión en Telegram...", "info")
-            
-            # Configurar el cliente con tus credenciales API
-            self.client = TelegramClient(
-                'user_session',  # Nombre del archivo de sesión
-                self.config.API_ID,
-                self.config.API_HASH,
-                device_model="PC",
-                app_version="1.0.0",
-                system_version="Windows 10",
-                lang_code="es",
-                system_lang_code="es"
-            )
+    def _create_manipulator(self) -> 'ManipulateToken':
+        """Importa y crea el manipulador (lee el historial de disco); se ejecuta en un hilo aparte"""
+        from lib.manipulator import ManipulateToken
+        return ManipulateToken(self.config, self)
+
+    async def _warm_up_binance(self):
+        """Abre la conexión con Binance (una por cuenta) y con la coordinación entre instancias, y la mantiene caliente"""
+        await asyncio.gather(
+            *(profile.api.warm_up() for profile in self.manipulator.profiles),
+            self.manipulator.coordinator.start()
+        )
+        for profile in self.manipulator.profiles:
+            profile.api.start_keep_warm()
+
+    async def start_claim_services(self):
+        """Crea el manipulador, abre la conexión con Binance y arranca los workers de reclamo"""
+        # Cargar manipulador e historial y la caché de entidades en paralelo, fuera del bucle de eventos
+        self.manipulator, _ = await asyncio.gather(
+            asyncio.to_thread(self._create_manipulator),
+            asyncio.to_thread(self.entities.load)
+        )
+        
+        # Precalentar Binance en segundo plano: el primer código no espera a que termine
+        self._warm_up_task = asyncio.create_task(self._warm_up_binance())
+        
+        # Arrancar los workers que reclaman los códigos encolados
+        self.pipeline = ClaimPipeline(
+            self.manipulator.main,
+            tracker=self.manipulator.latency,
+            workers=getattr(self.config, 'CLAIM_WORKERS', 2),
+            max_size=getattr(self.config, 'CLAIM_QUEUE_SIZE', 100),
+            worker_spacing=getattr(self.config, 'CLAIM_WORKER_SPACING_SECONDS', 0)
+        )
+        self.pipeline.start()
+        self.services_ready.set()
+        
+        # Procesos para las imágenes: arrancan ya para que la primera foto no espere a OpenCV
+        if self.image_decoder is not None:
+            self.image_decoder.warm_up()
+        
+        if self.config_watcher:
+            self.config_watcher.start()
             
-            # Iniciar sesión
+        # Endpoint local de métricas (Prometheus); METRICS_PORT = 0 lo desactiva
+        metrics_port = getattr(self.config, 'METRICS_PORT', 0)
+        if metrics_port:
+            server = MetricsServer(self, host=getattr(self.config, 'METRICS_HOST', '127.0.0.1'), port=metrics_port)
+            try:
+                await server.start()
+                self.metrics_server = server
+            except OSError as e:
+                self.log(f"No se pudo abrir el endpoint de métricas en el puerto {metrics_port}: {str(e)}", "error")
+
+    async def stop_claim_services(self):
+        """Detiene los workers y cierra el manipulador (vacía escrituras pendientes)"""
+        for name in ('_warm_up_task', '_backfill_task', '_chat_filter_task'):
+            task = getattr(self, name, None)
+            if task and not task.done():
+                task.cancel()
+        if self.config_watcher:
+            await self.config_watcher.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+            self.metrics_server = None
+        for task in list(self._image_tasks):
+            task.cancel()
+        if self.image_decoder is not None:
+            self.image_decoder.close()
+        if getattr(self, 'pipeline', None):
+            await self.pipeline.stop()
+        if getattr(self, 'manipulator', None):
+            await self.manipulator.close()
+        await asyncio.to_thread(self.entities.save)
+
+    async def _log_identity(self):
+        """Muestra con qué cuenta se inició sesión (no retrasa el arranque)"""
+        try:
+            me = await self.client.get_me()
+            self.log(f"✅ Sesión iniciada como {me.first_name} (@{me.username or 'sin_usuario'}) - ID: {me.id}", "success")
+        except Exception as e:
+            self.log(f"No se pudo obtener la cuenta de la sesión: {str(e)}", "warning")
+
+    async def _start_session(self):
+        """Conecta con Telegram mientras, en paralelo, se cargan el historial y se abre Binance"""
+        # Configurar el cliente con tus credenciales API
+        self.client = TelegramClient(
+            'user_session',  # Nombre del archivo de sesión
+            self.config.API_ID,
+            self.config.API_HASH,
+            device_model="PC",
+            app_version="1.0.0",
+            system_version="Windows 10",
+            lang_code="es",
+            system_lang_code="es"
+        )
+        
+        # Registrar los manejadores antes de conectar para atender las primeras actualizaciones
+        self.setup_command_handlers()
+        self.setup_event_handler()
+        
+        # Inicializar manipulador de tokens, conexión con Binance y workers mientras se inicia sesión
+        services = asyncio.create_task(self.start_claim_services())
+        try:
             await self.client.start(
                 phone=lambda: input('\n📱 Por favor ingresa tu número de teléfono (con código de país, ej: +521234567890): '),
                 code_callback=lambda: input('🔑 Ingresa el código de verificación: '),
                 password=lambda: input('🔐 Si tienes autenticación en dos pasos, ingresa la contraseña: ')
             )
-            
-            # Verificar la sesión
-            me = await self.client.get_me()
-            custom_print(f"✅ Sesión iniciada como {me.first_name} (@{me.username or 'sin_usuario'}) - ID: {me.id}", "success")
-            
-            # Configurar manejadores
-            self.setup_command_handlers()
-            self.setup_event_handler()
-            
-            # Inicializar manipulador de tokens
-            self.manipulator = ManipulateToken(self.config, self)
-            self.manipulator._load_successful_claims()
-            
-            # Estado del bot
-            self.is_monitoring_active = True
-            self.auto_claim_active = True
-            self.chat_ids = set()
+        finally:
+            # Si el inicio de sesión falla, no dejar la carga a medias
+            await asyncio.gather(services, return_exceptions=True)
+        services.result()
+        
+        # Tareas que no hacen falta para reclamar: cuenta de la sesión y filtro de chats
+        self._identity_task = asyncio.create_task(self._log_identity())
+        self._chat_filter_task = asyncio.create_task(self.refresh_chat_filter())
+        
+        # Códigos publicados mientras el bot estaba detenido (después del filtro de chats)
+        self._backfill_task = asyncio.create_task(self.run_backfill())
+
+    async def start_client(self):
+        """Inicia el cliente de Telegram con autenticación de usuario"""
+        try:
+            custom_print("🔑 Iniciando sesión en Telegram...", "info")
+            await self._start_session()
             
             custom_print("\n🤖 Bot iniciado correctamente", "info")
             custom_print("👀 Monitoreando mensajes entrantes...", "info")
@@ -623,42 +995,7 @@ El bot está listo para usarse. ¡Empieza a reclamar códigos!"""
         try:
             # Iniciar el cliente de Telegram
             self.log("Conectando al servidor de Telegram...", "info")
-            
-            # Configurar el cliente con tus credenciales API
-            self.client = TelegramClient(
-                'user_session',  # Nombre del archivo de sesión
-                self.config.API_ID,
-                self.config.API_HASH,
-                device_model="PC",
-                app_version="1.0.0",
-                system_version="Windows 10",
-                lang_code="es",
-                system_lang_code="es"
-            )
-            
-            # Iniciar sesión
-            await self.client.start(
-                phone=lambda: input('\n📱 Por favor ingresa tu número de teléfono (con código de país, ej: +521234567890): '),
-                code_callback=lambda: input('🔑 Ingresa el código de verificación: '),
-                password=lambda: input('🔐 Si tienes autenticación en dos pasos, ingresa la contraseña: ')
-            )
-            
-            # Verificar la sesión
-            me = await self.client.get_me()
-            self.log(f"✅ Sesión iniciada como {me.first_name} (@{me.username or 'sin_usuario'}) - ID: {me.id}", "success")
-            
-            # Configurar manejadores
-            self.setup_command_handlers()
-            self.setup_event_handler()
-            
-            # Inicializar manipulador de tokens
-            self.manipulator = ManipulateToken(self.config, self)
-            self.manipulator._load_successful_claims()
-            
-            # Estado del bot
-            self.is_monitoring_active = True
-            self.auto_claim_active = True
-            self.chat_ids = set()
+            await self._start_session()
             
             self.log("\n🤖 Bot iniciado correctamente", "info")
             self.log("👀 Monitoreando mensajes entrantes...", "info")
@@ -672,6 +1009,7 @@ El bot está listo para usarse. ¡Empieza a reclamar códigos!"""
             self.log(f"❌ Error durante la ejecución del bot: {str(e)}", "error")
         finally:
             self.log("🔌 Desconectando el bot...", "info")
+            await self.stop_claim_services()
             if hasattr(self, 'client') and self.client:
                 await self.client.disconnect()
     
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telethon.errors import FloodWaitError
+
+from source.utils import custom_print
+
+
+# (fecha del mensaje, código, mensaje)
+Found = Tuple[datetime, str, Any]
+
+
+class Backfill:
+    """
+    Al arrancar, recorre los mensajes de los últimos `minutes` minutos de los
+    chats procesados para recuperar los códigos publicados mientras el bot no
+    estaba en marcha. Los chats se leen en paralelo con un máximo de
+    `concurrency` a la vez; un FloodWait detiene a todos hasta que vence.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        extract: Callable[[Any], List[str]],
+        allows: Callable[[int, Any], bool],
+        minutes: float = 10,
+        concurrency: int = 4,
+        max_messages: int = 200,
+        max_dialogs: int = 100,
+        max_flood_wait: float = 120,
+        remember: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.client = client
+        self.extract = extract
+        self.allows = allows
+        self.minutes: float = minutes
+        self.concurrency: int = max(1, concurrency)
+        self.max_messages: int = max_messages
+        self.max_dialogs: int = max_dialogs
+        self.max_flood_wait: float = max_flood_wait
+        self.remember = remember
+
+        self._resume_at: float = 0.0  # time.monotonic() hasta el que hay que esperar (FloodWait)
+        self._aborted: bool = False
+        self.chats: int = 0
+        self.messages: int = 0
+        self.flood_waits: int = 0
+
+    async def _respect_flood_wait(self) -> None:
+        wait = self._resume_at - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _flood_wait(self, error: FloodWaitError, where: str) -> bool:
+        """Registra un FloodWait; False si es demasiado largo y hay que abandonar."""
+        self.flood_waits += 1
+        if error.seconds > self.max_flood_wait:
+            custom_print(f"Recuperación de mensajes cancelada: Telegram pide esperar {error.seconds} s ({where}).", "warning")
+            self._aborted = True
+            return False
+        custom_print(f"Recuperación de mensajes en pausa {error.seconds} s por FloodWait ({where}).", "warning")
+        self._resume_at = max(self._resume_at, time.monotonic() + error.seconds)
+        return True
+
+    async def _recent_chats(self, cutoff: datetime) -> List[Any]:
+        """Chats procesados con algún mensaje posterior a `cutoff` (los diálogos llegan del más reciente al más antiguo)."""
+        chats = []
+        while True:
+            try:
+                async for dialog in self.client.iter_dialogs(limit=self.max_dialogs):
+                    if self.remember is not None:
+                        self.remember(dialog.entity)
+                    if dialog.date is None or dialog.date < cutoff:
+                        if getattr(dialog, 'pinned', False):
+                            continue  # los fijados van primero aunque sean antiguos
+                        break
+                    if self.allows(dialog.id, dialog.entity):
+                        chats.append(dialog.entity)
+                return chats
+            except FloodWaitError as e:
+                if not self._flood_wait(e, "diálogos"):
+                    return []
+                chats = []
+                await self._respect_flood_wait()
+
+    async def _scan_chat(self, entity: Any, cutoff: datetime, semaphore: asyncio.Semaphore) -> List[Found]:
+        """Códigos de los mensajes del chat posteriores a `cutoff`, del más reciente al más antiguo."""
+        found: List[Found] = []
+        offset_id = 0
+        read = 0
+        async with semaphore:
+            while not self._aborted:
+                await self._respect_flood_wait()
+                try:
+                    async for message in self.client.iter_messages(entity, limit=self.max_messages - read, offset_id=offset_id):
+                        if message.date < cutoff:
+                            break
+                        offset_id = message.id
+                        read += 1
+                        for code in self.extract(message):
+                            found.append((message.date, code, message))
+                    break
+                except FloodWaitError as e:
+                    # Se reanuda desde el último mensaje leído cuando venza la espera
+                    if not self._flood_wait(e, str(getattr(entity, 'id', entity))):
+                        break
+        self.messages += read
+        return found
+
+    async def collect(self) -> List[Found]:
+        """
+        Lee los chats y devuelve cada código una sola vez (con su mensaje más
+        reciente), del más nuevo al más antiguo.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=self.minutes)
+        chats = await self._recent_chats(cutoff)
+        self.chats = len(chats)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(
+            *(self._scan_chat(entity, cutoff, semaphore) for entity in chats), return_exceptions=True
+        )
+
+        newest: Dict[str, Found] = {}
+        for result in results:
+            if isinstance(result, BaseException):
+                custom_print(f"Error al recuperar mensajes de un chat: {str(result)}", "error")
+                continue
+            for item in result:
+                current = newest.get(item[1])
+                if current is None or item[0] > current[0]:
+                    newest[item[1]] = item
+        return sorted(newest.values(), key=lambda item: item[0], reverse=True)
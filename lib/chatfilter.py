@@ -0,0 +1,157 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+
+from source.utils import custom_print
+
+
+ChatRef = Union[int, str]
+
+
+class ChatFilter:
+    """
+    Decide qué chats se procesan, con una búsqueda O(1) por mensaje.
+
+    - Lista de permitidos (CHATS): si no está vacía, solo se procesan esos chats
+      (también mientras sus nombres aún no se han resuelto a ids).
+    - Palabras de EXCLUDE_CHATS_WITH en el título: esos chats se ignoran.
+    - Ajustes manuales (/vigilar, /ignorar) que tienen prioridad sobre lo anterior.
+
+    El veredicto de cada chat se calcula una vez y se guarda; se invalida al
+    cambiar las listas o el título del chat.
+    """
+
+    def __init__(
+        self,
+        chats: Optional[Iterable[ChatRef]] = None,
+        exclude_words: Optional[Iterable[str]] = None,
+        title_of: Optional[Callable[[int], Optional[str]]] = None,
+    ):
+        self.chats: List[ChatRef] = list(chats or [])
+        self.exclude_words: List[str] = [word.lower() for word in (exclude_words or []) if word]
+        self.title_of = title_of
+
+        # Con CHATS configurado se filtra aunque ningún nombre se haya resuelto todavía
+        self.restricted: bool = bool(self.chats)
+        self.names: Set[str] = {str(chat).lower().lstrip('@') for chat in self.chats if not isinstance(chat, int)}
+        self.allowed: Set[int] = {chat for chat in self.chats if isinstance(chat, int)}
+        self.blocked: Set[int] = set()
+        self.manual_allowed: Set[int] = set()
+        self.manual_blocked: Set[int] = set()
+        self._verdicts: Dict[int, bool] = {}
+        self.filtered: int = 0
+
+    def allows(self, chat_id: Optional[int], chat: Any = None, count: bool = True) -> bool:
+        """True si los mensajes del chat deben procesarse (count=False no suma a `filtered`)."""
+        verdict = self._verdicts.get(chat_id)
+        if verdict is None:
+            verdict = self._classify(chat_id, chat)
+        if not verdict and count:
+            self.filtered += 1
+        return verdict
+
+    def _classify(self, chat_id: Optional[int], chat: Any) -> bool:
+        if chat_id is None:
+            return True
+        if chat_id in self.manual_blocked:
+            verdict = False
+        elif chat_id in self.manual_allowed:
+            verdict = True
+        elif chat_id in self.blocked:
+            verdict = False
+        else:
+            title = getattr(chat, 'title', None)
+            if title is None and self.title_of is not None:
+                title = self.title_of(chat_id)
+            if self.restricted and chat_id not in self.allowed:
+                # Chats unidos o renombrados después de refresh: se buscan por nombre aquí
+                if not self._matches(title, getattr(chat, 'username', None)):
+                    if title is None:
+                        return False  # sin título aún: se vuelve a evaluar en el próximo mensaje
+                    self._verdicts[chat_id] = False
+                    return False
+                self.allowed.add(chat_id)
+            if title is None:
+                # Título aún desconocido: se procesa y se vuelve a evaluar en el próximo mensaje
+                return True
+            verdict = not self._excluded(title)
+        self._verdicts[chat_id] = verdict
+        return verdict
+
+    def _matches(self, title: Optional[str], username: Optional[str]) -> bool:
+        """True si el título o el @usuario del chat están entre los nombres de CHATS."""
+        if not self.names:
+            return False
+        username = (username or '').lower()
+        return (title or '').lower() in self.names or bool(username and username in self.names)
+
+    def _excluded(self, title: str) -> bool:
+        title = title.lower()
+        return any(word in title for word in self.exclude_words)
+
+    def invalidate(self, chat_id: Optional[int] = None) -> None:
+        """Olvida el veredicto de un chat (o de todos)."""
+        if chat_id is None:
+            self._verdicts.clear()
+        else:
+            self._verdicts.pop(chat_id, None)
+
+    async def refresh(self, client: Any, remember: Optional[Callable[[Any], Any]] = None) -> None:
+        """
+        Recorre los diálogos una vez para resolver CHATS (ids, @usuarios o títulos)
+        y los títulos excluidos a un conjunto de ids.
+        """
+        allowed = {chat for chat in self.chats if isinstance(chat, int)}
+        blocked = set()
+        async for dialog in client.iter_dialogs():
+            if remember is not None:
+                remember(dialog.entity)
+            title = dialog.name or ''
+            if self._matches(title, getattr(dialog.entity, 'username', None)):
+                allowed.add(dialog.id)
+            if self._excluded(title):
+                blocked.add(dialog.id)
+        self.allowed = allowed
+        self.blocked = blocked
+        self.invalidate()
+        custom_print(
+            f"Filtro de chats: {len(self.allowed) if self.restricted else 'todos los'} permitidos, {len(self.blocked)} excluidos por título.",
+            "info"
+        )
+
+    def allow(self, chat_id: int) -> None:
+        """Procesa siempre un chat, aunque no esté en CHATS o su título esté excluido."""
+        self.manual_blocked.discard(chat_id)
+        self.manual_allowed.add(chat_id)
+        self.invalidate()
+
+    def block(self, chat_id: int) -> None:
+        """Deja de procesar un chat."""
+        self.manual_allowed.discard(chat_id)
+        self.manual_blocked.add(chat_id)
+        self.invalidate()
+
+    def forget(self, chat_id: int) -> None:
+        """Quita un chat de las listas manuales."""
+        self.manual_allowed.discard(chat_id)
+        self.manual_blocked.discard(chat_id)
+        self.invalidate()
+
+    @staticmethod
+    def _format_ids(ids: Set[int]) -> str:
+        return ', '.join(map(str, sorted(ids))) or 'ninguno'
+
+    def describe_monitored(self) -> str:
+        """Texto corto con los chats que se procesan."""
+        if self.restricted:
+            return str(len(self.allowed | self.manual_allowed))
+        return "todos"
+
+    def status(self) -> str:
+        """Resumen legible del filtro."""
+        lines = [
+            f"✅ Chats permitidos: {self._format_ids(self.allowed) if self.restricted else 'todos'}",
+            f"📌 Siempre procesados: {self._format_ids(self.manual_allowed)}",
+            f"⛔ Ignorados: {self._format_ids((self.blocked - self.manual_allowed) | self.manual_blocked)}",
+            f"🔤 Excluir títulos con: {', '.join(self.exclude_words) or '—'}",
+            f"🗑️ Mensajes filtrados: {self.filtered}",
+        ]
+        return "\n".join(lines)
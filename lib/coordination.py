@@ -0,0 +1,388 @@
+"""
+Coordinación de reclamos entre varias instancias del bot (varias cuentas de
+Telegram vigilando canales en común): cada código lo intenta una sola.
+
+    python -m lib.coordination --port 8765
+
+arranca el servicio local al que se conectan las instancias con
+COORDINATION_BACKEND = "socket".
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Optional, Tuple, TYPE_CHECKING
+
+from source.utils import custom_print
+
+if TYPE_CHECKING:
+    from source.config import Config
+
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    code TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    claimed_ts REAL NOT NULL
+);
+"""
+
+# Se queda el código si nadie lo tiene, si la reserva anterior caducó o si ya era suya
+CLAIM = """
+INSERT INTO claims (code, owner, claimed_ts) VALUES (?, ?, ?)
+ON CONFLICT (code) DO UPDATE SET owner = excluded.owner, claimed_ts = excluded.claimed_ts
+WHERE claims.claimed_ts < ? OR claims.owner = excluded.owner
+"""
+
+
+class ClaimCoordinator:
+    """
+    Sin coordinación: cada instancia decide sola con su propio historial (lo de
+    siempre). Las demás implementaciones comparten las reservas entre procesos.
+    """
+
+    backend: str = "local"
+
+    def __init__(self, owner: str = "", ttl: Optional[float] = 86400):
+        self.owner: str = owner or f"pid{os.getpid()}"
+        # ValueError si COORDINATION_TTL_SECONDS no es un número (se reclama sin coordinar)
+        ttl = float(ttl or 0)
+        self.ttl: float = ttl if ttl > 0 else float('inf')
+
+    async def start(self) -> None:
+        """Abre la conexión con el almacén compartido."""
+
+    async def claim(self, code: str) -> Optional[str]:
+        """
+        Reserva el código para esta instancia en una sola operación atómica.
+
+        Returns:
+            Optional[str]: None si esta instancia se queda el código; si no, la
+            instancia que ya lo tenía.
+        """
+        return None
+
+    async def release(self, code: str) -> None:
+        """Libera una reserva propia (código no intentado) para que otra instancia pueda reclamarlo."""
+
+    async def close(self) -> None:
+        pass
+
+    def describe(self) -> str:
+        return self.backend
+
+
+class SQLiteCoordinator(ClaimCoordinator):
+    """
+    Reservas en una base SQLite compartida (modo WAL): el INSERT con conflicto
+    por código es atómico entre procesos gracias a los bloqueos de archivo de
+    SQLite. Las consultas se hacen en un hilo propio para no detener el bucle
+    de eventos mientras otra instancia tiene el bloqueo de escritura.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, owner: str = "", ttl: Optional[float] = 86400, timeout: float = 2):
+        super().__init__(owner, ttl)
+        self.path: str = path
+        self.timeout: float = timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def open(self) -> None:
+        """Abre la base de datos, crea el esquema y borra las reservas caducadas."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if self.ttl != float('inf'):
+            self._conn.execute("DELETE FROM claims WHERE claimed_ts < ?", (time.time() - self.ttl,))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="coordination")
+
+    def _claim(self, code: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            if self._conn.execute(CLAIM, (code, self.owner, now, now - self.ttl)).rowcount:
+                return None
+            row = self._conn.execute("SELECT owner FROM claims WHERE code = ?", (code,)).fetchone()
+        # La fila pudo liberarse entre las dos consultas: se trata como ocupada por prudencia
+        return row[0] if row else "?"
+
+    def _release(self, code: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM claims WHERE code = ? AND owner = ?", (code, self.owner))
+
+    async def claim(self, code: str) -> Optional[str]:
+        if self._conn is None:
+            return None
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._claim, code)
+        except sqlite3.Error as e:
+            # Ante un fallo se reclama igual: perder un código es peor que intentarlo dos veces
+            custom_print(f"Error en la coordinación ({self.path}) al reservar {code}: {str(e)}. Se reclama igualmente.", "error")
+            return None
+
+    async def release(self, code: str) -> None:
+        if self._conn is None:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._release, code)
+        except sqlite3.Error as e:
+            custom_print(f"Error en la coordinación ({self.path}) al liberar {code}: {str(e)}", "error")
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    def describe(self) -> str:
+        return f"{self.backend} ({self.path})"
+
+
+class SocketCoordinator(ClaimCoordinator):
+    """
+    Cliente del servicio de coordinación (CoordinationServer) por una conexión
+    TCP persistente. Las peticiones son líneas de texto y las respuestas llegan
+    en el mismo orden, así que varias reservas pueden estar en vuelo a la vez.
+    Si el servicio no responde, el código se reclama igualmente.
+    """
+
+    backend = "socket"
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, owner: str = "", ttl: Optional[float] = 86400,
+                 timeout: float = 0.5, retry_seconds: float = 5):
+        super().__init__(owner.replace(" ", "_"), ttl)
+        host, _, port = address.rpartition(":")
+        self.host: str = host or "127.0.0.1"
+        self.port: int = int(port)
+        self.timeout: float = timeout
+        self.retry_seconds: float = retry_seconds
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._waiting: Deque[asyncio.Future] = deque()
+        self._read_task: Optional[asyncio.Task] = None
+        self._connecting: Optional[asyncio.Task] = None
+        self._retry_at: float = 0.0
+        self._down: bool = False
+
+    async def start(self) -> None:
+        await self._connection()
+
+    async def _connect(self) -> bool:
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            self._retry_at = time.monotonic() + self.retry_seconds
+            if not self._down:
+                custom_print(f"Sin conexión con el servicio de coordinación {self.host}:{self.port} ({str(e) or 'timeout'}). "
+                             f"Los códigos se reclaman sin coordinar hasta que vuelva.", "warning")
+                self._down = True
+            return False
+        if self._down:
+            custom_print(f"Conexión con el servicio de coordinación {self.host}:{self.port} recuperada.", "success")
+            self._down = False
+        self._read_task = asyncio.create_task(self._read_responses())
+        return True
+
+    async def _connection(self) -> bool:
+        """True si hay conexión; intenta reconectar como mucho cada `retry_seconds`."""
+        if self._writer is not None and not self._writer.is_closing():
+            return True
+        if self._connecting is None:
+            if time.monotonic() < self._retry_at:
+                return False
+            self._connecting = asyncio.create_task(self._connect())
+        try:
+            return await asyncio.shield(self._connecting)
+        finally:
+            if self._connecting is not None and self._connecting.done():
+                self._connecting = None
+
+    async def _read_responses(self) -> None:
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                future = self._waiting.popleft()
+                if not future.done():
+                    future.set_result(line.decode().strip())
+        except (OSError, IndexError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            # Conexión perdida: las peticiones en vuelo se resuelven sin coordinar
+            writer, self._writer = self._writer, None
+            if writer is not None:
+                writer.close()
+            while self._waiting:
+                future = self._waiting.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError("conexión cerrada"))
+
+    async def _request(self, line: str) -> Optional[str]:
+        if not await self._connection():
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(future)
+        self._writer.write(line.encode())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            custom_print(f"El servicio de coordinación no respondió a tiempo ({str(e) or 'timeout'}).", "warning")
+            return None
+
+    async def claim(self, code: str) -> Optional[str]:
+        response = await self._request(f"CLAIM {code} {self.owner} {self.ttl}\n")
+        if response is not None and response.startswith("TAKEN"):
+            return response.partition(" ")[2] or "?"
+        if response is not None and response != "OK":
+            # ERROR ...: igual que sin respuesta, se reclama sin coordinar
+            custom_print(f"El servicio de coordinación rechazó la reserva de {code} ({response}).", "warning")
+        return None
+
+    async def release(self, code: str) -> None:
+        await self._request(f"RELEASE {code} {self.owner}\n")
+
+    async def close(self) -> None:
+        if self._read_task is not None:
+            self._read_task.cancel()
+            await asyncio.gather(self._read_task, return_exceptions=True)
+            self._read_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def describe(self) -> str:
+        return f"{self.backend} ({self.host}:{self.port})"
+
+
+class CoordinationServer:
+    """
+    Servicio local de coordinación: guarda en memoria qué instancia tiene cada
+    código. Protocolo de líneas de texto:
+
+        CLAIM <código> <instancia> <ttl>   ->  OK | TAKEN <instancia>
+        RELEASE <código> <instancia>       ->  OK
+    """
+
+    def __init__(self):
+        # código -> (instancia, caducidad); por orden de reserva
+        self.claims: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.requests: int = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def claim(self, code: str, owner: str, ttl: float) -> Optional[str]:
+        now = time.monotonic()
+        current = self.claims.get(code)
+        if current is not None and current[1] > now and current[0] != owner:
+            return current[0]
+        self.claims.pop(code, None)
+        self.claims[code] = (owner, now + ttl)
+        # Las reservas caducadas más antiguas se van al reservar (coste amortizado O(1))
+        while self.claims:
+            oldest = next(iter(self.claims.values()))
+            if oldest[1] > now:
+                break
+            self.claims.popitem(last=False)
+        return None
+
+    def release(self, code: str, owner: str) -> None:
+        current = self.claims.get(code)
+        if current is not None and current[0] == owner:
+            del self.claims[code]
+
+    def handle(self, line: str) -> str:
+        parts = line.split()
+        self.requests += 1
+        if len(parts) == 4 and parts[0] == "CLAIM":
+            try:
+                ttl = float(parts[3])
+            except ValueError:
+                return "ERROR ttl\n"
+            owner = self.claim(parts[1], parts[2], ttl)
+            return "OK\n" if owner is None else f"TAKEN {owner}\n"
+        if len(parts) == 3 and parts[0] == "RELEASE":
+            self.release(parts[1], parts[2])
+            return "OK\n"
+        return "ERROR comando\n"
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(self.handle(line.decode()).encode())
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> int:
+        """Empieza a escuchar y devuelve el puerto (útil con port=0)."""
+        self._server = await asyncio.start_server(self._client, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+def build_coordinator(config: 'Config') -> ClaimCoordinator:
+    """Crea la coordinación elegida en COORDINATION_BACKEND ("" = ninguna, "sqlite" o "socket")."""
+    backend = (getattr(config, 'COORDINATION_BACKEND', '') or '').lower()
+    owner = getattr(config, 'COORDINATION_INSTANCE', '') or f"{getattr(config, 'CLIENT_NAME', 'bot')}-{os.getpid()}"
+    ttl = getattr(config, 'COORDINATION_TTL_SECONDS', 86400)
+    if backend == "sqlite":
+        coordinator = SQLiteCoordinator(getattr(config, 'COORDINATION_DB_FILE', 'data/coordination.db'), owner=owner, ttl=ttl)
+        coordinator.open()
+        return coordinator
+    if backend == "socket":
+        return SocketCoordinator(
+            getattr(config, 'COORDINATION_ADDRESS', DEFAULT_ADDRESS), owner=owner, ttl=ttl,
+            timeout=getattr(config, 'COORDINATION_TIMEOUT_SECONDS', 0.5)
+        )
+    if backend not in ("", "local"):
+        raise ValueError(f"COORDINATION_BACKEND desconocido: {backend} (usa \"\", \"sqlite\" o \"socket\")")
+    return ClaimCoordinator(owner=owner, ttl=ttl)
+
+
+async def _serve(host: str, port: int) -> None:
+    server = CoordinationServer()
+    port = await server.start(host, port)
+    custom_print(f"Servicio de coordinación escuchando en {host}:{port}", "success")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Servicio local de coordinación de reclamos entre instancias")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class DedupeCache:
+    """
+    Caché de sesión de códigos ya vistos: pertenencia O(1), caducidad (TTL) y
+    tamaño máximo con expulsión del menos usado recientemente (LRU).
+
+    `add_if_absent` comprueba e inserta sin ceder el control al bucle de eventos,
+    así que dos manejadores concurrentes no pueden aceptar el mismo código.
+    """
+
+    def __init__(self, ttl: Optional[float] = 86400, max_size: int = 100_000):
+        self.ttl: Optional[float] = ttl if ttl and ttl > 0 else None
+        self.max_size: int = max_size
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def _expired(self, expires_at: float, now: float) -> bool:
+        return self.ttl is not None and expires_at <= now
+
+    def __contains__(self, code: str) -> bool:
+        expires_at = self._entries.get(code)
+        if expires_at is None:
+            return False
+        if self._expired(expires_at, time.monotonic()):
+            del self._entries[code]
+            return False
+        self._entries.move_to_end(code)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_if_absent(self, code: str) -> bool:
+        """
+        Registra el código si no estaba ya (o había caducado).
+
+        Returns:
+            bool: True si el código es nuevo y el llamador debe procesarlo.
+        """
+        if code in self:
+            return False
+        now = time.monotonic()
+        self._entries[code] = now + self.ttl if self.ttl is not None else 0.0
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return True
+
+    def discard(self, code: str) -> None:
+        self._entries.pop(code, None)
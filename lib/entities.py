@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+from telethon import utils
+
+from source.utils import custom_print
+
+
+class EntityCache:
+    """
+    Caché en memoria de chats y remitentes (id -> título y banderas).
+
+    Se llena gratis con las entidades que ya vienen en cada actualización de
+    Telegram; lo que falta se pide en segundo plano, de modo que la extracción y
+    el reclamo nunca esperan a resolver una entidad. Opcionalmente se guarda en
+    disco para conservarla entre reinicios.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size: int = 5000):
+        self.path: Optional[str] = path
+        self.max_size: int = max_size
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._pending: Set[int] = set()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "fetches": 0, "observed": 0}
+
+    @staticmethod
+    def describe(entity: Any) -> Dict[str, Any]:
+        """Extrae de una entidad de Telethon solo lo que usa el bot."""
+        title = getattr(entity, 'title', None)
+        if title is None:
+            names = [getattr(entity, 'first_name', None), getattr(entity, 'last_name', None)]
+            title = " ".join(name for name in names if name) or getattr(entity, 'username', None) or 'Chat privado'
+        return {
+            "title": title,
+            "username": getattr(entity, 'username', None),
+            "is_self": bool(getattr(entity, 'is_self', False)),
+            "is_bot": bool(getattr(entity, 'bot', False)),
+            "is_broadcast": bool(getattr(entity, 'broadcast', False)),
+        }
+
+    def remember(self, entity: Any) -> Optional[int]:
+        """Guarda una entidad de Telethon y devuelve su id (con el formato de event.chat_id)."""
+        if entity is None:
+            return None
+        try:
+            peer_id = utils.get_peer_id(entity)
+        except (TypeError, ValueError):
+            return None
+        self._entries[peer_id] = self.describe(entity)
+        self._entries.move_to_end(peer_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return peer_id
+
+    def observe(self, event: Any) -> None:
+        """Aprovecha las entidades incluidas en la actualización (sin peticiones de red)."""
+        for attribute in ('chat', 'sender'):
+            entity = getattr(event, attribute, None)
+            if entity is not None and self.remember(entity) is not None:
+                self.stats["observed"] += 1
+
+    def get(self, peer_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Devuelve la información en caché o None; nunca bloquea."""
+        info = self._entries.get(peer_id) if peer_id is not None else None
+        if info is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self._entries.move_to_end(peer_id)
+        return info
+
+    def title(self, peer_id: Optional[int]) -> str:
+        info = self.get(peer_id)
+        return info["title"] if info else str(peer_id)
+
+    def prefetch(self, client: Any, peer_id: Optional[int]) -> None:
+        """Pide en segundo plano una entidad que no está en caché (una sola vez por id)."""
+        if client is None or peer_id is None or peer_id in self._entries or peer_id in self._pending:
+            return
+        self._pending.add(peer_id)
+        asyncio.create_task(self._fetch(client, peer_id))
+
+    async def _fetch(self, client: Any, peer_id: int) -> None:
+        try:
+            self.stats["fetches"] += 1
+            self.remember(await client.get_entity(peer_id))
+        except Exception as e:
+            custom_print(f"No se pudo resolver la entidad {peer_id}: {str(e)}", "debug")
+        finally:
+            self._pending.discard(peer_id)
+
+    def load(self) -> None:
+        """Carga la caché guardada en disco, si existe."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+            for peer_id, info in list(entries.items())[-self.max_size:]:
+                self._entries[int(peer_id)] = info
+            custom_print(f"Cargadas {len(self._entries)} entidades de Telegram en caché.", "info")
+        except Exception as e:
+            custom_print(f"Error al cargar la caché de entidades ({self.path}): {str(e)}", "error")
+
+    def save(self) -> None:
+        """Guarda la caché en disco."""
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'w') as f:
+                json.dump({str(peer_id): info for peer_id, info in self._entries.items()}, f)
+        except Exception as e:
+            custom_print(f"Error al guardar la caché de entidades ({self.path}): {str(e)}", "error")
@@ -0,0 +1,204 @@
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+# Patrones por defecto para detectar códigos en diferentes formatos. El orden
+# importa: en una misma posición gana el primer patrón que coincide, así que los
+# que aportan contexto van antes que el genérico. Todos deben empezar al inicio
+# de una palabra (ver SCAN_GATE).
+DEFAULT_CODE_PATTERNS: List[Tuple[str, str]] = [
+    ("key_emoji", r'🔑\s*(?i:code):?\s*((?i:[A-Z0-9]{8,10}))\b'),  # Formato con emoji de llave
+    ("redpacket", r'(?i:redpack(?:et)?\s*code):?\s*((?i:[A-Z0-9]{8,10}))\b'),  # Formato "Redpack code: ABC12345"
+    ("labeled", r'(?i:code):?\s*((?i:[A-Z0-9]{8,10}))\b'),  # Formato "Code: ABC12345"
+    ("own_line", r'(?m:^)((?i:[A-Z0-9]{8,10}))(?m:$)'),  # Código en una línea por sí solo
+    # Solo con guión: con un espacio, dos palabras sueltas ("GOLD 2025") pasarían por un código
+    ("separated", r'\b([A-Z0-9]{4}-[A-Z0-9]{4})\b'),  # Códigos con guión en medio
+    ("plain", r'\b((?i:[A-Z0-9]{8,10}))\b'),  # Códigos de 8-10 caracteres alfanuméricos
+]
+
+
+# Enlaces de pregunta/respuesta de Binance ("uni-qr/cart/<id>" y, más abajo, "Answer: ...")
+CART_LINK = re.compile(r'app\.binance\.com/uni-qr/cart/(\d+)')
+CART_ANSWER = re.compile(r'Answer:\s*(\S[^\n]*)')
+
+# Campos de un botón (o de su `type` en las capas nuevas de Telegram) con texto útil
+BUTTON_TEXT_FIELDS = ("copy_text", "query")
+BUTTON_URL_FIELDS = ("url",)
+URL_SEPARATORS = re.compile(r'[/?=&#.:]')
+
+
+def is_valid_code(token: str) -> bool:
+    """Comprueba el formato de un código de criptocaja: 8 caracteres alfanuméricos en mayúsculas con letras y números."""
+    return (
+        len(token) == 8
+        and token.isalnum()
+        and token.isupper()
+        and not token.isalpha()
+        and not token.isdigit()
+    )
+
+
+# Con los patrones por defecto todo código válido lleva un dígito ASCII: sin ninguno
+# en el texto no hace falta escanearlo
+HAS_DIGIT = re.compile(r'[0-9]')
+
+
+class CodeCandidate(NamedTuple):
+    code: str
+    pattern: str
+    start: int
+    end: int
+
+
+class CodeExtractor:
+    """Escanea un texto una sola vez con todos los patrones combinados en una única expresión."""
+
+    # Solo se prueban las alternativas al inicio de una palabra; evita intentar
+    # todos los patrones en cada carácter y duplica el rendimiento del escaneo.
+    SCAN_GATE = r'(?<!\w)(?=\S)'
+
+    def __init__(self, patterns: Optional[Iterable[Tuple[str, str]]] = None):
+        self.patterns: List[Tuple[str, str]] = list(patterns or DEFAULT_CODE_PATTERNS)
+
+        # Cada patrón se envuelve en un grupo con nombre; se guarda el rango de
+        # grupos internos para localizar el código dentro de la coincidencia.
+        # Como el grupo exterior es el último en cerrarse, match.lastindex lo identifica.
+        alternatives = []
+        self._groups: Dict[int, Tuple[str, int, int]] = {}  # grupo exterior -> (nombre, primer y último grupo interno)
+        group_index = 0
+        for index, (name, pattern) in enumerate(self.patterns):
+            inner = re.compile(pattern).groups
+            alternatives.append(f"(?P<p{index}>{pattern})")
+            self._groups[group_index + 1] = (name, group_index + 2, group_index + 1 + inner)
+            group_index += 1 + inner
+
+        self._scanner = re.compile(self.SCAN_GATE + "(?:" + "|".join(alternatives) + ")")
+        self._needs_digit: bool = self.patterns == DEFAULT_CODE_PATTERNS
+
+    def _code_from_match(self, match: "re.Match", first: int, last: int) -> Tuple[str, int, int]:
+        # El código es el último grupo interno que participó en la coincidencia
+        for index in range(last, first - 1, -1):
+            value = match.group(index)
+            if value is not None:
+                return value, match.start(index), match.end(index)
+        return match.group(first - 1), match.start(), match.end()
+
+    @staticmethod
+    def _normalize(raw: str) -> str:
+        if len(raw) != 8:
+            raw = raw.replace(" ", "").replace("-", "")
+        return raw.upper()
+
+    def extract(self, text: str) -> List[CodeCandidate]:
+        """
+        Extrae los códigos válidos de un texto recorriéndolo una sola vez.
+
+        Args:
+            text (str): Texto del mensaje.
+
+        Returns:
+            List[CodeCandidate]: Códigos únicos en orden de aparición, con el patrón que los detectó y su posición.
+        """
+        if not text or not isinstance(text, str):
+            return []
+        if self._needs_digit and HAS_DIGIT.search(text) is None:
+            return []
+
+        candidates: List[CodeCandidate] = []
+        seen = set()
+        groups = self._groups
+        for match in self._scanner.finditer(text):
+            name, first, last = groups[match.lastindex]
+            if first == last:
+                raw, start, end = match.group(first), match.start(first), match.end(first)
+            else:
+                raw, start, end = self._code_from_match(match, first, last)
+            code = self._normalize(raw)
+            if code in seen or not is_valid_code(code):
+                continue
+            seen.add(code)
+            candidates.append(CodeCandidate(code, name, start, end))
+        return candidates
+
+
+def url_code_text(url: str) -> str:
+    """
+    Partes de una URL de Binance que pueden ser un código (segmentos de la ruta
+    y valores de la consulta de 8 caracteres). Pasar la URL entera por el
+    extractor cuesta varias veces más: cada "/", "." o "=" abre una palabra.
+    Los enlaces de pregunta/respuesta se conservan enteros.
+    """
+    lowered = url.lower()
+    if "binance" not in lowered:
+        return ""
+    if "uni-qr/cart/" in lowered:
+        return url
+    return "\n".join(part for part in URL_SEPARATORS.split(url) if len(part) == 8 and part.isalnum())
+
+
+def message_extra_text(message: Any) -> str:
+    """
+    Texto del mensaje que no está en raw_text (que ya incluye el pie de foto):
+    URLs ocultas tras enlaces con texto, botones (texto, enlace, texto a copiar)
+    y la vista previa web. Solo lee lo que ya trae la actualización, sin
+    peticiones a Telegram. De las URLs se toman solo las de Binance, para no
+    confundir identificadores de otros enlaces con códigos.
+
+    Returns:
+        str: Las partes separadas por saltos de línea ("" si no hay ninguna).
+    """
+    entities = getattr(message, 'entities', None)
+    markup = getattr(message, 'reply_markup', None)
+    media = getattr(message, 'media', None)
+    if not entities and markup is None and media is None:
+        return ""
+
+    parts: List[str] = []
+    for entity in entities or ():
+        url = getattr(entity, 'url', None)
+        if url:
+            parts.append(url_code_text(url))
+
+    for row in getattr(markup, 'rows', None) or ():
+        for button in row.buttons:
+            parts.append(getattr(button, 'text', None) or "")
+            for source in (button, getattr(button, 'type', None)):
+                if source is None:
+                    continue
+                for field in BUTTON_TEXT_FIELDS:
+                    value = getattr(source, field, None)
+                    if value and isinstance(value, str):
+                        parts.append(value)
+                for field in BUTTON_URL_FIELDS:
+                    value = getattr(source, field, None)
+                    if value and isinstance(value, str):
+                        parts.append(url_code_text(value))
+
+    webpage = getattr(media, 'webpage', None)
+    if webpage is not None:
+        url = getattr(webpage, 'url', None)
+        if url:
+            parts.append(url_code_text(url))
+        for field in ("title", "description"):
+            value = getattr(webpage, field, None)
+            if value:
+                parts.append(value)
+
+    return "\n".join(part for part in parts if part)
+
+
+def extract_cart_answer(text: str) -> Optional[Tuple[str, str]]:
+    """
+    Busca un enlace "uni-qr/cart/<id>" con su "Answer:".
+
+    Returns:
+        tuple: (id, respuesta sin emojis ni signos) o None.
+    """
+    link = CART_LINK.search(text)
+    if link is None:
+        return None
+    answer = CART_ANSWER.search(text)
+    if answer is None:
+        return None
+    cleaned = re.sub(r'[^\w\s-]', '', answer.group(1)).strip()
+    return (link.group(1), cleaned) if cleaned else None
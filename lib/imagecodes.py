@@ -0,0 +1,176 @@
+import asyncio
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from lib.extractor import url_code_text
+from source.utils import custom_print
+
+
+# Tipos de PhotoSize que no sirven para decodificar (miniatura difuminada y silueta vectorial)
+SKIPPED_PHOTO_TYPES = ("i", "j")
+
+# Detector de QR de cada proceso del grupo (se crea al primer uso)
+_detector = None
+
+
+def decode_image(data: bytes, ocr: bool = False, max_side: int = 1600) -> List[str]:
+    """
+    Textos de una imagen: el contenido de sus QR y, con ocr=True y pytesseract
+    instalado, el texto reconocido. Se ejecuta en los procesos del grupo.
+
+    Args:
+        data (bytes): Imagen codificada (JPEG, PNG, WEBP...).
+        ocr (bool): Reconocer también el texto de la imagen.
+        max_side (int): Las imágenes más grandes se reducen antes de buscar QR.
+    """
+    global _detector
+    import cv2
+    import numpy
+
+    image = cv2.imdecode(numpy.frombuffer(data, dtype=numpy.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return []
+    height, width = image.shape[:2]
+    if max_side and max(height, width) > max_side:
+        scale = max_side / max(height, width)
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    if _detector is None:
+        _detector = cv2.QRCodeDetector()
+    texts: List[str] = []
+    found, decoded, _points, _ = _detector.detectAndDecodeMulti(image)
+    if found:
+        texts.extend(text for text in decoded if text)
+    if not texts:
+        # Con un solo QR la búsqueda simple acierta en casos en que la múltiple falla
+        text, _points, _ = _detector.detectAndDecode(image)
+        if text:
+            texts.append(text)
+
+    if ocr:
+        try:
+            import pytesseract
+            texts.append(pytesseract.image_to_string(image))
+        except ImportError:
+            pass
+    return texts
+
+
+def _warm() -> None:
+    """Importa OpenCV en el proceso para que la primera imagen no pague la importación."""
+    import cv2  # noqa: F401
+    import numpy  # noqa: F401
+
+
+def decoded_text(texts: Iterable[str]) -> str:
+    """Junta lo leído de una imagen para el extractor; de las URLs solo quedan sus posibles códigos."""
+    return "\n".join(
+        url_code_text(text) if text.startswith(("http://", "https://")) else text
+        for text in texts
+    )
+
+
+def _photo_size_bytes(size: Any) -> int:
+    if getattr(size, 'type', '') in SKIPPED_PHOTO_TYPES:
+        return 0
+    progressive = getattr(size, 'sizes', None)
+    if progressive:
+        return max(progressive)
+    if getattr(size, 'size', None):
+        return size.size
+    cached = getattr(size, 'bytes', None)
+    return len(cached) if cached else 0
+
+
+def image_download_plan(message: Any, max_bytes: int) -> Optional[Tuple[Any, int]]:
+    """
+    Qué descargar de un mensaje con imagen sin pasar de `max_bytes`, con los
+    datos que ya trae la actualización.
+
+    Returns:
+        tuple: (thumb, bytes), con thumb el tamaño de foto para download_media
+        (None = el documento entero), o None si no hay imagen o no cabe.
+    """
+    media = getattr(message, 'media', None)
+    photo = getattr(media, 'photo', None)
+    if photo is not None:
+        best: Optional[Tuple[Any, int]] = None
+        for size in getattr(photo, 'sizes', None) or ():
+            size_bytes = _photo_size_bytes(size)
+            if size_bytes and size_bytes <= max_bytes and (best is None or size_bytes > best[1]):
+                best = (size, size_bytes)
+        return best
+
+    document = getattr(media, 'document', None)
+    if document is not None and (getattr(document, 'mime_type', '') or '').startswith('image/'):
+        size_bytes = getattr(document, 'size', 0) or 0
+        if 0 < size_bytes <= max_bytes:
+            return None, size_bytes
+    return None
+
+
+def has_image(message: Any) -> bool:
+    """True si el mensaje trae una foto o un documento de imagen."""
+    media = getattr(message, 'media', None)
+    if media is None:
+        return False
+    if getattr(media, 'photo', None) is not None:
+        return True
+    document = getattr(media, 'document', None)
+    return document is not None and (getattr(document, 'mime_type', '') or '').startswith('image/')
+
+
+class ImageDecoder:
+    """
+    Decodifica QR (y, opcionalmente, texto) de imágenes en un grupo de procesos,
+    para que el trabajo de CPU nunca detenga el bucle de eventos. OpenCV
+    (opencv-python-headless) es opcional: sin él, `available` es False.
+    """
+
+    def __init__(self, workers: int = 1, ocr: bool = False, max_side: int = 1600, max_pending: int = 8):
+        self.workers: int = max(1, workers)
+        self.ocr: bool = ocr
+        self.max_side: int = max_side
+        self.max_pending: int = max_pending
+        self.available: bool = all(importlib.util.find_spec(name) is not None for name in ("cv2", "numpy"))
+        self.pending: int = 0
+        self.results: Dict[str, int] = {}  # resultado -> imágenes (para /metrics)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def count(self, result: str) -> None:
+        self.results[result] = self.results.get(result, 0) + 1
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn": no se copia el proceso con el bucle de eventos y los hilos en marcha
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def warm_up(self) -> None:
+        """Arranca los procesos e importa OpenCV en ellos sin esperar."""
+        if self.available:
+            pool = self._pool()
+            for _ in range(self.workers):
+                pool.submit(_warm)
+
+    async def decode(self, data: bytes) -> List[str]:
+        """Textos de la imagen (ver decode_image); [] si no se pudo decodificar."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool(), decode_image, data, self.ocr, self.max_side)
+        except BrokenProcessPool:
+            # Un proceso murió (memoria, señal): se crea un grupo nuevo en la próxima imagen
+            custom_print("El grupo de procesos de imágenes se detuvo; se volverá a crear.", "error")
+            self._executor = None
+            self.count("error")
+            return []
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import time
+from typing import List, Optional, Set
+
+from source.utils import custom_print
+
+
+class ClaimJournal:
+    """
+    Registro de códigos reclamados: una instantánea JSON (la lista de siempre en
+    data/claimed_codes.json) más un diario de solo-añadir con una línea por evento.
+
+    Las escrituras se acumulan en memoria y las hace un hilo aparte, así que
+    añadir un código nunca bloquea el bucle de eventos. Cuando el diario supera
+    `compact_every` registros se vuelca todo a una nueva instantánea.
+    """
+
+    # Resultado que anula los registros anteriores del código (se quitó sin reclamarlo)
+    RELEASED = "released"
+
+    def __init__(self, snapshot_file: str, compact_every: int = 1000):
+        self.snapshot_file: str = snapshot_file
+        self.journal_file: str = os.path.splitext(snapshot_file)[0] + ".journal"
+        self.compact_every: int = compact_every
+
+        self.codes: Set[str] = set()
+        self._pending: List[str] = []
+        self._journal_records: int = 0
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def load(self) -> Set[str]:
+        """Carga la instantánea y reaplica el diario. Una última línea truncada (caída a mitad de escritura) se descarta."""
+        codes: Set[str] = set()
+
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r') as f:
+                codes_list = json.load(f)
+            if not isinstance(codes_list, list):
+                raise ValueError(f"El archivo {self.snapshot_file} no contiene una lista válida")
+            codes.update(codes_list)
+
+        records = 0
+        if os.path.exists(self.journal_file):
+            valid_size = 0
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        custom_print(f"Registro dañado ignorado en {self.journal_file}.", "warning")
+                    else:
+                        if record.get("outcome") == self.RELEASED:
+                            codes.discard(record["code"])
+                        else:
+                            codes.add(record["code"])
+                        records += 1
+                    valid_size += len(line)
+                file_size = f.seek(0, os.SEEK_END)
+
+            # Cortar la última línea a medio escribir para que los nuevos registros empiecen limpios
+            if valid_size < file_size:
+                custom_print(f"Registro incompleto descartado al final de {self.journal_file}.", "warning")
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(valid_size)
+
+        self.codes = codes
+        self._journal_records = records
+        return codes
+
+    def append(self, code: str, outcome: str) -> None:
+        """Añade un evento (código, hora, resultado) sin bloquear; la escritura se hace en segundo plano."""
+        self.codes.add(code)
+        self._enqueue(code, outcome)
+
+    def discard(self, code: str) -> None:
+        """Quita un código y anota la baja en el diario, para que al recargar ya no cuente como reclamado."""
+        if code not in self.codes:
+            return
+        self.codes.discard(code)
+        self._enqueue(code, self.RELEASED)
+
+    def _enqueue(self, code: str, outcome: str) -> None:
+        record = {"code": code, "ts": round(time.time(), 3), "outcome": outcome}
+        self._pending.append(json.dumps(record, separators=(",", ":")) + "\n")
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sin bucle de eventos (p. ej. desde un script): escribir directamente
+            self._commit(self._pending, self._write_lines(self._pending))
+            return
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._pending:
+            # La cola se intercambia en el hilo del bucle; el hilo de escritura solo ve su copia
+            lines, self._pending = self._pending, []
+            written = await asyncio.to_thread(self._write_lines, lines)
+            if not self._commit(lines, written):
+                return
+            if self._journal_records >= self.compact_every:
+                snapshot = list(self.codes)
+                if await asyncio.to_thread(self._compact, snapshot):
+                    self._journal_records = 0
+
+    def _commit(self, lines: List[str], written: bool) -> bool:
+        if written:
+            self._journal_records += len(lines)
+            if lines is self._pending:
+                self._pending = []
+        elif lines is not self._pending:
+            # Devolver los registros a la cola para reintentarlos en la próxima escritura
+            self._pending[:0] = lines
+        return written
+
+    def _write_lines(self, lines: List[str]) -> bool:
+        try:
+            os.makedirs(os.path.dirname(self.journal_file) or ".", exist_ok=True)
+            with open(self.journal_file, 'a') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            return True
+        except OSError as e:
+            custom_print(f"Error de E/S al escribir en {self.journal_file}: {str(e)}", "error")
+            return False
+
+    def _compact(self, snapshot: List[str]) -> bool:
+        """Escribe una nueva instantánea de forma atómica y vacía el diario."""
+        tmp_file = self.snapshot_file + ".tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+            # Si el proceso cae aquí, el diario solo repite códigos ya presentes en la instantánea
+            with open(self.journal_file, 'w'):
+                pass
+            custom_print(f"Diario compactado: {len(snapshot)} códigos en {self.snapshot_file}.", "debug")
+            return True
+        except OSError as e:
+            custom_print(f"Error al compactar {self.snapshot_file}: {str(e)}", "error")
+            return False
+
+    async def close(self) -> None:
+        """Espera a que se escriban los registros pendientes."""
+        if self._flush_task and not self._flush_task.done():
+            await self._flush_task
+        if self._pending:
+            lines, self._pending = self._pending, []
+            self._commit(lines, await asyncio.to_thread(self._write_lines, lines))
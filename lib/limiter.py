@@ -0,0 +1,80 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional
+
+
+class RateLimiter:
+    """
+    Limita las solicitudes a Binance con dos reglas:
+
+    - Presupuesto por hora en ventana deslizante (max_per_hour, 0 = ilimitado).
+    - Espaciado mínimo entre solicitudes: la primera sale al instante y solo se
+      espera cuando la anterior fue hace menos de `min_spacing` segundos.
+    """
+
+    WINDOW_SECONDS = 3600
+
+    def __init__(self, max_per_hour: float = 0, min_spacing: float = 0):
+        self.max_per_hour: int = int(max_per_hour or 0)
+        self.min_spacing: float = float(min_spacing or 0)
+
+        self._sent: Deque[float] = deque()
+        self._next_slot: float = 0.0
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.WINDOW_SECONDS
+        while self._sent and self._sent[0] <= cutoff:
+            self._sent.popleft()
+
+    def remaining(self) -> Optional[int]:
+        """Solicitudes que quedan en la ventana actual (None si no hay límite)."""
+        if self.max_per_hour <= 0:
+            return None
+        self._prune(time.monotonic())
+        return max(0, self.max_per_hour - len(self._sent))
+
+    def reset_in(self) -> float:
+        """Segundos hasta que se libere la próxima solicitud del presupuesto."""
+        if self.max_per_hour <= 0 or not self._sent:
+            return 0.0
+        now = time.monotonic()
+        self._prune(now)
+        if len(self._sent) < self.max_per_hour:
+            return 0.0
+        return max(0.0, self._sent[0] + self.WINDOW_SECONDS - now)
+
+    async def acquire(self) -> bool:
+        """
+        Reserva una solicitud: comprueba el presupuesto y espera lo justo para respetar el espaciado.
+
+        Returns:
+            bool: False si se agotó el presupuesto de la hora (no se espera a que se libere).
+        """
+        now = time.monotonic()
+        if self.max_per_hour > 0:
+            self._prune(now)
+            if len(self._sent) >= self.max_per_hour:
+                return False
+
+        # Reservar el turno antes de dormir para que los workers concurrentes se escalonen
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.min_spacing
+        if self.max_per_hour > 0:
+            self._sent.append(slot)
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        return True
+
+    def status(self) -> str:
+        """Resumen legible del presupuesto."""
+        remaining = self.remaining()
+        if remaining is None:
+            budget = "♾️ Sin límite por hora"
+        else:
+            budget = f"📊 Restantes esta hora: {remaining}/{self.max_per_hour}"
+            reset = self.reset_in()
+            if reset > 0:
+                budget += f" (se libera una en {int(reset // 60)}m {int(reset % 60)}s)"
+        return f"{budget}\n⏱️ Espaciado mínimo: {self.min_spacing:g}s"
@@ -1,13 +1,23 @@
+from collections import deque
 from datetime import datetime
-from typing import List, Set
 
 import asyncio
-import random
 import json
 import os
-from typing import List, Set, TYPE_CHECKING # Added TYPE_CHECKING
+import sqlite3
+import time
+from typing import Deque, Dict, List, Optional, Set, Tuple, TYPE_CHECKING # Added TYPE_CHECKING
 
-from lib import BinanceAPI
+from lib.api.binance import RESULTS, ClaimStatus, GrabResult
+from lib.coordination import ClaimCoordinator, build_coordinator
+from lib.extractor import is_valid_code
+from lib.journal import ClaimJournal
+from lib.reloader import validate_headers
+from lib.profiles import BinanceProfile, build_profiles, profile_headers
+from lib.dedupe import DedupeCache
+from lib.stats import ClaimStats, DATE_FORMAT
+from lib.store import ClaimStore
+from lib.timing import LatencyTracker
 # from source.config import Config -> Removed
 from source.utils import custom_print
 
@@ -16,234 +26,453 @@ if TYPE_CHECKING:
     from lib.api.telegram import BaseClient # Added for type hinting
 
 
+# Estado -> (nivel, mensaje en consola); admite {token}, {error_code} y {message}
+STATUS_MESSAGES: Dict[ClaimStatus, Tuple[str, str]] = {
+    ClaimStatus.PROCESSED: ("info", "🔍 Código {token} ya fue procesado o es inválido."),
+    ClaimStatus.CAPTCHA: ("error", "¡Captcha detectado! Se requiere intervención manual. Pausando procesamiento."),
+    ClaimStatus.TOO_MANY_REQUESTS: ("warning", "Límite de solicitudes alcanzado (too_many_requests). Pausando procesamiento."),
+    ClaimStatus.SESSION_EXPIRED: ("error", "❌ Sesión de Binance expirada al intentar procesar {token}. Actualiza las cookies en config.py (se aplican sin reiniciar). Pausando."),
+    ClaimStatus.API_ERROR: ("error", "❌ Error específico de API Binance '{error_code}' para {token}: {message}. Pausando."),
+    ClaimStatus.INVALID_RESPONSE: ("error", "❌ Formato de respuesta inválido de API Binance para {token}. Pausando."),
+    ClaimStatus.JSON_ERROR: ("error", "❌ Error decodificando respuesta JSON de Binance para {token}. Podría ser un problema temporal o de API. Pausando."),
+    ClaimStatus.HTTP_ERROR: ("error", "❌ Error HTTP {error_code} de Binance al intentar reclamar {token}."),
+    ClaimStatus.TIMEOUT: ("error", "❌ Timeout de red al intentar reclamar {token}. Reintentando con el próximo token si es posible."),
+    ClaimStatus.NETWORK_ERROR: ("error", "❌ Error de red al intentar reclamar {token}. Reintentando con el próximo token si es posible."),
+    ClaimStatus.UNKNOWN_ERROR: ("error", "❌ Error desconocido al procesar {token}. Pausando."),
+}
+
+# Texto que precede al aviso de pausa enviado al administrador
+PAUSE_DETAILS: Dict[ClaimStatus, str] = {
+    ClaimStatus.CAPTCHA: "🚫 ¡Captcha detectado en Binance para el código `{token}`! Resuélvelo manualmente en el navegador.",
+    ClaimStatus.TOO_MANY_REQUESTS: "⏳ Demasiadas solicitudes a Binance procesando el código `{token}`.",
+    ClaimStatus.SESSION_EXPIRED: "⚠️ ¡Sesión de Binance expirada procesando el código `{token}`! Actualiza las cookies en config.py: se aplican sin reiniciar.",
+}
+
+
 class ManipulateToken:
     def __init__(self, config: 'Config', client_handler: 'BaseClient'): # Added client_handler
         self.config: 'Config' = config 
         self.client_handler: 'BaseClient' = client_handler # Store client_handler
-        # Pass config to BinanceAPI constructor
-        self.api: BinanceAPI = BinanceAPI(self.config)
+        # Una o varias cuentas de Binance, cada una con su cliente, presupuesto y pausa
+        self.profiles: List[BinanceProfile] = build_profiles(self.config, notify=self.client_handler.send_admin_notification)
+        self.dispatch_mode: str = getattr(self.config, 'CLAIM_DISPATCH_MODE', 'all')
 
         self.last_timestamp = 0
-        self.processed_tokens: List[str] = [] # Cache de sesión
+        self.processed_tokens: DedupeCache = DedupeCache( # Cache de sesión
+            ttl=getattr(self.config, 'DEDUPE_TTL_SECONDS', 86400),
+            max_size=getattr(self.config, 'DEDUPE_MAX_SIZE', 100_000)
+        )
         self.successful_claims: Dict[str, dict] = {}  # Diccionario para códigos canjeados con éxito
-        self.timeout: bool = False
+        self.stats: ClaimStats = ClaimStats(recent_size=getattr(self.config, 'CLAIM_SUMMARY_RECENT', 5))
         self.last_processed: bool = True
+        self.latency: LatencyTracker = LatencyTracker()
+        # Códigos descartados con todas las cuentas en pausa o bloqueadas (sesión expirada,
+        # captcha...) (código, momento); se reintentan si las credenciales se recargan a tiempo
+        self.held_codes: Deque[Tuple[str, float]] = deque(maxlen=getattr(self.config, 'HELD_CODES_MAX', 50))
+        # Códigos sin intentar por presupuesto por hora agotado: se vuelven a encolar
+        # cuando la ventana deslizante libera una solicitud
+        self.deferred_codes: Dict[str, asyncio.TimerHandle] = {}
+        self.deferred_codes_max: int = getattr(self.config, 'RATE_LIMITED_CODES_MAX', 50)
         
         self.claimed_codes_file: str = "data/claimed_codes.json"
         self.successful_claims_file: str = "data/successful_claims.json"
         self.permanently_claimed_codes: Set[str] = set()
+        self.claimed_codes_journal = ClaimJournal(
+            self.claimed_codes_file,
+            compact_every=getattr(self.config, 'CLAIMED_CODES_COMPACT_EVERY', 1000)
+        )
+        # Historial de intentos en SQLite (sustituye a la reescritura completa de successful_claims.json)
+        self.store: ClaimStore = ClaimStore(getattr(self.config, 'CLAIMS_DB_FILE', 'data/claims.db'))
         self._ensure_data_directory()
         self._load_claimed_codes()
+        self._open_store()
         self._load_successful_claims()
+        # Reservas compartidas con otras instancias del bot (COORDINATION_BACKEND)
+        self.coordinator: ClaimCoordinator = self._open_coordinator()
+
+    @property
+    def timeout(self) -> bool:
+        """True mientras todas las cuentas están pausadas por un error previo."""
+        return all(profile.recovery.is_paused for profile in self.profiles)
+
+    def get_profile(self, name: str) -> Optional[BinanceProfile]:
+        """Busca un perfil por nombre."""
+        return next((profile for profile in self.profiles if profile.name == name), None)
 
     def _ensure_data_directory(self):
         """Ensures the data directory exists."""
         os.makedirs(os.path.dirname(self.claimed_codes_file), exist_ok=True)
 
     def _load_claimed_codes(self):
-        """Loads permanently claimed codes from the JSON file."""
+        """Loads permanently claimed codes from the snapshot file and replays the journal on top of it."""
         try:
-            if os.path.exists(self.claimed_codes_file):
-                with open(self.claimed_codes_file, 'r') as f:
-                    codes_list = json.load(f)
-                    if isinstance(codes_list, list):
-                        self.permanently_claimed_codes = set(codes_list)
-                        custom_print(f"Cargados {len(self.permanently_claimed_codes)} códigos reclamados permanentemente.", "info")
-                    else:
-                        custom_print(f"Error: El archivo de códigos reclamados ({self.claimed_codes_file}) no contiene una lista válida. Iniciando con un conjunto vacío.", "error")
-                        self.permanently_claimed_codes = set()
+            if os.path.exists(self.claimed_codes_file) or os.path.exists(self.claimed_codes_journal.journal_file):
+                self.permanently_claimed_codes = self.claimed_codes_journal.load()
+                custom_print(f"Cargados {len(self.permanently_claimed_codes)} códigos reclamados permanentemente.", "info")
             else:
                 custom_print(f"Archivo de códigos reclamados ({self.claimed_codes_file}) no encontrado. Se creará uno nuevo al reclamar el primer código.", "info")
         except json.JSONDecodeError:
             custom_print(f"Error al decodificar JSON del archivo de códigos reclamados ({self.claimed_codes_file}). Verifique el archivo o elimínelo para empezar de nuevo. Iniciando con un conjunto vacío.", "error")
             self.permanently_claimed_codes = set()
+        except ValueError as e:
+            custom_print(f"Error: {str(e)}. Iniciando con un conjunto vacío.", "error")
+            self.permanently_claimed_codes = set()
         except Exception as e:
             custom_print(f"Error inesperado al cargar códigos reclamados: {str(e)}", "error")
             self.permanently_claimed_codes = set()
+        # El diario y el manipulador comparten el mismo conjunto
+        self.claimed_codes_journal.codes = self.permanently_claimed_codes
 
-    def _save_claimed_code(self, token: str):
-        """Saves a newly claimed token to the JSON file and updates the in-memory set."""
-        if token in self.permanently_claimed_codes: # Should already be added to set before calling
-            pass # Already in set, file will be updated with current set
-        
+    def _save_claimed_code(self, token: str, outcome: str = "registered"):
+        """Appends the token to the claimed-codes journal; the disk write happens off the event loop."""
         self.permanently_claimed_codes.add(token) # Ensure it's in the set
-
-        self._ensure_data_directory() # Ensure directory exists before writing
         try:
-            # Read current codes, update, then write to avoid losing data if file was modified externally (unlikely here)
-            # For simplicity and given this is single-threaded access, we can just write the whole current set.
-            # If concurrent access was a concern, a read-modify-write with file locking would be needed.
-            current_codes_list = list(self.permanently_claimed_codes) # Convert set to list for JSON
-            with open(self.claimed_codes_file, 'w') as f:
-                json.dump(current_codes_list, f, indent=4)
-            custom_print(f"Código {token} guardado permanentemente en {self.claimed_codes_file}.", "info")
-        except IOError as e:
-            custom_print(f"Error de E/S al guardar el código {token} en {self.claimed_codes_file}: {str(e)}", "error")
+            self.claimed_codes_journal.append(token, outcome)
         except Exception as e:
             custom_print(f"Error inesperado al guardar código reclamado {token}: {str(e)}", "error")
             
+    def _open_store(self):
+        """Abre el historial SQLite e importa una sola vez los archivos JSON existentes."""
+        try:
+            self.store.open()
+            self.store.migrate_json(self.permanently_claimed_codes, self.successful_claims_file)
+        except Exception as e:
+            custom_print(f"Error al abrir el historial de intentos ({self.store.path}): {str(e)}", "error")
+            
+    def _open_coordinator(self) -> ClaimCoordinator:
+        """Abre la coordinación entre instancias; si falla, cada instancia decide sola."""
+        try:
+            coordinator = build_coordinator(self.config)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            custom_print(f"Error al abrir la coordinación entre instancias: {str(e)}. Se reclamará sin coordinar.", "error")
+            return ClaimCoordinator()
+        if coordinator.backend != "local":
+            custom_print(f"Coordinación entre instancias: {coordinator.describe()} como {coordinator.owner}.", "info")
+        return coordinator
+
     def _load_successful_claims(self):
-        """Carga los códigos canjeados con éxito desde el archivo."""
+        """Carga los códigos canjeados con éxito desde el historial."""
         try:
-            if os.path.exists(self.successful_claims_file):
-                with open(self.successful_claims_file, 'r') as f:
-                    self.successful_claims = json.load(f)
-                    custom_print(f"Cargados {len(self.successful_claims)} códigos canjeados con éxito.", "info")
-            else:
-                self.successful_claims = {}
-                custom_print("No se encontró archivo de códigos canjeados. Se creará uno nuevo.", "info")
+            self.successful_claims = self.store.load_successful_claims()
+            custom_print(f"Cargados {len(self.successful_claims)} códigos canjeados con éxito.", "info")
         except Exception as e:
             self.successful_claims = {}
             custom_print(f"Error al cargar códigos canjeados: {str(e)}", "error")
+        # Los agregados de /resumen se calculan una sola vez aquí y luego se actualizan por canje
+        self.stats.rebuild(self.successful_claims)
             
-    def _save_successful_claims(self):
-        """Guarda los códigos canjeados con éxito en el archivo."""
+    def _record_attempt(
+        self,
+        token: str,
+        status: str,
+        profile: Optional[BinanceProfile] = None,
+        claimed_data: Optional[dict] = None,
+        request_seconds: Optional[float] = None,
+    ) -> None:
+        """Guarda un intento en el historial (sin bloquear), con el origen tomado de la traza de latencia."""
+        self.client_handler.metrics.attempt(profile.name if profile else None, status)
+        trace = self.latency.trace(token) or {}
+        elapsed = self.latency.elapsed(token)
+        claimed_data = claimed_data or {}
         try:
-            with open(self.successful_claims_file, 'w') as f:
-                json.dump(self.successful_claims, f, indent=4)
+            self.store.record(
+                token,
+                status,
+                profile=profile.name if profile else None,
+                chat_id=trace.get("chat_id"),
+                chat_title=trace.get("source"),
+                message_ts=trace.get("message_ts"),
+                amount=claimed_data.get("amount"),
+                currency=claimed_data.get("currency"),
+                request_ms=request_seconds * 1000 if request_seconds is not None else None,
+                latency_ms=elapsed * 1000 if elapsed is not None else None
+            )
         except Exception as e:
-            custom_print(f"Error al guardar códigos canjeados: {str(e)}", "error")
+            custom_print(f"Error al registrar el intento de {token}: {str(e)}", "error")
             
-    async def get_claim_summary(self) -> str:
-        """Genera un resumen de los códigos canjeados con éxito."""
-        if not self.successful_claims:
+    def _record_successful_claim(self, token: str, profile: BinanceProfile, claimed_data: Optional[dict]) -> None:
+        """Anota el canje de un perfil; el importe total del código suma el de todos los perfiles."""
+        claimed_data = claimed_data or {}
+        new_code = token not in self.successful_claims
+        entry = self.successful_claims.setdefault(token, {"amount": "0", "profiles": {}})
+        entry.setdefault("profiles", {})[profile.name] = claimed_data
+        entry["currency"] = claimed_data.get("currency", entry.get("currency", "N/A"))
+        entry["date"] = datetime.now().strftime(DATE_FORMAT)
+        total = 0.0
+        for data in entry["profiles"].values():
+            try:
+                total += float(data.get("amount", 0))
+            except (TypeError, ValueError):
+                pass
+        entry["amount"] = f"{total:g}"
+        self.stats.add(token, claimed_data.get("amount"), entry["currency"], entry["date"], profile.name, new_code)
+
+    async def close(self) -> None:
+        """Vacía las escrituras pendientes y cierra las conexiones con Binance."""
+        for handle in self.deferred_codes.values():
+            handle.cancel()
+        self.deferred_codes.clear()
+        await self.claimed_codes_journal.close()
+        await self.store.close()
+        await self.coordinator.close()
+        await asyncio.gather(*(profile.api.close() for profile in self.profiles))
+
+    async def get_claim_summary(self, window: str = "") -> str:
+        """
+        Genera un resumen de los códigos canjeados con éxito a partir de los agregados (tiempo constante).
+
+        Args:
+            window (str, optional): "hoy" o "semana" para ver solo ese periodo; vacío = todo.
+        """
+        stats = self.stats
+        if not stats.codes:
             return "No se han canjeado códigos con éxito aún."
             
-        total_codes = len(self.successful_claims)
-        total_value = sum(float(data['amount']) for data in self.successful_claims.values() if 'amount' in data)
-        
+        today_codes, today_totals = stats.window(1)
+        week_codes, week_totals = stats.window(7)
+        if window in ("hoy", "semana"):
+            codes, totals = (today_codes, today_totals) if window == "hoy" else (week_codes, week_totals)
+            label = "HOY" if window == "hoy" else "ÚLTIMOS 7 DÍAS"
+            return "\n".join([
+                f"📊 *CÓDIGOS CANJEADOS — {label}*",
+                f"• Códigos: {codes}",
+                f"• Valor: {stats.format_totals(totals)}",
+            ])
+            
         summary = [
             "📊 *RESUMEN DE CÓDIGOS CANJEADOS*",
-            f"• Total de códigos: {total_codes}",
-            f"• Valor total: ${total_value:.2f} USD",
+            f"• Total de códigos: {stats.codes}",
+            f"• Valor total: {stats.format_totals(stats.totals)}",
+            f"• Hoy: {today_codes} ({stats.format_totals(today_totals)})",
+            f"• Últimos 7 días: {week_codes} ({stats.format_totals(week_totals)})",
             "",
-            "*Últimos 5 códigos exitosos:*"
+            f"*Últimos {len(stats.recent)} canjes exitosos:*"
         ]
         
-        # Obtener los últimos 5 códigos exitosos
-        last_codes = list(self.successful_claims.items())[-5:]
-        for code, data in last_codes:
-            amount = data.get('amount', '0')
-            date = data.get('date', 'Fecha desconocida')
-            summary.append(f"- {code}: ${amount} USD ({date})")
+        for code, amount, currency, date, profile in reversed(stats.recent):
+            account = f" [{profile}]" if profile and len(self.profiles) > 1 else ""
+            summary.append(f"- {code}: {amount:g} {currency} ({date or 'Fecha desconocida'}){account}")
             
         return "\n".join(summary)
 
     async def main(self, token: str) -> None:
+        """Reclama un código y registra cuánto tardó cada etapa."""
+        self.latency.begin(token)
+        outcome = "skipped"
+        try:
+            outcome = await self._claim(token) or outcome
+        finally:
+            self.latency.finish(token, outcome)
+
+    async def _claim(self, token: str) -> Optional[str]:
+        checks_started = time.perf_counter()
+
         # Primero, verificar si el token ya está en la lista de reclamados permanentemente
         if token in self.permanently_claimed_codes:
             custom_print(f"Token {token} ya fue procesado anteriormente. Ignorando.", "info")
             return
 
-        # Verificar si el token ya fue procesado en esta ejecución (caché de sesión)
-        if token in self.processed_tokens:
+        # Verificar y registrar el token en la caché de sesión en un solo paso
+        if not self.processed_tokens.add_if_absent(token):
             custom_print(f"Token {token} ya fue procesado en esta sesión. Ignorando.", "info")
             return
+
+        # Reservarlo entre todas las instancias: solo una lo intenta
+        owner = await self.coordinator.claim(token)
+        if owner is not None:
+            custom_print(f"Token {token} ya lo reclama otra instancia ({owner}). Ignorando.", "info")
+            self.client_handler.metrics.dedupe_hit("instancia")
+            return "other_instance"
             
-        # Agregar el token a la lista de procesados de esta sesión
-        self.processed_tokens.append(token)
-        
         # Registrar el código como procesado permanentemente
         self.permanently_claimed_codes.add(token)
         self._save_claimed_code(token)
         custom_print(f"Código {token} registrado. Intentando canjear...", "info")
             
-        # Verificar si hemos alcanzado el límite de solicitudes por hora
-        if self.config.MAX_HOUR_REQUESTS > 0 and len(self.processed_tokens) >= self.config.MAX_HOUR_REQUESTS:
-            custom_print(
-                f"Límite de {self.config.MAX_HOUR_REQUESTS} solicitudes por hora alcanzado.",
-                "warning"
-            )
-            self.timeout = True
+        # Verificar el formato (los códigos extraídos de mensajes ya vienen validados;
+        # esto cubre los que llegan por otras vías, como /claim_)
+        if not is_valid_code(token):
+            custom_print(f"Ignorando token que no cumple con el formato de código válido (8 caracteres alfanuméricos en mayúsculas, con letras y números): {token}", "warning")
             return
             
-        # Verificar si estamos en modo de espera por captcha o límite de solicitudes
-        if self.timeout:
-            custom_print("En modo de espera debido a un error previo", "warning")
-            return
+        # Elegir las cuentas que van a reclamar el código (las pausadas se saltan)
+        profiles = self._select_profiles()
+        if not profiles:
+            custom_print(f"En modo de espera debido a un error previo. {self._pause_status()}", "warning")
+            self._record_attempt(token, "paused")
+            self.held_codes.append((token, time.monotonic()))
+            # Otra instancia con cuentas activas puede reclamarlo si lo vuelve a ver
+            await self.coordinator.release(token)
+            return "paused"
+
+        custom_print(f"Procesando código: {token} ({', '.join(profile.name for profile in profiles)})", "info")
+        self.latency.mark(token, "checks", time.perf_counter() - checks_started)
 
-        # Verificar si el token es un código alfanumérico válido (solo letras mayúsculas y números)
-        if not token.isalnum() or not token.isupper() or len(token) != 8:
-            custom_print(f"Ignorando token que no cumple con el formato de código válido (8 caracteres alfanuméricos en mayúsculas): {token}", "warning")
+        # Todas las cuentas elegidas reclaman a la vez
+        results = await asyncio.gather(*(self._claim_with_profile(profile, token) for profile in profiles))
+        if any(result.status is ClaimStatus.CLAIMED for result in results):
+            outcome = ClaimStatus.CLAIMED.value
+        else:
+            outcome = next((result.label for result in results if result.status is not ClaimStatus.RATE_LIMITED), ClaimStatus.RATE_LIMITED.value)
+        # Todas las cuentas quedaron bloqueadas sin canjearlo (sesión expirada, captcha,
+        # límite de Binance): se reintenta si se recargan las credenciales
+        held = all(result.retryable and result.pause for result in results)
+        if outcome == ClaimStatus.RATE_LIMITED.value:
+            # Ninguna cuenta llegó a intentarlo: deja de contar como reclamado y se aplaza
+            await self.coordinator.release(token)
+            self._defer(token, profiles)
+            return outcome
+        self._save_claimed_code(token, outcome)
+        if held:
+            # Sin canjear: la reserva se libera para otra instancia mientras se recargan las credenciales
+            await self.coordinator.release(token)
+            self.held_codes.append((token, time.monotonic()))
+        return outcome
+
+    def _defer(self, token: str, profiles: List[BinanceProfile]) -> None:
+        """Quita un código sin intentar de los procesados y lo vuelve a encolar cuando alguna cuenta tenga presupuesto."""
+        self.claimed_codes_journal.discard(token)
+        self.permanently_claimed_codes.discard(token)
+        self.processed_tokens.discard(token)
+        if token in self.deferred_codes:
             return
-            
-        # Verificar que el token contenga al menos un número y una letra
-        if not any(c.isdigit() for c in token) or not any(c.isalpha() for c in token):
-            custom_print(f"Ignorando token que no contiene tanto números como letras: {token}", "warning")
+        if len(self.deferred_codes) >= self.deferred_codes_max:
+            custom_print(f"Demasiados códigos aplazados ({self.deferred_codes_max}). {token} no se reintentará salvo que vuelva a llegar.", "warning")
             return
+        delay = max(1.0, min(profile.limiter.reset_in() for profile in profiles))
+        self.deferred_codes[token] = asyncio.get_running_loop().call_later(delay, self._retry_deferred, token)
+        custom_print(f"Código {token} aplazado {int(delay)}s hasta que se libere una solicitud del presupuesto por hora.", "info")
+
+    def _retry_deferred(self, token: str) -> None:
+        self.deferred_codes.pop(token, None)
+        pipeline = getattr(self.client_handler, 'pipeline', None)
+        if pipeline is None or token in self.permanently_claimed_codes or token in self.processed_tokens:
+            return
+        if pipeline.submit(token):
+            custom_print(f"Reintentando el código aplazado {token}.", "info")
+
+    async def apply_credentials(self, config: 'Config') -> List[str]:
+        """
+        Aplica los encabezados de una configuración recién cargada a las cuentas
+        cuyos encabezados cambiaron y reanuda las que estaban en pausa.
+
+        Returns:
+            List[str]: Nombres de las cuentas actualizadas.
+
+        Raises:
+            ValueError: Si los encabezados no son válidos o cambió la lista de cuentas.
+        """
+        # Validar todo antes de tocar nada: o se actualizan todas las cuentas o ninguna
+        new_headers = profile_headers(config)
+        current = {profile.name for profile in self.profiles}
+        if set(new_headers) != current:
+            raise ValueError("la lista de cuentas de BINANCE_PROFILES cambió; reinicia el bot para aplicarla")
+        for name, headers in new_headers.items():
+            problem = validate_headers(headers)
+            if problem:
+                raise ValueError(f"[{name}] {problem}")
+
+        updated = []
+        for profile in self.profiles:
+            headers = new_headers[profile.name]
+            if headers == profile.api.headers:
+                continue
+            profile.api.update_headers(headers)
+            updated.append(profile)
+        self.config.headers = config.headers
+        if hasattr(config, 'BINANCE_PROFILES'):
+            self.config.BINANCE_PROFILES = config.BINANCE_PROFILES
+
+        for profile in updated:
+            await profile.recovery.resume("🔑 Credenciales recargadas. El reclamo se ha reanudado.")
+        return [profile.name for profile in updated]
+
+    def release_held_codes(self, max_age: float) -> List[str]:
+        """
+        Devuelve los códigos descartados por pausa en los últimos `max_age`
+        segundos y los quita de los procesados para que puedan reclamarse otra vez.
+        """
+        cutoff = time.monotonic() - max_age
+        codes = []
+        while self.held_codes:
+            code, held_at = self.held_codes.popleft()
+            if held_at < cutoff or code in codes:
+                continue
+            self.permanently_claimed_codes.discard(code)
+            self.processed_tokens.discard(code)
+            codes.append(code)
+        return codes
+
+    def _pause_status(self) -> str:
+        if len(self.profiles) == 1:
+            return self.profiles[0].recovery.status()
+        return " | ".join(f"{profile.name}: {profile.recovery.status()}" for profile in self.profiles)
+
+    def _select_profiles(self) -> List[BinanceProfile]:
+        """
+        Cuentas que reclamarán el código según CLAIM_DISPATCH_MODE:
+        "all" = todas las que no estén pausadas; "budget" = la que tenga más presupuesto.
+        Reserva el turno de prueba de las cuentas en modo de prueba.
+        """
+        if self.dispatch_mode == "budget":
+            candidates = sorted(self.profiles, key=lambda profile: profile.budget(), reverse=True)
+            return next(([profile] for profile in candidates if profile.recovery.try_acquire()), [])
+        return [profile for profile in self.profiles if profile.recovery.try_acquire()]
+
+    async def _claim_with_profile(self, profile: BinanceProfile, token: str) -> GrabResult:
+        """Reclama el código con una cuenta y actualiza su presupuesto y su estado de pausa."""
+        pacing_started = time.perf_counter()
+
+        # Verificar el presupuesto por hora y respetar el espaciado mínimo entre solicitudes
+        acquired = await profile.limiter.acquire()
+        request_started = time.perf_counter()
+        self.latency.mark(token, "pacing", request_started - pacing_started)
+        if not acquired:
+            profile.recovery.release_probe()
+            custom_print(
+                f"[{profile.name}] Límite de {profile.limiter.max_per_hour} solicitudes por hora alcanzado. Ignorando {token} "
+                f"(se libera una en {int(profile.limiter.reset_in())}s).",
+                "warning"
+            )
+            self._record_attempt(token, ClaimStatus.RATE_LIMITED.value, profile)
+            return RESULTS[ClaimStatus.RATE_LIMITED]
             
-        custom_print(f"Procesando código: {token}", "info")
-        
+        recovery = profile.recovery
         try:
-            # Use configurable delay with a safe default
-            delay = getattr(self.config, 'REQUEST_DELAY_SECONDS', 3)
-            await asyncio.sleep(delay)
-            result = await self.api.send_request(token)
-            
-            response_status = ""
-            claimed_data = None
-
-            if isinstance(result, dict) and result.get("status") == "claimed":
-                response_status = "claimed"
-                claimed_data = result.get("data")
-            elif isinstance(result, str):
-                response_status = result
+            profile.requests += 1
+            result = await profile.api.send_request(token)
+            request_seconds = time.perf_counter() - request_started
+            self.latency.mark(token, "request", request_seconds)
+            self.client_handler.metrics.request(profile.name, request_seconds)
+            self._record_attempt(token, result.label, profile, result.data, request_seconds)
+
+            # Procesar el resultado: la acción sale de los campos del resultado, sin comparar textos
+            status = result.status
+            if status is ClaimStatus.CLAIMED:
+                profile.claimed += 1
+                custom_print(f"¡Caja reclamada exitosamente! {result.amount} {result.currency}", "success")
+                self._record_successful_claim(token, profile, result.data)
+                await recovery.record_success()
+                return result
+
+            level, message = STATUS_MESSAGES[status]
+            custom_print(message.format(token=token, error_code=result.error_code, message=result.message), level)
+            if result.pause:
+                await recovery.record_failure(
+                    result.pause,
+                    wait_seconds=result.wait_seconds,
+                    detail=PAUSE_DETAILS.get(status, "").format(token=token)
+                )
+            elif status is ClaimStatus.PROCESSED:
+                await recovery.record_success()
             else:
-                custom_print(f"Respuesta inesperada de API: {result}", "error")
-                response_status = "unknown_api_response"
-
-            # Procesar el resultado
-            match response_status:
-                case "claimed":
-                    amount = claimed_data.get("amount", "N/A") if claimed_data else "N/A"
-                case "processed":
-                    custom_print(f"🔍 Código {token} ya fue procesado o es inválido.", "info")
-                case "captcha":
-                    custom_print("¡Captcha detectado! Se requiere intervención manual. Pausando procesamiento.", "error")
-                    self.timeout = True
-                    await self.client_handler.send_admin_notification(f"🚫 ¡Captcha detectado en Binance para el código `{token}`! Se requiere intervención manual. El bot se ha detenido temporalmente.")
-                case "too_many_requests":
-                    custom_print("Límite de solicitudes alcanzado (too_many_requests). Pausando procesamiento.", "warning")
-                    self.timeout = True
-                    await self.client_handler.send_admin_notification(f"⏳ Demasiadas solicitudes a Binance procesando el código `{token}`. El bot esperará un tiempo.")
-                case "session_expired":
-                    custom_print(f"❌ Sesión de Binance expirada al intentar procesar {token}. Actualiza credenciales/cookies y reinicia. Pausando.", "error")
-                    self.timeout = True
-                    await self.client_handler.send_admin_notification(f"⚠️ ¡Sesión de Binance expirada! El bot necesita reconfiguración/reinicio de sesión para el código `{token}`.")
-                case "timeout_error":
-                    custom_print(f"❌ Timeout de red al intentar reclamar {token}. Reintentando con el próximo token si es posible.", "error")
-                case "network_error":
-                    custom_print(f"❌ Error de red (aiohttp.ClientError) al intentar reclamar {token}. Reintentando con el próximo token si es posible.", "error")
-                case status if "http_error_" in status:
-                    http_status_code = status.split('_')[-1]
-                    custom_print(f"❌ Error HTTP {http_status_code} de Binance al intentar reclamar {token}. Pausando procesamiento.", "error")
-                    # Consider setting self.timeout = True if certain HTTP errors are persistent
-                    # For now, only printing, but 4xx errors might warrant a pause.
-                    # Example: if http_status_code.startswith("4"): self.timeout = True
-                case "json_decode_error":
-                    custom_print(f"❌ Error decodificando respuesta JSON de Binance para {token}. Podría ser un problema temporal o de API. Pausando.", "error")
-                    self.timeout = True
-                case "unknown_error_send_request":
-                    custom_print(f"❌ Error desconocido (envío) al procesar {token}. Pausando.", "error")
-                    self.timeout = True
-                case "invalid_api_response_format":
-                    custom_print(f"❌ Formato de respuesta inválido de API Binance para {token}. Pausando.", "error")
-                    self.timeout = True
-                case "unknown_error_process_response":
-                    custom_print(f"❌ Error desconocido (procesamiento respuesta) para {token}. Pausando.", "error")
-                    self.timeout = True
-                case status if "binance_api_error_" in status:
-                    api_error_code = status.split('binance_api_error_')[-1]
-                    custom_print(f"❌ Error específico de API Binance '{api_error_code}' para {token}. Pausando.", "error")
-                    self.timeout = True # Most API errors suggest a pause
-                    # Consider adding admin notification for persistent API errors if needed
-                case "unknown_api_response": # Handling the explicitly set unknown type
-                    custom_print(f"⚠️ Respuesta desconocida de la API procesando {token}. Pausando.", "warning")
-                    self.timeout = True
-                case _: # Default catch-all for other string responses or unexpected response_status
-                    custom_print(f"⚠️ Respuesta/Estado inesperado del servidor: '{response_status}' para el código {token}. Considerar como error y pausar.", "warning")
-                    self.timeout = True # Default to pausing on unknown states
+                # Los errores de transporte no pausan; en modo de prueba, el siguiente código vuelve a probar
+                recovery.release_probe()
                     
         except Exception as e:
             custom_print(f"❌ Excepción crítica al procesar el token {token}: {str(e)}", "error")
-            self.timeout = True # Pause on any unhandled exception during processing
+            self._record_attempt(token, ClaimStatus.EXCEPTION.value, profile)
+            await recovery.record_failure("exception") # Pause on any unhandled exception during processing
+            return RESULTS[ClaimStatus.EXCEPTION]
+
+        return result
@@ -0,0 +1,175 @@
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from source.utils import custom_print
+
+if TYPE_CHECKING:
+    from aiohttp import web
+    from lib.api.telegram import BaseClient
+
+
+# Límites (segundos) de los cubos del histograma de solicitudes a Binance
+REQUEST_BUCKETS: Tuple[float, ...] = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Histograma de cubos fijos; observe() es una búsqueda binaria y un incremento."""
+
+    def __init__(self, buckets: Tuple[float, ...] = REQUEST_BUCKETS):
+        self.buckets: Tuple[float, ...] = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)  # el último cubo es +Inf
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Contadores del bot en memoria. Los manejadores solo incrementan enteros en
+    diccionarios; los valores que ya existen en otros objetos (profundidad de la
+    cola, pausas, presupuesto) se leen al generar la respuesta, no por mensaje.
+    """
+
+    def __init__(self):
+        self.started_at: float = time.time()
+        self.messages: Dict[int, int] = {}            # chat_id -> mensajes recibidos
+        self.codes_extracted: int = 0
+        self.dedupe_hits: Dict[str, int] = {}         # origen -> códigos repetidos descartados
+        self.attempts: Dict[Tuple[str, str], int] = {}  # (perfil, resultado) -> intentos
+        self.request_seconds: Dict[str, Histogram] = {}  # perfil -> duración de send_request
+
+    def message(self, chat_id: Optional[int]) -> None:
+        self.messages[chat_id] = self.messages.get(chat_id, 0) + 1
+
+    def dedupe_hit(self, source: str) -> None:
+        self.dedupe_hits[source] = self.dedupe_hits.get(source, 0) + 1
+
+    def attempt(self, profile: Optional[str], status: str) -> None:
+        key = (profile or "", status)
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+
+    def request(self, profile: str, seconds: float) -> None:
+        histogram = self.request_seconds.get(profile)
+        if histogram is None:
+            histogram = self.request_seconds[profile] = Histogram()
+        histogram.observe(seconds)
+
+    def render(self, client: Optional['BaseClient'] = None) -> str:
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        metric("hau5_start_time_seconds", "gauge", "Momento de arranque (epoch).", [({}, self.started_at)])
+        metric("hau5_messages_received_total", "counter", "Mensajes recibidos por chat.",
+               [({"chat": chat_id}, count) for chat_id, count in sorted(self.messages.items(), key=lambda item: str(item[0]))])
+        metric("hau5_codes_extracted_total", "counter", "Códigos detectados en mensajes.", [({}, self.codes_extracted)])
+        metric("hau5_dedupe_hits_total", "counter", "Códigos descartados por estar ya procesados o en cola.",
+               [({"source": source}, count) for source, count in sorted(self.dedupe_hits.items())])
+        metric("hau5_claim_attempts_total", "counter", "Intentos de reclamo por cuenta y resultado.",
+               [({"profile": profile, "status": status}, count) for (profile, status), count in sorted(self.attempts.items())])
+
+        lines.append("# HELP hau5_binance_request_seconds Duración de las solicitudes a grabV2.")
+        lines.append("# TYPE hau5_binance_request_seconds histogram")
+        for profile, histogram in sorted(self.request_seconds.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                lines.append(f"hau5_binance_request_seconds_bucket{_labels({'profile': profile, 'le': bound})} {cumulative}")
+            lines.append(f"hau5_binance_request_seconds_sum{_labels({'profile': profile})} {_number(histogram.sum)}")
+            lines.append(f"hau5_binance_request_seconds_count{_labels({'profile': profile})} {histogram.count}")
+
+        if client is not None:
+            self._render_live(client, metric)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_live(client: 'BaseClient', metric) -> None:
+        """Valores que se leen directamente del bot en el momento de la consulta."""
+        metric("hau5_messages_filtered_total", "counter", "Mensajes descartados por el filtro de chats.",
+               [({}, client.chat_filter.filtered)])
+
+        pipeline = getattr(client, 'pipeline', None)
+        if pipeline is not None:
+            metric("hau5_queue_depth", "gauge", "Códigos esperando en la cola de reclamos.", [({}, pipeline.depth)])
+            metric("hau5_queue_busy_workers", "gauge", "Workers reclamando en este momento.", [({}, pipeline.busy_workers)])
+            metric("hau5_queue_dropped_total", "counter", "Códigos descartados por cola llena.", [({}, pipeline.dropped)])
+
+        manipulator = getattr(client, 'manipulator', None)
+        if manipulator is not None:
+            profiles = manipulator.profiles
+            metric("hau5_paused", "gauge", "1 si la cuenta está en pausa o en prueba tras un error.",
+                   [({"profile": profile.name, "state": profile.recovery.state}, int(profile.recovery.is_paused)) for profile in profiles])
+            metric("hau5_hourly_budget_remaining", "gauge", "Solicitudes restantes esta hora (+Inf sin límite).",
+                   [({"profile": profile.name}, profile.budget()) for profile in profiles])
+            metric("hau5_held_codes", "gauge", "Códigos guardados para reintentar tras recargar credenciales.",
+                   [({}, len(manipulator.held_codes))])
+
+        decoder = getattr(client, 'image_decoder', None)
+        if decoder is not None:
+            metric("hau5_images_total", "counter", "Fotos procesadas por resultado.",
+                   [({"result": result}, count) for result, count in sorted(decoder.results.items())])
+            metric("hau5_images_pending", "gauge", "Fotos descargándose o decodificándose.", [({}, decoder.pending)])
+
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = _number(value) if isinstance(value, float) else str(value)
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MetricsServer:
+    """Servidor HTTP local con /metrics; se importa aiohttp.web solo si se activa."""
+
+    def __init__(self, client: 'BaseClient', host: str = "127.0.0.1", port: int = 9464):
+        self.client = client
+        self.host: str = host
+        self.port: int = port
+        self._runner: Optional['web.AppRunner'] = None
+
+    async def _handle(self, request: 'web.Request') -> 'web.Response':
+        from aiohttp import web
+        body = self.client.metrics.render(self.client)
+        return web.Response(body=body.encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def start(self) -> str:
+        """Arranca el servidor y devuelve su URL (con port=0 se elige un puerto libre)."""
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Dirección real del socket (API pública de AppRunner); con port=0, el puerto elegido
+        self.port = self._runner.addresses[0][1]
+        url = f"http://{self.host}:{self.port}/metrics"
+        custom_print(f"📈 Métricas disponibles en {url}", "info")
+        return url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+import time
+from typing import Awaitable, Callable, List, Optional, Set, TYPE_CHECKING
+
+from source.utils import custom_print
+
+if TYPE_CHECKING:
+    from lib.timing import LatencyTracker
+
+
+class ClaimPipeline:
+    """
+    Cola acotada de códigos pendientes de reclamar y un grupo de workers que la
+    vacían en paralelo. Los manejadores de Telegram solo encolan y vuelven de
+    inmediato; los códigos se atienden por orden de llegada.
+    """
+
+    def __init__(
+        self,
+        claim: Callable[[str], Awaitable[None]],
+        workers: int = 2,
+        max_size: int = 100,
+        worker_spacing: float = 0,
+        tracker: Optional['LatencyTracker'] = None,
+    ):
+        self.claim = claim
+        self.tracker: Optional['LatencyTracker'] = tracker
+        self.workers: int = max(1, workers)
+        self.worker_spacing: float = worker_spacing
+
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=max_size)
+        self._sequence = itertools.count()
+        self._queued: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+        self.busy_workers: int = 0
+        self.processed: int = 0
+        self.dropped: int = 0
+
+    @property
+    def depth(self) -> int:
+        """Número de códigos esperando en la cola."""
+        return self.queue.qsize()
+
+    def is_queued(self, code: str) -> bool:
+        """Indica si el código está esperando o siendo procesado."""
+        return code in self._queued
+
+    def submit(self, code: str, arrival: Optional[float] = None) -> bool:
+        """
+        Encola un código sin bloquear.
+
+        Args:
+            code (str): Código a reclamar.
+            arrival (float, optional): Momento de llegada (time.monotonic()); por defecto, ahora.
+
+        Returns:
+            bool: False si el código ya estaba en cola o la cola está llena.
+        """
+        if code in self._queued:
+            return False
+        if arrival is None:
+            arrival = time.monotonic()
+        try:
+            self.queue.put_nowait((arrival, next(self._sequence), code))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            custom_print(f"Cola de reclamos llena ({self.queue.maxsize}). Código {code} descartado.", "warning")
+            return False
+        self._queued.add(code)
+        return True
+
+    async def _worker(self, worker_id: int) -> None:
+        last_request = 0.0
+        while True:
+            arrival, _, code = await self.queue.get()
+            if self.tracker is not None:
+                self.tracker.mark(code, "queue", time.monotonic() - arrival)
+            try:
+                # Espaciado por worker: solo espera si su último reclamo fue hace muy poco
+                wait = last_request + self.worker_spacing - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                last_request = time.monotonic()
+
+                self.busy_workers += 1
+                try:
+                    await self.claim(code)
+                finally:
+                    self.busy_workers -= 1
+                self.processed += 1
+            except Exception as e:
+                custom_print(f"Error en el worker {worker_id} al procesar {code}: {str(e)}", "error")
+            finally:
+                self._queued.discard(code)
+                self.queue.task_done()
+
+    def start(self) -> None:
+        """Arranca los workers (idempotente)."""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        custom_print(f"Pipeline de reclamos iniciado con {self.workers} workers.", "info")
+
+    async def stop(self) -> None:
+        """Detiene los workers; los códigos aún en cola se descartan."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self) -> str:
+        """Resumen legible del estado de la cola."""
+        return (
+            f"📥 Códigos en cola: {self.depth}/{self.queue.maxsize}\n"
+            f"⚙️ Workers ocupados: {self.busy_workers}/{self.workers}\n"
+            f"✅ Procesados: {self.processed}\n"
+            f"🗑️ Descartados por cola llena: {self.dropped}"
+        )
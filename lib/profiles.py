@@ -0,0 +1,94 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TYPE_CHECKING
+
+from lib.api.binance import BinanceAPI
+from lib.limiter import RateLimiter
+from lib.recovery import RecoveryScheduler
+
+if TYPE_CHECKING:
+    from source.config import Config
+
+
+DEFAULT_PROFILE_NAME = "principal"
+
+
+class BinanceProfile:
+    """
+    Una cuenta de Binance: su propio cliente con conexiones persistentes, su
+    presupuesto de solicitudes y su estado de pausa. Un captcha o un límite en
+    una cuenta no detiene a las demás.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        config: 'Config',
+        headers: Optional[Dict[str, str]] = None,
+        max_hour_requests: Optional[float] = None,
+        notify: Optional[Callable[[str], Awaitable[None]]] = None,
+        label_notifications: bool = False,
+    ):
+        self.name: str = name
+        self.api: BinanceAPI = BinanceAPI(config, headers=headers)
+        self.limiter: RateLimiter = RateLimiter(
+            max_per_hour=config.MAX_HOUR_REQUESTS if max_hour_requests is None else max_hour_requests,
+            min_spacing=getattr(config, 'REQUEST_DELAY_SECONDS', 3)
+        )
+        self.recovery: RecoveryScheduler = RecoveryScheduler(
+            notify=notify,
+            max_backoff=getattr(config, 'RECOVERY_MAX_BACKOFF_SECONDS', 3600),
+            label=name if label_notifications else ""
+        )
+        self.claimed: int = 0
+        self.requests: int = 0
+
+    def budget(self) -> float:
+        """Solicitudes que quedan esta hora (infinito si no hay límite)."""
+        remaining = self.limiter.remaining()
+        return float('inf') if remaining is None else remaining
+
+    def status(self) -> str:
+        """Resumen legible del perfil."""
+        return (
+            f"👤 *{self.name}* — {self.requests} solicitudes, {self.claimed} cajas\n"
+            f"{self.limiter.status()}\n{self.recovery.status()}"
+        )
+
+
+def build_profiles(
+    config: 'Config',
+    notify: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> List[BinanceProfile]:
+    """
+    Crea los perfiles definidos en BINANCE_PROFILES; si no hay ninguno, uno solo
+    con Config.headers y MAX_HOUR_REQUESTS.
+    """
+    definitions: List[Dict[str, Any]] = list(getattr(config, 'BINANCE_PROFILES', None) or [])
+    if not definitions:
+        return [BinanceProfile(DEFAULT_PROFILE_NAME, config, notify=notify)]
+
+    profiles = []
+    for index, definition in enumerate(definitions):
+        name = definition.get("name") or f"perfil{index + 1}"
+        if any(profile.name == name for profile in profiles):
+            raise ValueError(f"Nombre de perfil de Binance duplicado en BINANCE_PROFILES: {name}")
+        profiles.append(BinanceProfile(
+            name,
+            config,
+            headers=definition.get("headers"),
+            max_hour_requests=definition.get("max_hour_requests"),
+            notify=notify,
+            label_notifications=len(definitions) > 1
+        ))
+    return profiles
+
+
+def profile_headers(config: 'Config') -> Dict[str, Dict[str, str]]:
+    """Encabezados de cada perfil según la configuración (mismas reglas que build_profiles)."""
+    definitions: List[Dict[str, Any]] = list(getattr(config, 'BINANCE_PROFILES', None) or [])
+    if not definitions:
+        return {DEFAULT_PROFILE_NAME: config.headers}
+    return {
+        definition.get("name") or f"perfil{index + 1}":
+            config.headers if definition.get("headers") is None else definition["headers"]
+        for index, definition in enumerate(definitions)
+    }
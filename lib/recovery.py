@@ -0,0 +1,153 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from source.utils import custom_print
+
+
+# Espera base (segundos) por tipo de error; se duplica con cada fallo consecutivo.
+# None = no se reanuda solo (requiere intervención manual).
+BASE_BACKOFF_SECONDS: Dict[str, Optional[float]] = {
+    "too_many_requests": 3600,
+    "captcha": 600,
+    "api_error": 30,
+    "exception": 30,
+    "session_expired": None,
+}
+
+RUNNING = "running"
+PAUSED = "paused"
+PROBING = "probing"
+
+
+class RecoveryScheduler:
+    """
+    Gestiona la pausa del reclamo tras un error y su reanudación automática.
+
+    Tras la espera pasa a modo de prueba (half-open): deja pasar una única
+    solicitud; si sale bien se reanuda del todo y si vuelve a fallar se pausa
+    otra vez con el doble de espera.
+    """
+
+    def __init__(
+        self,
+        notify: Optional[Callable[[str], Awaitable[None]]] = None,
+        max_backoff: float = 3600,
+        label: str = "",
+    ):
+        self.notify = notify
+        self.max_backoff: float = max_backoff
+        # Prefijo de los avisos cuando hay varios perfiles de Binance
+        self.label: str = label
+
+        self.state: str = RUNNING
+        self.reason: Optional[str] = None
+        self.resume_at: Optional[float] = None
+        self._failures: Dict[str, int] = {}
+        self._probe_in_flight: bool = False
+        self._resume_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_paused(self) -> bool:
+        return self.state != RUNNING
+
+    def try_acquire(self) -> bool:
+        """Indica si se puede enviar una solicitud; en modo de prueba solo la primera pasa."""
+        if self.state == RUNNING:
+            return True
+        if self.state == PROBING and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Devuelve el turno de prueba cuando la solicitud no llegó a enviarse."""
+        self._probe_in_flight = False
+
+    async def record_success(self) -> None:
+        """Binance respondió con normalidad: se reanuda si estábamos probando."""
+        if self.state == PROBING:
+            self._failures.clear()
+            await self._transition(RUNNING, "✅ Prueba superada. El reclamo de códigos se ha reanudado.")
+        self._probe_in_flight = False
+
+    async def record_failure(self, error_class: str, wait_seconds: Optional[float] = None, detail: str = "") -> None:
+        """
+        Pausa el reclamo por un error.
+
+        Args:
+            error_class (str): Tipo de error (clave de BASE_BACKOFF_SECONDS).
+            wait_seconds (float, optional): Espera indicada por Binance; tiene prioridad sobre el backoff.
+            detail (str, optional): Texto que precede al aviso de pausa en la notificación.
+        """
+        self._probe_in_flight = False
+        failures = self._failures.get(error_class, 0)
+        self._failures[error_class] = failures + 1
+
+        base = BASE_BACKOFF_SECONDS.get(error_class, BASE_BACKOFF_SECONDS["api_error"])
+        if wait_seconds:
+            delay = wait_seconds
+        elif base is None:
+            delay = None
+        else:
+            delay = min(base * (2 ** failures), self.max_backoff)
+
+        self.reason = error_class
+        self._cancel_resume()
+        prefix = f"{detail}\n" if detail else ""
+        if delay is None:
+            self.resume_at = None
+            await self._transition(PAUSED, f"{prefix}⏸️ Reclamo pausado por `{error_class}`. Requiere intervención manual (/reanudar).")
+            return
+
+        self.resume_at = time.monotonic() + delay
+        self._resume_task = asyncio.create_task(self._resume_after(delay))
+        await self._transition(PAUSED, f"{prefix}⏸️ Reclamo pausado por `{error_class}`. Se probará de nuevo en {self._format(delay)}.")
+
+    async def _resume_after(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._resume_task = None
+        self.resume_at = None
+        await self._transition(PROBING, "🔎 Fin de la espera. El próximo código se usará como prueba antes de reanudar.")
+
+    async def resume(self, message: str = "▶️ Reclamo reanudado manualmente.") -> None:
+        """Reanuda inmediatamente (comando de administrador o credenciales nuevas)."""
+        self._cancel_resume()
+        self._failures.clear()
+        self._probe_in_flight = False
+        self.resume_at = None
+        if self.state != RUNNING:
+            await self._transition(RUNNING, message)
+
+    def _cancel_resume(self) -> None:
+        if self._resume_task and not self._resume_task.done():
+            self._resume_task.cancel()
+        self._resume_task = None
+
+    async def _transition(self, state: str, message: str) -> None:
+        self.state = state
+        if state == RUNNING:
+            self.reason = None
+        if self.label:
+            message = f"[{self.label}] {message}"
+        custom_print(message, "warning" if state == PAUSED else "info")
+        if self.notify:
+            try:
+                await self.notify(message)
+            except Exception as e:
+                custom_print(f"No se pudo notificar el cambio de estado: {str(e)}", "error")
+
+    @staticmethod
+    def _format(seconds: float) -> str:
+        minutes, seconds = divmod(int(seconds), 60)
+        return f"{minutes}m {seconds}s" if minutes else f"{seconds}s"
+
+    def status(self) -> str:
+        """Resumen legible del estado de pausa."""
+        if self.state == RUNNING:
+            return "▶️ Reclamo activo"
+        if self.state == PROBING:
+            return f"🔎 En prueba tras `{self.reason}`"
+        if self.resume_at is None:
+            return f"⏸️ Pausado por `{self.reason}` (requiere /reanudar)"
+        return f"⏸️ Pausado por `{self.reason}`, prueba en {self._format(self.resume_at - time.monotonic())}"
@@ -0,0 +1,105 @@
+import asyncio
+import importlib.util
+import os
+import sys
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from source.utils import custom_print
+
+
+# Encabezados sin los que Binance no acepta la sesión
+REQUIRED_HEADERS = ("cookie", "csrftoken")
+
+
+def config_file_of(config: Any) -> Optional[str]:
+    """Archivo en el que está definida la clase de configuración (p. ej. source/config.py)."""
+    module = sys.modules.get(type(config).__module__)
+    return getattr(module, '__file__', None)
+
+
+def load_config(path: str, class_name: str = "Config") -> Any:
+    """
+    Ejecuta de nuevo el archivo de configuración y devuelve una instancia nueva,
+    sin tocar el módulo ya importado. Propaga SyntaxError y demás errores.
+    """
+    spec = importlib.util.spec_from_file_location("_config_reload", path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"No se puede cargar {path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    config_class = getattr(module, class_name, None)
+    if config_class is None:
+        raise ImportError(f"{path} no define la clase {class_name}")
+    return config_class()
+
+
+def validate_headers(headers: Any) -> Optional[str]:
+    """Devuelve el motivo por el que los encabezados no sirven, o None si son válidos."""
+    if not isinstance(headers, dict) or not headers:
+        return "los encabezados deben ser un diccionario no vacío"
+    if not all(isinstance(key, str) and isinstance(value, str) for key, value in headers.items()):
+        return "las claves y los valores de los encabezados deben ser texto"
+    present = {key.lower() for key, value in headers.items() if value.strip()}
+    missing = [name for name in REQUIRED_HEADERS if name not in present]
+    if missing:
+        return f"faltan encabezados: {', '.join(missing)}"
+    return None
+
+
+class ConfigWatcher:
+    """
+    Vigila el archivo de configuración consultando su fecha de modificación
+    cada `interval` segundos (sin dependencias externas). Tras un cambio espera
+    a que el archivo deje de cambiar y llama a `on_change`.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[], Awaitable[Any]], interval: float = 2):
+        self.path: str = path
+        self.on_change = on_change
+        self.interval: float = interval
+        self._signature: Optional[Tuple[int, int]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self) -> None:
+        """Inicia la vigilancia en segundo plano (no hace nada si interval <= 0)."""
+        if self.interval <= 0 or (self._task and not self._task.done()):
+            return
+        self._signature = self._stat()
+        self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                continue
+            # Los editores a veces escriben en varios pasos: esperar a que se estabilice
+            await asyncio.sleep(min(self.interval, 0.5))
+            if self._stat() != signature:
+                continue
+            self._signature = signature
+            try:
+                await self.on_change()
+            except Exception as e:
+                custom_print(f"Error al recargar {self.path}: {str(e)}", "error")
+
+    def mark_current(self) -> None:
+        """Da por vista la versión actual del archivo (tras una recarga manual)."""
+        self._signature = self._stat()
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
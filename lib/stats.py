@@ -0,0 +1,119 @@
+from collections import deque
+from datetime import date, timedelta
+from typing import Deque, Dict, Optional, Tuple
+
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# (código, importe, moneda, fecha, perfil)
+RecentClaim = Tuple[str, float, str, Optional[str], Optional[str]]
+
+
+class ClaimStats:
+    """
+    Agregados de los canjes exitosos que se actualizan en O(1) con cada canje:
+    número de códigos, totales por moneda, cubos por día (para las ventanas de
+    hoy y de la semana) y los últimos N canjes. Se reconstruyen una vez al cargar.
+    """
+
+    def __init__(self, recent_size: int = 5, keep_days: int = 366):
+        self.keep_days: int = keep_days
+        self.recent_size: int = recent_size
+        self._reset()
+
+    def _reset(self) -> None:
+        self.codes: int = 0
+        self.claims: int = 0
+        self.totals: Dict[str, float] = {}
+        self.days: Dict[date, Dict[str, float]] = {}
+        self.day_codes: Dict[date, int] = {}
+        self.recent: Deque[RecentClaim] = deque(maxlen=self.recent_size)
+
+    @staticmethod
+    def _parse_amount(amount) -> float:
+        try:
+            return float(amount)
+        except (TypeError, ValueError):
+            return 0.0
+
+    @staticmethod
+    def _parse_date(value: Optional[str]) -> Optional[date]:
+        if not value:
+            return None
+        try:
+            # DATE_FORMAT empieza por la fecha ISO; no hace falta interpretar la hora
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+
+    def add(
+        self,
+        code: str,
+        amount,
+        currency: Optional[str],
+        claimed_at: Optional[str] = None,
+        profile: Optional[str] = None,
+        new_code: bool = True,
+    ) -> None:
+        """Suma un canje; new_code=False cuando otra cuenta ya canjeó el mismo código."""
+        value = self._parse_amount(amount)
+        currency = currency or "N/A"
+        day = self._parse_date(claimed_at)
+
+        self.claims += 1
+        if new_code:
+            self.codes += 1
+        self.totals[currency] = self.totals.get(currency, 0.0) + value
+        if day is not None:
+            bucket = self.days.get(day)
+            if bucket is None:
+                bucket = self.days[day] = {}
+                self._prune(day)
+            bucket[currency] = bucket.get(currency, 0.0) + value
+            if new_code:
+                self.day_codes[day] = self.day_codes.get(day, 0) + 1
+        self.recent.append((code, value, currency, claimed_at, profile))
+
+    def _prune(self, newest: date) -> None:
+        """Descarta los cubos diarios más antiguos que keep_days (solo al abrir un día nuevo)."""
+        cutoff = newest - timedelta(days=self.keep_days)
+        for day in [day for day in self.days if day < cutoff]:
+            del self.days[day]
+            self.day_codes.pop(day, None)
+
+    def rebuild(self, successful_claims: Dict[str, dict]) -> None:
+        """Recalcula todos los agregados a partir de successful_claims (una vez, al cargar)."""
+        self._reset()
+        for code, data in successful_claims.items():
+            profiles = data.get("profiles")
+            if profiles:
+                for index, (name, profile_data) in enumerate(profiles.items()):
+                    self.add(
+                        code,
+                        profile_data.get("amount"),
+                        profile_data.get("currency", data.get("currency")),
+                        data.get("date"),
+                        profile=name,
+                        new_code=index == 0
+                    )
+            else:
+                # Entradas anteriores a los perfiles: sin moneda, el importe era en USD
+                self.add(code, data.get("amount"), data.get("currency", "USD"), data.get("date"))
+
+    def window(self, days: int, today: Optional[date] = None) -> Tuple[int, Dict[str, float]]:
+        """Códigos y totales por moneda de los últimos `days` días (incluido hoy)."""
+        today = today or date.today()
+        codes = 0
+        totals: Dict[str, float] = {}
+        for offset in range(days):
+            day = today - timedelta(days=offset)
+            codes += self.day_codes.get(day, 0)
+            for currency, value in self.days.get(day, {}).items():
+                totals[currency] = totals.get(currency, 0.0) + value
+        return codes, totals
+
+    @staticmethod
+    def format_totals(totals: Dict[str, float]) -> str:
+        if not totals:
+            return "0"
+        return ", ".join(f"{value:g} {currency}" for currency, value in sorted(totals.items()))
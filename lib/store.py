@@ -0,0 +1,249 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from source.utils import custom_print
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    profile TEXT,
+    chat_id INTEGER,
+    chat_title TEXT,
+    message_ts REAL,
+    attempted_ts REAL NOT NULL,
+    status TEXT NOT NULL,
+    amount REAL,
+    currency TEXT,
+    request_ms REAL,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_attempts_code ON attempts (code);
+CREATE INDEX IF NOT EXISTS idx_attempts_chat ON attempts (chat_id, attempted_ts);
+CREATE INDEX IF NOT EXISTS idx_attempts_ts ON attempts (attempted_ts);
+CREATE INDEX IF NOT EXISTS idx_attempts_status ON attempts (status);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+COLUMNS = (
+    "code", "profile", "chat_id", "chat_title", "message_ts", "attempted_ts",
+    "status", "amount", "currency", "request_ms", "latency_ms",
+)
+
+INSERT = f"INSERT INTO attempts ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+# Estado con el que se importan los códigos de claimed_codes.json (sin resultado conocido)
+MIGRATED_STATUS = "migrated"
+
+
+class ClaimStore:
+    """
+    Historial de intentos de reclamo en SQLite (modo WAL): un registro por
+    solicitud con código, cuenta, chat de origen, hora del mensaje, resultado y
+    latencia, con índices por código, chat y hora.
+
+    Igual que ClaimJournal, los registros se acumulan en memoria y se escriben
+    por lotes en un hilo aparte, así que registrar un intento no bloquea el
+    bucle de eventos.
+
+    Si la base de datos no se pudo abrir, registrar no hace nada y las
+    consultas devuelven resultados vacíos.
+    """
+
+    # Registros que se guardan a la espera mientras la escritura falla
+    MAX_PENDING = 10_000
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[Any, ...]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._dropped: int = 0
+        # La conexión se comparte entre el hilo de escritura y las consultas
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        """Abre la base de datos y crea el esquema si no existe."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @property
+    def is_open(self) -> bool:
+        """True si la base de datos está abierta."""
+        return self._conn is not None
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def migrate_json(self, claimed_codes: Set[str], successful_claims_file: str) -> bool:
+        """
+        Importa una sola vez el historial de los archivos JSON: los códigos
+        reclamados y los canjes de successful_claims.json. Los archivos no se borran.
+
+        Returns:
+            bool: True si se importó algo en esta llamada.
+        """
+        if self._get_meta("json_migrated"):
+            return False
+
+        successful: Dict[str, dict] = {}
+        if os.path.exists(successful_claims_file):
+            with open(successful_claims_file, 'r') as f:
+                successful = json.load(f)
+
+        now = time.time()
+        rows = []
+        for code, data in successful.items():
+            claimed_ts = self._parse_date(data.get("date")) or now
+            profiles = data.get("profiles") or {None: data}
+            for profile, profile_data in profiles.items():
+                rows.append(self._row(
+                    code, "claimed", profile=profile, attempted_ts=claimed_ts,
+                    amount=profile_data.get("amount"),
+                    # Entradas anteriores a los perfiles: sin moneda, el importe era en USD
+                    currency=profile_data.get("currency", data.get("currency", "USD"))
+                ))
+        for code in claimed_codes - successful.keys():
+            rows.append(self._row(code, MIGRATED_STATUS, attempted_ts=now))
+
+        with self._conn:
+            self._conn.executemany(INSERT, rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (str(now),))
+        custom_print(f"Historial migrado a {self.path}: {len(rows)} registros desde los archivos JSON.", "info")
+        return True
+
+    @staticmethod
+    def _parse_date(value: Optional[str]) -> Optional[float]:
+        if not value:
+            return None
+        try:
+            return time.mktime(time.strptime(value, "%Y-%m-%d %H:%M:%S"))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _row(code: str, status: str, **fields: Any) -> Tuple[Any, ...]:
+        fields["code"] = code
+        fields["status"] = status
+        fields.setdefault("attempted_ts", time.time())
+        amount = fields.get("amount")
+        if amount is not None:
+            try:
+                fields["amount"] = float(amount)
+            except (TypeError, ValueError):
+                fields["amount"] = None
+        return tuple(fields.get(column) for column in COLUMNS)
+
+    def load_successful_claims(self) -> Dict[str, dict]:
+        """Reconstruye successful_claims (mismo formato que el antiguo JSON) desde la base de datos."""
+        claims: Dict[str, dict] = {}
+        if self._conn is None:
+            return claims
+        rows = self._conn.execute(
+            "SELECT code, profile, amount, currency, attempted_ts FROM attempts WHERE status = 'claimed' ORDER BY id"
+        )
+        for code, profile, amount, currency, attempted_ts in rows:
+            entry = claims.setdefault(code, {"amount": "0"})
+            entry["currency"] = currency or "N/A"
+            entry["date"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(attempted_ts))
+            amount_str = f"{amount or 0:g}"
+            if profile is None:
+                entry["amount"] = amount_str
+                continue
+            entry.setdefault("profiles", {})[profile] = {"amount": amount_str, "currency": entry["currency"]}
+            entry["amount"] = f"{sum(float(data['amount']) for data in entry['profiles'].values()):g}"
+        return claims
+
+    def record(self, code: str, status: str, **fields: Any) -> None:
+        """Registra un intento sin bloquear; la escritura se hace por lotes en segundo plano."""
+        if self._conn is None:
+            return
+        self._pending.append(self._row(code, status, **fields))
+        self._trim_pending()
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sin bucle de eventos (p. ej. desde un script): escribir directamente
+            rows, self._pending = self._pending, []
+            self._write(rows)
+            return
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._pending:
+            # La cola se intercambia en el hilo del bucle; el hilo de escritura solo ve su copia
+            rows, self._pending = self._pending, []
+            if not await asyncio.to_thread(self._write, rows):
+                self._pending[:0] = rows
+                self._trim_pending()
+                return
+
+    def _trim_pending(self) -> None:
+        """Descarta los registros más antiguos que superen MAX_PENDING (avisa una sola vez)."""
+        excess = len(self._pending) - self.MAX_PENDING
+        if excess <= 0:
+            return
+        del self._pending[:excess]
+        if not self._dropped:
+            custom_print(f"El historial de {self.path} no se puede escribir: se descartan los intentos más antiguos que superen {self.MAX_PENDING} pendientes.", "warning")
+        self._dropped += excess
+
+    def _write(self, rows: List[Tuple[Any, ...]]) -> bool:
+        if self._conn is None:
+            return False
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(INSERT, rows)
+            return True
+        except sqlite3.Error as e:
+            custom_print(f"Error al guardar el historial en {self.path}: {str(e)}", "error")
+            return False
+
+    def attempts_for_code(self, code: str) -> List[Dict[str, Any]]:
+        """Intentos registrados para un código, del más antiguo al más reciente."""
+        if self._conn is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM attempts WHERE code = ? ORDER BY id", (code,)
+            ).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def status_counts(self, since: float = 0) -> Dict[str, int]:
+        """Número de intentos por resultado desde `since` (timestamp)."""
+        if self._conn is None:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM attempts WHERE attempted_ts >= ? GROUP BY status", (since,)
+            ).fetchall()
+        return dict(rows)
+
+    async def close(self) -> None:
+        """Escribe los registros pendientes y cierra la base de datos."""
+        if self._flush_task and not self._flush_task.done():
+            await self._flush_task
+        if self._pending:
+            rows, self._pending = self._pending, []
+            await asyncio.to_thread(self._write, rows)
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
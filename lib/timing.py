@@ -0,0 +1,135 @@
+import json
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+
+# Etapas que recorre un código desde que Telegram entrega el mensaje
+STAGES = (
+    "feed_lag",  # fecha del mensaje en Telegram -> recepción local
+    "extract",   # extracción de códigos del texto
+    "queue",     # espera en la cola de reclamos
+    "checks",    # comprobaciones de main() (dedupe, formato, pausa)
+    "pacing",    # espera del limitador de solicitudes
+    "request",   # ida y vuelta de send_request
+    "total",     # recepción local -> respuesta de Binance
+)
+
+
+class LatencyTracker:
+    """
+    Registra la duración de cada etapa por código y agrega las muestras para
+    calcular percentiles. Las muestras se guardan en reservorios acotados, así
+    que la memoria no crece con el tiempo de ejecución.
+    """
+
+    def __init__(self, max_samples: int = 2000, max_traces: int = 500):
+        self.samples: Dict[str, Deque[float]] = {stage: deque(maxlen=max_samples) for stage in STAGES}
+        self.recent: Deque[dict] = deque(maxlen=max_traces)
+        self._active: Dict[str, dict] = {}
+
+    def begin(
+        self,
+        code: str,
+        received_at: Optional[float] = None,
+        message_date: Optional[datetime] = None,
+        extract_seconds: Optional[float] = None,
+        source: Optional[str] = None,
+        chat_id: Optional[int] = None,
+    ) -> None:
+        """
+        Abre la traza de un código (si no estaba abierta ya).
+
+        Args:
+            code (str): Código detectado.
+            received_at (float, optional): time.perf_counter() al recibir el mensaje.
+            message_date (datetime, optional): Fecha del mensaje según Telegram (UTC).
+            extract_seconds (float, optional): Tiempo que tardó la extracción.
+            source (str, optional): Chat de origen, para el volcado.
+            chat_id (int, optional): Id del chat de origen.
+        """
+        if code in self._active:
+            return
+        trace = {
+            "code": code,
+            "source": source,
+            "chat_id": chat_id,
+            "message_ts": None,
+            "received": time.time(),
+            "_t0": received_at if received_at is not None else time.perf_counter(),
+            "stages": {},
+        }
+        if message_date is not None:
+            if message_date.tzinfo is None:
+                message_date = message_date.replace(tzinfo=timezone.utc)
+            trace["message_ts"] = message_date.timestamp()
+            trace["stages"]["feed_lag"] = max(0.0, trace["received"] - message_date.timestamp())
+        if extract_seconds is not None:
+            trace["stages"]["extract"] = extract_seconds
+        self._active[code] = trace
+
+    def trace(self, code: str) -> Optional[dict]:
+        """Traza abierta de un código (origen y etapas medidas hasta ahora), si existe."""
+        return self._active.get(code)
+
+    def elapsed(self, code: str) -> Optional[float]:
+        """Segundos desde la recepción del mensaje para un código con traza abierta."""
+        trace = self._active.get(code)
+        return None if trace is None else time.perf_counter() - trace["_t0"]
+
+    def mark(self, code: str, stage: str, seconds: float) -> None:
+        """Anota la duración de una etapa para un código con traza abierta."""
+        trace = self._active.get(code)
+        if trace is not None:
+            trace["stages"][stage] = seconds
+
+    def finish(self, code: str, outcome: str) -> None:
+        """Cierra la traza, calcula el total y añade sus etapas a las estadísticas."""
+        trace = self._active.pop(code, None)
+        if trace is None:
+            return
+        stages = trace["stages"]
+        stages["total"] = time.perf_counter() - trace.pop("_t0")
+        trace["outcome"] = outcome
+        for stage, seconds in stages.items():
+            self.samples[stage].append(seconds)
+        self.recent.append(trace)
+
+    @staticmethod
+    def _percentile(sorted_values: List[float], fraction: float) -> float:
+        index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+        return sorted_values[index]
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """p50/p90/p99/máx por etapa, en milisegundos."""
+        result = {}
+        for stage in STAGES:
+            values = sorted(self.samples[stage])
+            if not values:
+                continue
+            result[stage] = {
+                "count": len(values),
+                "p50": self._percentile(values, 0.50) * 1000,
+                "p90": self._percentile(values, 0.90) * 1000,
+                "p99": self._percentile(values, 0.99) * 1000,
+                "max": values[-1] * 1000,
+            }
+        return result
+
+    def summary(self) -> str:
+        """Tabla legible de percentiles por etapa."""
+        stats = self.percentiles()
+        if not stats:
+            return "Aún no hay mediciones de latencia."
+        lines = ["⏱️ *Latencia por etapa (ms)*", "`etapa       n     p50     p90     p99`"]
+        for stage, values in stats.items():
+            lines.append(
+                f"`{stage:<9} {values['count']:>4} {values['p50']:>7.1f} {values['p90']:>7.1f} {values['p99']:>7.1f}`"
+            )
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> None:
+        """Escribe percentiles y trazas recientes en un archivo JSON."""
+        with open(path, 'w') as f:
+            json.dump({"percentiles_ms": self.percentiles(), "recent": list(self.recent)}, f, indent=2, default=str)
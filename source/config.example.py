@@ -6,12 +6,22 @@ class Config:
     # ==================================================
     # CONFIGURACIÓN DE CHATS
     # ==================================================
-    # Lista de chats a monitorear (se llenará dinámicamente)
+    # Chats a monitorear: ids, @usuarios o títulos. Vacío = todos los chats.
+    # Se resuelven a ids al iniciar; /vigilar, /ignorar y /quitar los ajustan en caliente.
+    # Con CHATS no vacío, los demás chats se ignoran también antes de resolver los nombres.
     CHATS = []
+
+    # Al unirse a un chat o cambiar un título se vuelven a resolver los nombres de CHATS,
+    # como mucho una vez cada CHAT_FILTER_REFRESH_SECONDS segundos
+    CHAT_FILTER_REFRESH_SECONDS: int = 60
     
     # Patrón para excluir chats que contengan estas palabras (case insensitive)
     EXCLUDE_CHATS_WITH = ['intel']
 
+    # Patrones (nombre, regex) para detectar códigos. Vacío = usar los de lib/extractor.py
+    # El código debe ir en el último grupo de captura del patrón.
+    CODE_PATTERNS = []
+
     # ==================================================
     # CONFIGURACIÓN DE LA API DE TELEGRAM
     # Obtén estos valores en https://my.telegram.org/apps
@@ -32,8 +42,148 @@ class Config:
     # Número máximo de solicitudes por hora (0 = ilimitado)
     MAX_HOUR_REQUESTS: Union[int, float] = 100
     
-    # Delay in seconds between claiming attempts
+    # Minimum seconds between two requests to Binance. The first request after a
+    # quiet period is sent immediately; only back-to-back requests are delayed.
     REQUEST_DELAY_SECONDS: Union[int, float] = 3
+
+    # Workers que reclaman códigos en paralelo y tamaño máximo de la cola de pendientes
+    CLAIM_WORKERS: int = 2
+    CLAIM_QUEUE_SIZE: int = 100
+
+    # Espaciado adicional entre reclamos de un mismo worker (0 = solo el global)
+    CLAIM_WORKER_SPACING_SECONDS: Union[int, float] = 0
+
+    # Espera máxima (segundos) antes de volver a probar tras errores repetidos
+    RECOVERY_MAX_BACKOFF_SECONDS: Union[int, float] = 3600
+
+    # Cada cuántos segundos se comprueba si este archivo cambió para aplicar los
+    # `headers` nuevos (cookies/csrftoken) sin reiniciar (0 = solo con /recargar).
+    # Solo se recargan las credenciales; el resto de opciones requiere reiniciar.
+    CONFIG_WATCH_SECONDS: Union[int, float] = 2
+
+    # Códigos recibidos con todas las cuentas en pausa que se reintentan al
+    # recargar las credenciales: cuántos se guardan y hasta qué antigüedad (segundos)
+    HELD_CODES_MAX: int = 50
+    HELD_CODES_RETRY_SECONDS: Union[int, float] = 300
+
+    # Códigos que llegan con el presupuesto por hora agotado en todas las cuentas: no se
+    # marcan como reclamados y se vuelven a encolar cuando se libera una solicitud.
+    # Cuántos se guardan a la espera como máximo
+    RATE_LIMITED_CODES_MAX: int = 50
+
+    # Varias cuentas de Binance, cada una con su presupuesto y su pausa. Vacío = una
+    # sola cuenta con los `headers` de abajo y MAX_HOUR_REQUESTS. Ejemplo:
+    # BINANCE_PROFILES = [
+    #     {"name": "principal", "headers": {...}, "max_hour_requests": 100},
+    #     {"name": "secundaria", "headers": {...}},
+    # ]
+    BINANCE_PROFILES = []
+
+    # "all" = cada código se reclama con todas las cuentas no pausadas a la vez;
+    # "budget" = solo con la cuenta que tenga más solicitudes disponibles esta hora
+    CLAIM_DISPATCH_MODE: str = "all"
+
+    # Caché de códigos vistos en la sesión: segundos que se recuerda cada código
+    # (0 = siempre) y número máximo de códigos en memoria
+    DEDUPE_TTL_SECONDS: Union[int, float] = 86400
+    DEDUPE_MAX_SIZE: int = 100_000
+
+    # Caché de chats y remitentes (evita consultas a Telegram por cada mensaje)
+    ENTITY_CACHE_FILE: str = "data/entities.json"  # "" para no guardarla en disco
+    ENTITY_CACHE_MAX_SIZE: int = 5000
+
+    # Canjes recientes que muestra /resumen
+    CLAIM_SUMMARY_RECENT: int = 5
+
+    # Archivo donde /latencia dump guarda los percentiles y las trazas recientes
+    LATENCY_DUMP_FILE: str = "data/latency.json"
+
+    # Endpoint local de métricas en formato Prometheus (http://METRICS_HOST:METRICS_PORT/metrics).
+    # 0 = desactivado. Escucha solo en local salvo que se cambie METRICS_HOST.
+    METRICS_PORT: int = 0
+    METRICS_HOST: str = "127.0.0.1"
+
+    # Varias instancias del bot (otras cuentas de Telegram) vigilando canales en común: con
+    # coordinación, cada código lo intenta una sola instancia. "" = sin coordinar;
+    # "sqlite" = base compartida COORDINATION_DB_FILE (la misma ruta en todas; misma máquina);
+    # "socket" = servicio local en COORDINATION_ADDRESS (python -m lib.coordination --port 8765).
+    # Si la coordinación falla o no responde en COORDINATION_TIMEOUT_SECONDS, el código se reclama igual.
+    COORDINATION_BACKEND: str = ""
+    COORDINATION_DB_FILE: str = "data/coordination.db"
+    COORDINATION_ADDRESS: str = "127.0.0.1:8765"
+    COORDINATION_TIMEOUT_SECONDS: float = 0.5
+    COORDINATION_INSTANCE: str = ""  # nombre de esta instancia en los registros; vacío = CLIENT_NAME-pid
+    COORDINATION_TTL_SECONDS: Union[int, float] = 86400  # tiempo que se guarda cada reserva
+
+    # Al arrancar, leer los mensajes de los últimos BACKFILL_MINUTES minutos (0 = no) de los
+    # chats procesados y reclamar los códigos que se publicaron con el bot detenido.
+    # Chats leídos a la vez, mensajes por chat, diálogos recientes revisados y espera máxima
+    # por FloodWait (si Telegram pide más, se abandona la recuperación).
+    BACKFILL_MINUTES: Union[int, float] = 10
+    BACKFILL_CONCURRENCY: int = 4
+    BACKFILL_MAX_MESSAGES: int = 200
+    BACKFILL_MAX_DIALOGS: int = 100
+    BACKFILL_MAX_FLOOD_WAIT_SECONDS: Union[int, float] = 120
+
+    # Códigos en fotos: descarga las imágenes de los chats procesados y lee sus QR en otros
+    # procesos (requiere opencv-python-headless; IMAGE_DECODE_OCR usa además pytesseract).
+    IMAGE_DECODE: bool = False
+    IMAGE_DECODE_CHATS = []  # ids; vacío = todos los chats procesados (/imagenes cambia uno)
+    IMAGE_DECODE_WORKERS: int = 1
+    IMAGE_DECODE_MAX_BYTES: int = 2 * 1024 * 1024  # se elige el tamaño de foto más grande que quepa
+    IMAGE_DECODE_TIMEOUT_SECONDS: float = 10  # descarga + decodificación
+    IMAGE_DECODE_MAX_PENDING: int = 8  # fotos a la vez; el resto se descarta
+    IMAGE_DECODE_OCR: bool = False
+
+    # ==================================================
+    # CONFIGURACIÓN DE REGISTROS (LOGS)
+    # ==================================================
+    # Nivel mínimo: "debug", "info", "success", "warning" o "error"
+    LOG_LEVEL: str = "info"
+
+    # Longitud máxima de cada registro (los textos de mensajes se recortan); 0 = sin límite
+    LOG_MAX_MESSAGE_LENGTH: int = 300
+
+    # Archivo de registros con rotación ("" = solo consola)
+    LOG_FILE: str = ""
+    LOG_FILE_MAX_BYTES: int = 5 * 1024 * 1024
+    LOG_FILE_BACKUPS: int = 3
+
+    # Registros que /logs guarda en memoria (búfer circular de tamaño fijo), nivel mínimo que
+    # se guarda (puede ser más bajo que LOG_LEVEL, p. ej. "debug") y longitud máxima de cada uno
+    LOG_BUFFER_SIZE: int = 2000
+    LOG_BUFFER_LEVEL: str = "info"
+    LOG_BUFFER_MAX_LENGTH: int = 1000
+
+    # Cada cuántos registros del diario de códigos se compacta en data/claimed_codes.json
+    CLAIMED_CODES_COMPACT_EVERY: int = 1000
+
+    # Historial SQLite de todos los intentos de reclamo (código, chat, resultado, latencia).
+    # Al crearse importa data/claimed_codes.json y data/successful_claims.json.
+    CLAIMS_DB_FILE: str = "data/claims.db"
+
+    # ==================================================
+    # CONFIGURACIÓN DE CONEXIÓN CON BINANCE
+    # ==================================================
+    # URL base de la API (cámbiala solo para pruebas contra un servidor local)
+    BINANCE_BASE_URL: str = "https://www.binance.com"
+    BINANCE_VERIFY_SSL: bool = True
+
+    # Segundos máximos de espera por una respuesta de Binance
+    BINANCE_TIMEOUT_SECONDS: Union[int, float] = 30
+
+    # Número máximo de conexiones abiertas simultáneamente con Binance
+    BINANCE_POOL_SIZE: int = 10
+
+    # Segundos que se guarda en caché la resolución DNS
+    BINANCE_DNS_CACHE_SECONDS: int = 300
+
+    # Segundos que una conexión inactiva se mantiene abierta (keep-alive)
+    BINANCE_KEEPALIVE_SECONDS: int = 75
+
+    # Cada cuántos segundos se "calienta" la conexión para que el primer reclamo
+    # tras un periodo de inactividad no pague DNS + TLS (0 = desactivado)
+    BINANCE_KEEP_WARM_SECONDS: int = 30
     
     # ==================================================
     # CONFIGURACIÓN DE ADMINISTRADOR DEL BOT
@@ -58,7 +208,10 @@ class Config:
         "Sec-Ch-Ua-Platform": "Windows",
         "Sec-Fetch-Dest": "empty",
         "Sec-Fetch-Mode": "cors",
-        "Sec-Fetch-Site": "same-origin"
+        "Sec-Fetch-Site": "same-origin",
+        # Copia estos dos valores de tu sesión de Binance en el navegador (obligatorios)
+        "cookie": "",
+        "csrftoken": ""
     }
 
     def __getelement__(self, element: str) -> Union[int, float, bool, str]:
@@ -0,0 +1,234 @@
+import atexit
+import itertools
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Iterator, List, Optional, Tuple
+
+LEVELS = {
+    "debug": 10,
+    "info": 20,
+    "success": 25,
+    "warning": 30,
+    "error": 40,
+}
+
+COLORS = {
+    "info": "\033[1;32;48mINFO\033[1;37;0m",
+    "error": "\033[1;31;48mERROR\033[1;37;0m",
+    "warning": "\033[1;33;48mWARNING\033[1;37;0m",
+    "success": "\033[1;92;48mSUCCESS\033[1;37;0m",
+    "debug": "\033[1;36;48mDEBUG\033[1;37;0m",
+}
+
+# (hora, nivel, componente, texto, estilo)
+Record = Tuple[float, str, str, str, str]
+
+
+class LogBuffer:
+    """
+    Últimos `size` registros en un búfer circular de tamaño fijo, para consultarlos
+    con /logs. Guardar un registro es O(1) y no copia nada (se guarda la misma tupla
+    que se encola), salvo recortar los textos más largos que `max_length`; la memoria
+    queda acotada aunque el bot funcione durante meses.
+    """
+
+    def __init__(self, size: int = 2000, max_length: int = 1000):
+        self.max_length: int = max_length
+        self.resize(size)
+
+    def resize(self, size: int) -> None:
+        """Cambia la capacidad (descarta lo guardado)."""
+        self.size: int = max(1, size)
+        self._records: List[Optional[Record]] = [None] * self.size
+        # next() sobre un contador es atómico: se puede escribir desde varios hilos sin cerrojo
+        self._counter = itertools.count()
+        self.written: int = 0
+
+    def append(self, record: Record) -> None:
+        text = record[3]
+        if type(text) is not str or (self.max_length and len(text) > self.max_length):
+            text = str(text)
+            if self.max_length and len(text) > self.max_length:
+                text = f"{text[:self.max_length]}… (+{len(text) - self.max_length})"
+            record = (record[0], record[1], record[2], text, record[4])
+        index = next(self._counter)
+        self._records[index % self.size] = record
+        self.written = index + 1
+
+    def __len__(self) -> int:
+        return min(self.written, self.size)
+
+    def newest(self) -> Iterator[Record]:
+        """Registros del más reciente al más antiguo."""
+        written = self.written
+        for index in range(written - 1, max(written - self.size, 0) - 1, -1):
+            record = self._records[index % self.size]
+            if record is not None:
+                yield record
+
+    def query(
+        self,
+        min_level: Optional[str] = None,
+        contains: Optional[str] = None,
+        component: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Record]:
+        """
+        Busca del más reciente al más antiguo.
+
+        Args:
+            min_level (str, optional): Nivel mínimo (p. ej. "warning").
+            contains (str, optional): Texto que debe aparecer (sin distinguir mayúsculas), p. ej. un código.
+            component (str, optional): Solo registros de ese componente ("bot", "telegram"...).
+            limit (int): Número máximo de registros.
+            offset (int): Registros coincidentes que se saltan (para paginar).
+        """
+        threshold = LEVELS.get(min_level, 0) if min_level else 0
+        needle = contains.lower() if contains else None
+        found: List[Record] = []
+        for record in self.newest():
+            if threshold and LEVELS.get(record[1], 20) < threshold:
+                continue
+            if component and record[2] != component:
+                continue
+            if needle and needle not in record[3].lower():
+                continue
+            if offset:
+                offset -= 1
+                continue
+            found.append(record)
+            if len(found) >= limit:
+                break
+        return found
+
+
+class QueuedLogger:
+    """
+    Registro por niveles que no bloquea a quien escribe: la llamada solo filtra
+    por nivel y encola; un hilo en segundo plano formatea y escribe en consola
+    y, opcionalmente, en un archivo rotativo.
+    """
+
+    def __init__(self, min_level: str = "debug", max_length: int = 0):
+        self.min_level: int = LEVELS.get(min_level, 10)
+        self.max_length: int = max_length
+        self.enabled: bool = True
+        self.stream = None  # None = sys.stdout en el momento de escribir
+
+        # Copia en memoria de los últimos registros para /logs (puede guardar más niveles que la consola)
+        self.buffer: LogBuffer = LogBuffer()
+        self.buffer_level: int = LEVELS["info"]
+        self._capture_level: int = min(self.min_level, self.buffer_level)
+
+        self._file: Optional[RotatingFileHandler] = None
+        self._queue: "queue.SimpleQueue[Optional[Record]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        min_level: Optional[str] = None,
+        max_length: Optional[int] = None,
+        file: Optional[str] = None,
+        max_bytes: int = 5 * 1024 * 1024,
+        backups: int = 3,
+        buffer_size: Optional[int] = None,
+        buffer_level: Optional[str] = None,
+        buffer_max_length: Optional[int] = None,
+    ) -> None:
+        """Ajusta nivel mínimo, truncado de textos, archivo de salida y búfer de /logs."""
+        if min_level is not None:
+            self.min_level = LEVELS.get(min_level.lower(), self.min_level)
+        if max_length is not None:
+            self.max_length = max_length
+        if file:
+            self._file = RotatingFileHandler(file, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        if buffer_max_length is not None:
+            self.buffer.max_length = buffer_max_length
+        if buffer_size is not None and buffer_size != self.buffer.size:
+            self.buffer.resize(buffer_size)
+        if buffer_level is not None:
+            self.buffer_level = LEVELS.get(buffer_level.lower(), self.buffer_level)
+        self._capture_level = min(self.min_level, self.buffer_level)
+
+    def is_enabled_for(self, level: str) -> bool:
+        return self.enabled and LEVELS.get(level, 20) >= self._capture_level
+
+    def log(self, text: str, level: str = "info", component: str = "bot", style: str = "print") -> None:
+        """Guarda el registro en el búfer y lo encola; los de nivel inferior al mínimo se descartan aquí mismo."""
+        severity = LEVELS.get(level, 20)
+        if not self.enabled or severity < self._capture_level:
+            return
+        record = (time.time(), level, component, text, style)
+        if severity >= self.buffer_level:
+            self.buffer.append(record)
+        if severity < self.min_level:
+            return
+        if self._thread is None:
+            self._start()
+        self._queue.put(record)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="logger", daemon=True)
+                self._thread.start()
+
+    def _truncate(self, text: str) -> str:
+        if self.max_length and len(text) > self.max_length:
+            return f"{text[:self.max_length]}… (+{len(text) - self.max_length})"
+        return text
+
+    def _format(self, record: Record) -> Tuple[str, str]:
+        created, level, component, text, style = record
+        text = self._truncate(str(text))
+        timestamp = datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S")
+        if style == "log":
+            console = f"[{timestamp}] [{level.upper()}] {text}"
+        else:
+            console = f"[{COLORS.get(level, level.upper())}]: {text}"
+        plain = f"{timestamp} {level.upper():<7} [{component}] {text}"
+        return console, plain
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                console, plain = self._format(record)
+                stream = self.stream or sys.stdout
+                stream.write(console + "\n")
+                if self._file is not None:
+                    self._file.stream.write(plain + "\n")
+                    if self._file.maxBytes and self._file.stream.tell() >= self._file.maxBytes:
+                        self._file.doRollover()
+                # Escribir en bloque lo que se haya acumulado antes de vaciar el búfer
+                if self._queue.empty():
+                    stream.flush()
+                    if self._file is not None:
+                        self._file.flush()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        """Escribe lo pendiente y detiene el hilo de escritura."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            (self.stream or sys.stdout).flush()
+        except Exception:
+            pass
+        if self._file is not None:
+            self._file.close()
+
+
+logger = QueuedLogger()
+atexit.register(logger.close)
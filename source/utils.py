@@ -1,19 +1,13 @@
 from typing import Literal
 
+from source.logger import logger
+
 
 def custom_print(
     text: str,
     suffix: Literal["info", "error", "warning", "success", "debug"] = "info",
+    component: str = "bot",
 ) -> None:
-    
-    suffixes = {
-        "info": "\033[1;32;48mINFO\033[1;37;0m",
-        "error": "\033[1;31;48mERROR\033[1;37;0m",
-        "warning": "\033[1;33;48mWARNING\033[1;37;0m",
-        "success": "\033[1;92;48mSUCCESS\033[1;37;0m",
-        "debug": "\033[1;36;48mDEBUG\033[1;37;0m",
-    }
-
-    print(f"[{suffixes[suffix]}]: {text}")
+    # Solo encola el registro; el hilo del logger se encarga de formatear y escribir
+    logger.log(text, suffix, component)
     return
-